@@ -4,11 +4,13 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 import sys
 import time
+import atexit
 import json
 import shutil
 import threading
 import logging
-from datetime import datetime
+import yaml
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 import git
 from git import Repo
@@ -23,7 +25,7 @@ import eventlet
 eventlet.monkey_patch()
 
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 
 app = Flask(__name__)
 load_dotenv()
@@ -31,16 +33,79 @@ load_dotenv()
 # Configure session
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev-key-please-change')
 
-# Configure Socket.IO
-socketio = SocketIO(app, cors_allowed_origins="*")
+def load_settings(path='config/settings.yaml'):
+    try:
+        with open(path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f'Could not load {path}, using defaults: {e}')
+        return {}
 
-# Import GA OAuth after app is created
-from ga_oauth import authorize, oauth2callback, get_analytics_data
+settings = load_settings()
+
+from src.message_queue import socketio_options
+from src.shared_state import SharedState
 
-# Global counters
-github_activity_count = 0
-analytics_events_count = 0
-agent_activity_count = 0
+# Configure Socket.IO; with several workers, events travel between them through the message queue
+message_queue = os.environ.get('SOCKETIO_MESSAGE_QUEUE', settings.get('web', {}).get('message_queue'))
+socketio = SocketIO(app, cors_allowed_origins="*", **socketio_options(message_queue))
+
+# Counters, job records and dashboard state shared by every worker process
+shared_state = SharedState(os.environ.get('SHARED_STATE_PATH', settings.get('web', {}).get('shared_state_path', 'cache/state.sqlite')))
+
+# Import GA OAuth after app is created
+from ga_oauth import (
+    authorize, oauth2callback, get_analytics_data, get_property_reports, analytics_cache,
+    credential_store, analytics_store, current_user_id, migrate_session_credentials
+)
+from src.git_committer import GitCommitter
+from src.commit_activity import CommitActivity
+from src.repo_mirror import MirrorCache, strip_credentials
+from src.worktree_pool import WorktreePool
+from src.job_manager import ACTIVE_STATES, JobManager
+from src.analytics_analysis import AnalysisResult, AnalyticsAnalyzer, PageMetrics, choose_focus
+from src.analysis_scheduler import AnalysisScheduler
+from src.event_bus import EventBus, job_room, property_room
+from src import offload
+
+# Commits only the files the agent changed, through the git index
+git_committer = GitCommitter({'file_processing': {'create_git_commits': True}})
+commit_activity = CommitActivity(settings.get('web', {}).get('recent_commits', 50), state=shared_state)
+
+# Shared bare mirrors; each job works in its own git worktree sharing the mirror's objects
+mirror_cache = MirrorCache(settings)
+worktree_pool = WorktreePool(mirror_cache, settings)
+# Registered before the job manager, so it runs after jobs have released their worktrees
+atexit.register(worktree_pool.close)
+
+# Setup/analysis jobs, deduplicated per repository and property; drained on shutdown
+job_manager = JobManager(
+    max_concurrent=settings.get('web', {}).get('max_concurrent_jobs', 4),
+    spawn=socketio.start_background_task,
+    state=shared_state
+)
+atexit.register(job_manager.shutdown)
+
+# Events go to the rooms of the property or job they concern, batched per window
+event_bus = EventBus(
+    socketio.emit,
+    window_seconds=settings.get('web', {}).get('event_window_seconds', 0.25),
+    spawn=socketio.start_background_task,
+    sleep=socketio.sleep,
+    state_store=shared_state
+)
+
+# Analytics reports are fetched at most once per TTL, however many loops and tabs ask
+analytics_cache.ttl_seconds = settings.get('web', {}).get('analytics_cache_ttl_seconds', 30)
+analytics_store.history_days = settings.get('web', {}).get('analytics_history_days', 30)
+analytics_store.late_days = settings.get('web', {}).get('analytics_late_days', 3)
+offload.configure(settings.get('web', {}).get('offload_threads'))
+
+# Baselines, anomalies and deltas behind strategy selection
+analysis_settings = settings.get('analysis', {})
+analytics_analyzer = AnalyticsAnalyzer(**{
+    key: value for key, value in analysis_settings.items() if key not in ('thresholds', 'triggers')
+})
 
 def login_required(f):
     @wraps(f)
@@ -73,16 +138,17 @@ def analytics_dashboard():
     if not property_id:
         return redirect(url_for('index'))
     
-    # Store property ID in session
+    # Store property ID in session, and let background jobs for it use this user's grant
     session['ga_property_id'] = property_id
+    credential_store.link_property(current_user_id(), property_id)
     
     # Get analytics data
     analytics_data = get_analytics_data(property_id)
     
-    if not analytics_data:
+    if not analytics_data or 'error' in analytics_data:
         return render_template('error.html', 
                             title='Analytics Error',
-                            message='Could not fetch analytics data. Please try again.')
+                            message=(analytics_data or {}).get('error', 'Could not fetch analytics data. Please try again.'))
     
     return render_template('dashboard.html', 
                          analytics_data=analytics_data,
@@ -94,78 +160,163 @@ def logout():
     session.clear()
     return redirect(url_for('index'))
 
-@app.route('/setup', methods=['POST'])
-def setup():
-    try:
-        # Get Google Analytics credentials
-        ga_property_id = request.form.get('ga_property_id')
-        
-        if not ga_property_id:
-            return jsonify({
-                'status': 'error',
-                'message': 'Google Analytics Property ID is required'
-            }), 400
+def parse_setup_request():
+    """Validate a setup submission from a form or JSON body
 
-        # Get GitHub repository information
-        repo_url = request.form.get('repo_url')
-        token = request.form.get('token')
-        branch_type = request.form.get('branch_type')
-        branch = request.form.get('branch')
-        new_branch_name = request.form.get('new_branch_name')
-        prompt = request.form.get('prompt')
-        
-        if not repo_url or not token:
-            return jsonify({
-                'status': 'error',
-                'message': 'GitHub repository URL and token are required'
-            }), 400
+    Returns (params, None) on success or (None, error response).
+    """
+    data = request.get_json(silent=True) or request.form
 
-        # Validate repository URL format
-        if not repo_url.startswith('https://github.com/'):
-            return jsonify({
-                'status': 'error',
-                'message': 'Please provide a valid GitHub repository URL'
-            }), 400
+    # Get Google Analytics credentials
+    ga_property_id = data.get('ga_property_id')
+    
+    if not ga_property_id:
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Google Analytics Property ID is required'
+        }), 400)
 
-        # Replace username with token in URL
-        url_parts = repo_url.split('/')
-        url_parts[2] = f'{token}@github.com'
-        auth_url = '/'.join(url_parts)
+    # Get GitHub repository information
+    repo_url = data.get('repo_url')
+    token = data.get('token')
+    branch_type = data.get('branch_type')
+    
+    if not repo_url or not token:
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'GitHub repository URL and token are required'
+        }), 400)
 
-        # Create a directory for the repository
-        repo_name = repo_url.split('/')[-1].replace('.git', '')
-        repo_path = os.path.join('repos', repo_name)
-        
+    # Validate repository URL format
+    if not repo_url.startswith('https://github.com/'):
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Please provide a valid GitHub repository URL'
+        }), 400)
+
+    # Replace username with token in URL
+    url_parts = repo_url.split('/')
+    url_parts[2] = f'{token}@github.com'
+    auth_url = '/'.join(url_parts)
+
+    # Background jobs for this property can use the submitting user's grant
+    user_id = migrate_session_credentials()
+    if user_id:
+        credential_store.link_property(user_id, ga_property_id)
+
+    return {
+        'repo_url': repo_url,
+        'auth_url': auth_url,
+        'branch': data.get('branch') if branch_type == 'existing' else None,
+        'new_branch': data.get('new_branch_name') if branch_type == 'new' else None,
+        'ga_property_id': ga_property_id,
+        'prompt': data.get('prompt'),
+        'user_id': user_id
+    }, None
+
+def submit_setup_job(params):
+    """Queue a setup job, or return the active one for the same repository and property"""
+    job_params = {k: v for k, v in params.items() if k != 'auth_url'}
+
+    def run(job):
         try:
-            # Clone the repository
-            repo_name = repo_url.split('/')[-1].replace('.git', '')
-            repo_path = os.path.join('repos', repo_name)
-            
-            if os.path.exists(repo_path):
-                shutil.rmtree(repo_path)
-            
-            Repo.clone_from(auth_url, repo_path)
-            logging.info(f'Successfully cloned repository: {repo_url}')
-        except Exception as e:
-            logging.error(f'Error cloning repository: {str(e)}')
-            return jsonify({'error': f'Failed to clone repository: {str(e)}'}), 500
+            run_setup_job(job, params)
+        finally:
+            forget_job_rooms(job)
+
+    return job_manager.submit(
+        'setup',
+        (params['repo_url'], params['ga_property_id']),
+        run,
+        params=job_params
+    )
+
+def forget_job_rooms(job):
+    """Drop the dashboard state kept for a finished job's rooms
+
+    The property's room is kept while another job still monitors the property.
+    """
+    event_bus.forget(job_room(job.id))
+    property_id = job.params.get('ga_property_id')
+    if not any(
+        other.id != job.id and other.status in ACTIVE_STATES and other.params.get('ga_property_id') == property_id
+        for other in job_manager.list()
+    ):
+        event_bus.forget(property_room(property_id))
 
-        # Start analysis and monitoring in background threads
-        if repo_path:
-            threading.Thread(target=analyze_and_commit_changes, args=(repo_path, ga_property_id, prompt)).start()
-            threading.Thread(target=monitor_analytics_events, args=(ga_property_id,)).start()
+@app.route('/setup', methods=['POST'])
+def setup():
+    try:
+        params, error = parse_setup_request()
+        if error:
+            return error
+
+        # Clone and analyse off the request path; progress arrives over Socket.IO
+        job = submit_setup_job(params)
 
         return jsonify({
-            'status': 'success',
-            'message': 'Analysis started',
-            'repo_path': repo_path,
-            'ga_property_id': ga_property_id,
-            'prompt': prompt
-        })
+            'status': 'accepted',
+            'message': 'Cloning repository, analysis starts when it is ready',
+            'job_id': job.id,
+            'ga_property_id': params['ga_property_id'],
+            'prompt': params['prompt']
+        }), 202
+    except RuntimeError as e:
+        # The job manager is shutting down
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
         logging.error(f'Error in setup: {str(e)}')
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        params, error = parse_setup_request()
+        if error:
+            return error
+        job = submit_setup_job(params)
+        return jsonify(job.to_dict()), 202
+    except RuntimeError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    except Exception as e:
+        logging.error(f'Error creating job: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+def owned_job(job_id):
+    """The job if it belongs to the signed-in user, otherwise None"""
+    job = job_manager.get(job_id)
+    if job and job.params.get('user_id') == current_user_id():
+        return job
+    return None
+
+@app.route('/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    user_id = current_user_id()
+    return jsonify([job.to_dict() for job in job_manager.list() if job.params.get('user_id') == user_id])
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    job = owned_job(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+@login_required
+def cancel_job(job_id):
+    job = owned_job(job_id) and job_manager.cancel(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 202
+
+@app.route('/activity/commits', methods=['GET'])
+def commit_activity_summary():
+    """Commit counters and recent commits, from the shared store"""
+    limit = request.args.get('limit', type=int)
+    return jsonify(commit_activity.summary(repo=request.args.get('repo'), limit=limit))
+
 # Removed old GitHub connect route as we now have a unified setup route
 def github_connect():
     try:
@@ -240,104 +391,210 @@ def connect():
             'message': str(e)
         }), 500
 
-# Monitoring functions
-def analyze_and_commit_changes(repo_path, ga_property_id, prompt):
-    """Analyze Google Analytics data and make code changes based on the prompt"""
-    global github_activity_count
-    while True:
-        try:
-            # Load project configuration
-            config_path = os.path.join(repo_path, 'project_config.json')
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+@socketio.on('connect')
+def handle_connect():
+    """Put a dashboard in its property's room and send it the current state"""
+    emit('counters', shared_state.counters())
+    property_id = session.get('ga_property_id')
+    if property_id:
+        room = property_room(property_id)
+        join_room(room)
+        emit('state_snapshot', event_bus.snapshot(room))
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Follow one setup job, e.g. with the id returned by /setup"""
+    job = job_manager.get((data or {}).get('job_id'))
+    if job:
+        room = job_room(job.id)
+        join_room(room)
+        emit('state_snapshot', event_bus.snapshot(room))
+
+def run_setup_job(job, params):
+    """Lease a worktree of the repository, then analyse and monitor until cancelled
+
+    The worktree goes back to the pool however the job ends.
+    """
+    repo_url = strip_credentials(params['auth_url'])
+    rooms = [job_room(job.id), property_room(params['ga_property_id'])]
+
+    def report(stage, percent):
+        job.progress = {'stage': stage, 'percent': percent}
+        # Only the latest percentage of each stage is worth sending
+        event_bus.publish('clone_progress', {
+            'job_id': job.id,
+            'repo_url': repo_url,
+            'stage': stage,
+            'percent': percent
+        }, to=rooms, coalesce=True, key=stage)
 
-            # Simulate Google Analytics API connection
-            # In a real app, this would use the actual Google Analytics API
-            analytics_data = get_google_analytics_data(ga_property_id)
-
-            # Analyze data and generate strategy
-            strategy = analyze_data_and_generate_strategy(
-                analytics_data,
-                config['prompt']
-            )
-
-            # Emit analytics update
-            socketio.emit('analytics_event', {
-                'pageViews': analytics_data['page_views'],
-                'conversions': analytics_data['conversions'],
-                'bounceRate': analytics_data['bounce_rate'],
-                'avgDuration': analytics_data['avg_session_duration'],
-                'goal': config['prompt'],
-                'strategy': strategy
-            })
+    try:
+        worktree = worktree_pool.acquire(
+            params['auth_url'],
+            job.id,
+            branch=params['branch'],
+            new_branch=params['new_branch'],
+            progress=report
+        )
+        logging.info(f'Successfully prepared repository: {repo_url}')
+    except Exception as e:
+        logging.error(f'Error cloning repository: {str(e)}')
+        event_bus.publish('clone_progress', {'job_id': job.id, 'repo_url': repo_url, 'stage': 'error', 'error': str(e)}, to=rooms)
+        event_bus.publish('activity_log', f'Failed to clone repository: {str(e)}', to=rooms)
+        raise
 
-            # Generate code changes based on strategy
-            changes = generate_code_changes(
-                analytics_data,
-                strategy,
-                config['prompt']
-            )
+    repo_path = str(worktree.path)
+    job.params['repo_path'] = repo_path
+    job.params['worktree_branch'] = worktree.branch
+    commit_activity.track(repo_path, repo=repo_url)
+    event_bus.publish('activity_log', f'Repository ready: {repo_url} ({worktree.branch})', to=rooms)
+    try:
+        monitor_repository(job, params, repo_path, rooms)
+    finally:
+        worktree_pool.release(worktree)
+
+def monitor_repository(job, params, repo_path, rooms):
+    """Run analysis passes in a job's worktree until the job is cancelled"""
+    # Analysis runs when the metrics move or the project config changes; metrics
+    # are published on every poll. Both stop as soon as the job is cancelled
+    scheduler = AnalysisScheduler(
+        os.path.join(repo_path, 'project_config.json'),
+        **analysis_settings.get('triggers', {})
+    )
+    while True:
+        job.progress = {'stage': 'waiting', 'analysis_runs': scheduler.runs}
+        reasons = scheduler.next_run(
+            job.wait,
+            lambda: monitor_analytics_events(params['ga_property_id'], params.get('user_id'))
+        )
+        if reasons is None:
+            break
+        job.progress = {'stage': 'analysing', 'reasons': reasons}
+        event_bus.publish('activity_log', f"Analysing: {'; '.join(reasons)}", to=rooms)
+        analyze_and_commit_changes(
+            repo_path, params['ga_property_id'], params['prompt'], params.get('user_id'),
+            config=scheduler.config, analytics_data=scheduler.metrics
+        )
 
-            # Load project configuration
+# Monitoring functions
+def analyze_and_commit_changes(repo_path, ga_property_id, prompt, user_id=None, config=None, analytics_data=None):
+    """Analyze Google Analytics data and make code changes based on the prompt (one pass)
+    
+    The scheduler passes the config and metrics it already loaded; each is
+    only read here when called without them.
+    """
+    room = property_room(ga_property_id)
+    try:
+        # Load project configuration
+        if config is None:
             config_path = os.path.join(repo_path, 'project_config.json')
             with open(config_path, 'r') as f:
                 config = json.load(f)
 
-            # Analyze data and generate code changes based on prompt
-            changes = analyze_data_and_generate_code(
-                analytics_data,
-                config['prompt']
-            )
-
-            if changes:
-                # Apply changes to the codebase
-                apply_code_changes(repo_path, changes)
-
-                # Commit changes
-                repo = Repo(repo_path)
-                repo.git.add('.')
-                commit_message = f"AI-assisted update: {config['prompt']}"
-                repo.git.commit('-m', commit_message)
-
-                # Update activity count
-                github_activity_count = len(list(repo.iter_commits('HEAD', max_count=10)))
-                socketio.emit('github_activity', {
-                    'count': github_activity_count,
-                    'commit_message': commit_message
-                })
+        if analytics_data is None:
+            analytics_data = get_google_analytics_data(ga_property_id, user_id)
+        if not analytics_data or 'error' in analytics_data:
+            error = (analytics_data or {}).get('error', 'no analytics data available')
+            event_bus.publish('activity_log', f'Skipping analysis: {error}', to=room)
+            return
+
+        # Analyze data and generate strategy
+        strategy = analyze_data_and_generate_strategy(
+            analytics_data,
+            config['prompt'],
+            analyze_property(ga_property_id)
+        )
+
+        # Publish the analysis; dashboards receive only the fields that changed
+        event_bus.publish_state('analysis', {
+            'pageViews': analytics_data['page_views'],
+            'conversions': analytics_data['conversions'],
+            'bounceRate': analytics_data['bounce_rate'],
+            'avgDuration': analytics_data['avg_session_duration'],
+            'goal': config['prompt'],
+            'strategy': strategy
+        }, to=room)
+
+        # Generate code changes based on strategy
+        changes = generate_code_changes(
+            analytics_data,
+            strategy,
+            config['prompt']
+        )
+
+        if changes:
+            # Apply changes to the codebase
+            changed_files = apply_code_changes(repo_path, changes, room)
+
+            # Commit exactly the changed files
+            commit_message = f"AI-assisted update: {config['prompt']}"
+            if git_committer.commit_files(repo_path, changed_files, commit_message):
+                # Count only the commits since the last seen HEAD
+                new_commits = commit_activity.update(repo_path)
+                if new_commits:
+                    github_activity_count = shared_state.incr('github_activity', len(new_commits))
+                    event_bus.publish('github_activity', {
+                        'count': github_activity_count,
+                        'repo': new_commits[-1].repo,
+                        'commits': [commit.to_dict() for commit in new_commits],
+                        'commit_message': commit_message
+                    }, to=room)
 
                 # Emit activity log
-                socketio.emit('activity_log', f'AI made changes: {commit_message}')
+                event_bus.publish('activity_log', f'AI made changes: {commit_message}', to=room)
 
-        except Exception as e:
-            socketio.emit('activity_log', f'Error in analysis and commit: {str(e)}')
-        
-        time.sleep(300)  # Analyze and commit every 5 minutes
+    except Exception as e:
+        event_bus.publish('activity_log', f'Error in analysis and commit: {str(e)}', to=room)
 
-def analyze_data_and_generate_strategy(analytics_data, prompt):
-    """Generate a detailed strategy based on analytics data and user prompt"""
-    # This is where you would integrate with your AI model
-    # For now, we'll simulate a strategy based on common patterns
-    strategy = ""
-    
-    if 'optimize performance' in prompt.lower():
-        strategy = """Optimizing performance:
+STRATEGIES = {
+    'performance': """Optimizing performance:
         1. Reducing image sizes
         2. Implementing lazy loading
-        3. Minifying CSS and JS files"""
-            
-    if 'increase conversions' in prompt.lower():
-        strategy = """Improving conversions:
+        3. Minifying CSS and JS files""",
+    'conversions': """Improving conversions:
         1. Adding clearer CTAs
         2. Optimizing checkout flow
-        3. Adding trust signals"""
-            
-    if 'reduce bounce rate' in prompt.lower():
-        strategy = """Reducing bounce rate:
+        3. Adding trust signals""",
+    'bounce_rate': """Reducing bounce rate:
         1. Improving page load times
         2. Adding better navigation
         3. Enhancing mobile experience"""
-            
+}
+
+def analyze_property(property_id):
+    """Run the vectorized analysis over the property's stored per-page metrics"""
+    rows = analytics_store.page_rows(property_id, days=analytics_store.history_days)
+    metrics = PageMetrics.from_rows(rows, start=date.today() - timedelta(days=analytics_store.history_days - 1),
+                                    days=analytics_store.history_days)
+    return analytics_analyzer.analyze(metrics)
+
+def analyze_data_and_generate_strategy(analytics_data, prompt, analysis=None):
+    """Generate a detailed strategy based on analytics data and user prompt
+    
+    With an analysis of the stored metrics, the goal is chosen from how the
+    numbers moved (weighted towards the goal named in the prompt), and the
+    pages driving the change are listed; without one, the prompt decides.
+    """
+    if analysis is None:
+        analysis = AnalysisResult(recent_days=0)
+    focus = choose_focus(analysis, prompt, **analysis_settings.get('thresholds', {}))
+    if focus is None:
+        return ""
+    
+    strategy = STRATEGIES[focus]
+    if focus == 'bounce_rate':
+        pages = sorted(analysis.top_pages, key=lambda page: -page['bounce_delta'])
+        details = [f"{p['page']}: bounce rate {p['bounce_rate']:.1%} ({p['bounce_delta']:+.1%})"
+                   for p in pages if p['bounce_delta'] > 0]
+    elif focus == 'conversions':
+        pages = sorted(analysis.top_pages, key=lambda page: page['conversion_delta'])
+        details = [f"{p['page']}: conversion rate {p['conversion_rate']:.2%} ({p['conversion_delta']:+.2%})"
+                   for p in pages if p['conversion_delta'] < 0]
+    else:
+        details = [f"{a['page']}: {a['views']:.0f} views on {a['date']} vs baseline {a['baseline']:.0f}"
+                   for a in analysis.anomalies if a['z_score'] < 0]
+    if details:
+        strategy += "\n        Pages to prioritise:\n" + "\n".join(f"        - {line}" for line in details)
     return strategy
 
 def generate_code_changes(analytics_data, strategy, prompt):
@@ -369,156 +626,92 @@ def generate_code_changes(analytics_data, strategy, prompt):
     
     return changes
 
-def apply_code_changes(repo_path, changes):
-    """Apply code changes to the repository with detailed logging"""
+def apply_code_changes(repo_path, changes, room=None):
+    """Apply code changes to the repository with detailed logging
+
+    Progress is published to room (every client when None).
+    Returns the paths of the files that were changed.
+    """
+    changed_files = []
     for change in changes:
         file_path = os.path.join(repo_path, change['file'])
         if os.path.exists(file_path):
             try:
                 # For demo purposes, we'll just append a comment
-                with open(file_path, 'a') as f:
-                    f.write(f'\n\n/* AI Update: {change["changes"]} */\n')
+                offload.append_text(file_path, f'\n\n/* AI Update: {change["changes"]} */\n')
+                changed_files.append(file_path)
                 
                 # Emit detailed activity log
-                socketio.emit('agent_activity', {
+                event_bus.publish('agent_activity', {
                     'file': change['file'],
                     'changes': change['changes'],
                     'status': 'success'
-                })
+                }, to=room)
                 
             except Exception as e:
-                socketio.emit('agent_activity', {
+                event_bus.publish('agent_activity', {
                     'file': change['file'],
                     'changes': change['changes'],
                     'status': 'error',
                     'error': str(e)
-                })
+                }, to=room)
                 continue
 
     # Emit overall success message
-    socketio.emit('activity_log', 'Code changes applied successfully', 'success')
+    event_bus.publish('activity_log', 'Code changes applied successfully', to=room)
+    return changed_files
 
-def get_google_analytics_data(property_id):
-    """
-    Get Google Analytics data using OAuth 2.0
+def get_google_analytics_data(property_id, user_id=None):
     """
-    try:
-        if 'credentials' not in session:
-            return {'error': 'User not authenticated'}
-
-        # Get the stored credentials
-        credentials = google.oauth2.credentials.Credentials(
-            **session['credentials']
-        )
+    Get the Google Analytics summary using OAuth 2.0, shared through the analytics cache
 
-        # Build the analytics data client
-        analytics = build('analyticsdata', 'v1beta', credentials=credentials)
-
-        # Define the request
-        request = {
-            'dateRanges': [
-                {
-                    'startDate': '30daysAgo',
-                    'endDate': 'today'
-                }
-            ],
-            'metrics': [
-                {'name': 'activeUsers'},
-                {'name': 'sessions'},
-                {'name': 'bounceRate'},
-                {'name': 'averageSessionDuration'},
-                {'name': 'screenPageViews'},
-                {'name': 'screenPageViewsPerSession'},
-                {'name': 'newUsers'},
-                {'name': 'conversions'}
-            ],
-            'dimensions': [{'name': 'pageTitle'}],
-            'limit': 1000
-        }
-
-        # Make the request
-        response = analytics.properties().runReport(
-            property=f'properties/{property_id}',
-            body=request
-        ).execute()
-
-        # Process the response
-        if not response.get('rows'):
-            return {'error': 'No data found'}
-
-        # Extract metrics
-        metrics = {}
-        for row in response['rows']:
-            for i, header in enumerate(response['metricHeaders']):
-                metric_name = header['name'].replace(' ', '_').lower()
-                metrics[metric_name] = row['metricValues'][i]['value']
-
-        # Get top pages
-        top_pages = []
-        for row in response['rows'][:5]:  # Get top 5 pages
-            page = row['dimensionValues'][0]['value']
-            views = int(row['metricValues'][5]['value'])  # screenPageViews
-            top_pages.append({'page': page, 'views': views})
-
-        return {
-            'users': int(metrics.get('active_users', 0)),
-            'sessions': int(metrics.get('sessions', 0)),
-            'bounce_rate': float(metrics.get('bounce_rate', 0)),
-            'avg_session_duration': float(metrics.get('average_session_duration', 0)),
-            'page_views': int(metrics.get('screen_page_views', 0)),
-            'pages_per_session': float(metrics.get('screen_page_views_per_session', 0)),
-            'new_users': int(metrics.get('new_users', 0)),
-            'top_pages': top_pages
-        }
+    The summary is read from the local analytics store, which is synced incrementally,
+    and credentials come from the server-side store, so this works from background jobs.
+    """
+    reports = get_property_reports(property_id, user_id=user_id)
+    if reports is None or 'error' in reports:
+        return reports
+    return reports['summary']
 
+def monitor_analytics_events(ga_property_id, user_id=None):
+    """Publish the latest analytics metrics (one update) and return them
+    
+    Dashboards watching the property receive the event count and only the
+    metrics that changed since their last update.
+    """
+    room = property_room(ga_property_id)
+    try:
+        # Get real analytics data
+        analytics_data = get_google_analytics_data(ga_property_id, user_id)
+        
+        # Update analytics count
+        analytics_events_count = shared_state.incr('analytics_events')
+        
+        # Emit analytics update
+        event_bus.publish('analytics_event', {
+            'count': analytics_events_count,
+            'eventType': 'Metrics Update'
+        }, to=room, coalesce=True)
+        if analytics_data:
+            event_bus.publish_state('analytics', analytics_data, to=room)
+        return analytics_data
+        
     except Exception as e:
-        logging.error(f'Error getting Google Analytics data: {str(e)}')
+        event_bus.publish('activity_log', f'Analytics monitoring error: {str(e)}', to=room)
         return None
 
-def monitor_analytics_events(ga_property_id):
-    global analytics_events_count
-    while True:
-        try:
-            # Get real analytics data
-            analytics_data = get_google_analytics_data(ga_property_id)
-            
-            # Update analytics count
-            analytics_events_count += 1
-            
-            # Emit analytics update
-            socketio.emit('analytics_event', {
-                'count': analytics_events_count,
-                'data': analytics_data,
-                'eventType': 'Metrics Update'
-            })
-            
-            # Emit activity log
-            socketio.emit('activity_log', {
-                'message': 'Analytics metrics updated',
-                'type': 'info'
-            })
-            
-        except Exception as e:
-            socketio.emit('activity_log', {
-                'message': f'Analytics monitoring error: {str(e)}',
-                'type': 'error'
-            })
-        
-        time.sleep(30)  # Update every 30 seconds
-
 def monitor_agent_activity():
-    global agent_activity_count
     while True:
         try:
             # Simulate agent activity (in a real app, you'd track AI agent tasks here)
-            agent_activity_count += 1
-            socketio.emit('agent_activity', {'count': agent_activity_count})
+            agent_activity_count = shared_state.incr('agent_activity')
+            event_bus.publish('agent_activity', {'count': agent_activity_count}, coalesce=True)
             
             # Emit activity log
-            socketio.emit('activity_log', 'Agent task completed')
+            event_bus.publish('activity_log', 'Agent task completed')
             
         except Exception as e:
-            socketio.emit('activity_log', f'Agent monitoring error: {str(e)}')
+            event_bus.publish('activity_log', f'Agent monitoring error: {str(e)}')
         
         time.sleep(5)  # Check every 5 seconds
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Per-fetch client building vs the cached GA client
+
+Runs a local stub of the Analytics Data API and times N runReport calls
+made the old way (``build()`` on every fetch) and through GAClientCache.
+No Google account or network access is needed.
+
+    python benchmarks/bench_ga_client.py --requests 200
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from src.ga_client import GAClientCache
+
+REPORT = json.dumps({
+    'dimensionHeaders': [{'name': 'pageTitle'}],
+    'metricHeaders': [{'name': 'activeUsers', 'type': 'TYPE_INTEGER'}],
+    'rows': [
+        {'dimensionValues': [{'value': f'Page {i}'}], 'metricValues': [{'value': str(i)}]}
+        for i in range(50)
+    ],
+    'rowCount': 50
+}).encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every POST with a canned runReport response over keep-alive connections"""
+    protocol_version = 'HTTP/1.1'
+    # Buffer so headers and body leave in one packet, as a real server would send them
+    wbufsize = 1 << 16
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.connections_lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPORT)))
+        self.end_headers()
+        self.wfile.write(REPORT)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_credentials() -> Credentials:
+    return Credentials(
+        token='stub-token',
+        refresh_token='stub-refresh',
+        client_id='stub-client',
+        client_secret='stub-secret',
+        token_uri='http://127.0.0.1:9/token',
+        expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+
+
+def run_report(service):
+    return service.properties().runReport(
+        property='properties/123',
+        body={'metrics': [{'name': 'activeUsers'}], 'dimensions': [{'name': 'pageTitle'}]}
+    )
+
+
+def bench(label: str, requests: int, fetch) -> float:
+    StubHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        fetch()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / requests * 1000:8.2f} ms/request  {StubHandler.connections:5d} connections")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    credentials = make_credentials()
+
+    def uncached():
+        service = build(
+            'analyticsdata', 'v1beta',
+            credentials=credentials,
+            static_discovery=True,
+            client_options={'api_endpoint': endpoint}
+        )
+        run_report(service).execute()
+
+    cache = GAClientCache(api_endpoint=endpoint)
+
+    def cached():
+        cache.get(make_credentials()).execute(run_report)
+
+    try:
+        baseline = bench("build() per fetch", args.requests, uncached)
+        improved = bench("GAClientCache", args.requests, cached)
+        print(f"speedup: {baseline / improved:.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
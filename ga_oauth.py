@@ -1,15 +1,21 @@
 import os
 import json
 import logging
+import uuid
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from flask import session, redirect, url_for, request, current_app
 from requests_oauthlib import OAuth2Session
 from oauthlib.oauth2 import WebApplicationClient
 import warnings
 
+from src.analytics_cache import AnalyticsCache
+from src.credential_store import CredentialStore
+from src.analytics_store import AnalyticsStore
+
 # Suppress only the single InsecureTransportWarning from oauthlib
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 
@@ -27,28 +33,54 @@ SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
 REDIRECT_URI = 'https://eleven-hoops-strive.loca.lt/oauth2callback'  # Must match the redirect URI in the Google Cloud Console
 DEBUG = True  # Set to False in production
 
-def get_ga_service():
-    """Get an authorized Google Analytics Data API service client."""
+TOP_PAGES = 5
+
+# One cache for every analytics report, shared by the dashboard and the app's background loops
+analytics_cache = AnalyticsCache(
+    ttl_seconds=30,
+    should_cache=lambda value: bool(value) and 'error' not in value
+)
+
+# Server-side grants, so background jobs can reach the API without a session;
+# every session and job using a grant shares one authorized client
+credential_store = CredentialStore(os.environ.get('GA_CREDENTIAL_STORE', 'cache/credentials.sqlite'))
+
+# Local time series of each property's metrics; reads never wait on the API
+analytics_store = AnalyticsStore(os.environ.get('GA_ANALYTICS_STORE', 'cache/analytics.sqlite'))
+
+def current_user_id():
+    """Stable id for the signed-in user, kept in the session."""
+    if 'user_id' not in session:
+        session['user_id'] = uuid.uuid4().hex
+    return session['user_id']
+
+def migrate_session_credentials():
+    """Copy the session's grant into the credential store if it is not there yet.
+    
+    Sessions from before the credential store was introduced only have the
+    grant in the cookie. Returns the signed-in user's id, or None if the
+    session has no grant.
+    """
     if 'credentials' not in session:
         return None
+    user_id = current_user_id()
+    if credential_store.load(user_id=user_id) is None:
+        credential_store.save(user_id, session['credentials'])
+    return user_id
+
+def get_ga_service(property_id=None, user_id=None):
+    """Get the shared, authorized Google Analytics Data API client.
     
-    credentials = Credentials(
-        **session['credentials']
-    )
-    
-    # If there are no (valid) credentials available, let the user log in.
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
+    Inside a request the signed-in user's grant is used; background jobs
+    pass the property (and user, when known) instead.
+    """
+    if user_id is None and not property_id:
+        user_id = migrate_session_credentials()
+        if user_id is None:
             return None
     
-    # Save the credentials back to the session
-    session['credentials'] = credentials_to_dict(credentials)
-    
-    # Build the service
-    service = build('analyticsdata', 'v1beta', credentials=credentials)
-    return service
+    # If the token cannot be refreshed, let the user log in.
+    return credential_store.client_for(property_id, user_id)
 
 def credentials_to_dict(credentials):
     """Convert credentials object to a dictionary."""
@@ -101,9 +133,6 @@ def oauth2callback():
         if DEBUG and authorization_response.startswith('http://'):
             authorization_response = authorization_response.replace('http://', 'https://', 1)
             
-        # Add a small delay to ensure the token is processed
-        time.sleep(1)
-        
         flow.fetch_token(
             authorization_response=authorization_response,
             verify=False  # Disable SSL verification for development
@@ -112,6 +141,7 @@ def oauth2callback():
         # Store the credentials in the session.
         credentials = flow.credentials
         session['credentials'] = credentials_to_dict(credentials)
+        credential_store.save(current_user_id(), credentials)
         
         return redirect(url_for('analytics_dashboard'))
         
@@ -120,29 +150,62 @@ def oauth2callback():
         return f"OAuth callback error: {str(e)}"
 
 def get_analytics_data(property_id, date_range='7daysAgo'):
-    """Fetch analytics data for the given property."""
-    service = get_ga_service()
-    if not service:
+    """Fetch analytics data for the given property, cached per property and date range."""
+    user_id = migrate_session_credentials()
+    if user_id is None:
         return None
+    return get_property_reports(property_id, date_range=date_range, user_id=user_id)
+
+def get_property_reports(property_id, date_range='7daysAgo', user_id=None):
+    """Summary and daily reports for a property, read from the local analytics store.
+    
+    The store is brought up to date first (at most once per cache TTL). If
+    the API is unreachable, the last synced data is served only to a user
+    whose own grant has read the property before; background jobs (no
+    user) are trusted. Errors from the sync, such as a grant without access
+    to the property, are returned as errors. None means nothing is stored.
+    """
+    synced = sync_analytics(property_id, user_id)
+    if synced and 'error' in synced:
+        return synced
+    if user_id is not None and not credential_store.has_access(user_id, property_id):
+        return {'error': 'Could not verify access to this Google Analytics property. Please try again.'}
+    if not analytics_store.has_data(property_id):
+        return None
+    return {
+        'summary': analytics_store.summary(property_id, days=analytics_store.history_days, top_pages=TOP_PAGES),
+        'daily': analytics_store.daily(property_id, since=date_range)
+    }
+
+def sync_analytics(property_id, user_id=None):
+    """Fetch the dates the local store is missing, shared through the analytics cache.
+    
+    Syncs are cached per grant owner, so one user's successful sync never
+    answers for another user's grant.
+    """
+    return analytics_cache.get(
+        ('sync', property_id, user_id),
+        lambda: _sync_analytics(property_id, user_id)
+    )
+
+def _sync_analytics(property_id, user_id):
+    client = get_ga_service(property_id, user_id)
+    if not client:
+        return {'error': 'No Google Analytics credentials for this property'}
     
     try:
-        request_body = {
-            'dateRanges': [{'startDate': date_range, 'endDate': 'today'}],
-            'metrics': [
-                {'name': 'activeUsers'},
-                {'name': 'sessions'},
-                {'name': 'bounceRate'},
-                {'name': 'averageSessionDuration'}
-            ],
-            'dimensions': [{'name': 'date'}]  # Add date dimension for time series data
-        }
-        
-        response = service.properties().runReport(
-            property=f'properties/{property_id}',
-            body=request_body
-        ).execute()
-        
-        return response
+        result = analytics_store.sync(client, property_id)
+    except HttpError as e:
+        if e.resp.status in (401, 403):
+            logger.warning(f"Grant cannot read analytics property {property_id}: {str(e)}")
+            if user_id is not None:
+                credential_store.record_access(user_id, property_id, allowed=False)
+            return {'error': 'Your Google account does not have access to this Google Analytics property'}
+        logger.error(f"Error syncing analytics data: {str(e)}")
+        return None
     except Exception as e:
-        logger.error(f"Error fetching analytics data: {str(e)}")
+        logger.error(f"Error syncing analytics data: {str(e)}")
         return None
+    if user_id is not None:
+        credential_store.record_access(user_id, property_id)
+    return result
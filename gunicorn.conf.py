@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for the dashboard: gunicorn -c gunicorn.conf.py wsgi:app
+
+Socket.IO needs an async worker class, and with more than one worker the
+processes must share a message queue (SOCKETIO_MESSAGE_QUEUE or
+web.message_queue in config/settings.yaml) so events emitted in one worker
+reach clients connected to another.
+"""
+
+import os
+
+import yaml
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5001')
+worker_class = 'eventlet'
+workers = int(os.environ.get('WEB_WORKERS', '1'))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', '1000'))
+# Long-polling and WebSocket connections stay open far longer than a request
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+graceful_timeout = 30
+
+
+def _message_queue() -> str:
+    if os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+        return os.environ['SOCKETIO_MESSAGE_QUEUE']
+    try:
+        with open('config/settings.yaml', 'r') as f:
+            settings = yaml.safe_load(f) or {}
+        return (settings.get('web') or {}).get('message_queue') or ''
+    except FileNotFoundError:
+        return ''
+
+
+def on_starting(server):
+    if workers > 1 and not _message_queue():
+        raise RuntimeError(
+            f"{workers} workers need a Socket.IO message queue: set SOCKETIO_MESSAGE_QUEUE "
+            "or web.message_queue (e.g. sqlite:///cache/socketio-queue.sqlite)"
+        )
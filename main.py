@@ -91,6 +91,24 @@ def main():
         cli = CLI()
         cli._show_status()
     
+    @app.command()
+    def plan(
+        repo: str = typer.Option(None, "--repo", "-r", help="Repository name, all enabled if omitted"),
+        goal: str = typer.Option(None, "--goal", "-g", help="Improvement goal, default goals if omitted")
+    ):
+        """Estimate files, tokens, cost and wall time without calling any provider"""
+        cli = CLI()
+        cli._show_plan(repo, goal)
+    
+    @app.command("apply-bundle")
+    def apply_bundle(
+        bundle: str = typer.Argument(..., help="Patch bundle directory written by a preview run"),
+        repo_path: str = typer.Option(None, "--repo-path", help="Apply to this directory instead of the original one")
+    ):
+        """Apply a preview run's patch bundle without calling any provider"""
+        cli = CLI()
+        cli._apply_bundle(bundle, repo_path)
+    
     @app.command()
     def test():
         """Test AI connections"""
@@ -42,6 +42,9 @@ class AIInterface:
         self.claude_client = None
         self.openai_client = None
         self._initialize_providers()
+        
+        # Optional semaphore shared across worker processes to bound provider calls
+        self.concurrency_limiter = None
     
     def _initialize_providers(self):
         """Initialize AI provider clients"""
@@ -117,6 +120,13 @@ class AIInterface:
         if not provider:
             provider = self.default_provider
         
+        if self.concurrency_limiter is not None:
+            with self.concurrency_limiter:
+                return self._dispatch_suggestions(provider, content, goal, file_path)
+        return self._dispatch_suggestions(provider, content, goal, file_path)
+    
+    def _dispatch_suggestions(self, provider: str, content: str, goal: str, file_path: str) -> Optional[str]:
+        """Route a suggestion request to the given provider"""
         try:
             if provider == 'gemini' and self.gemini_client:
                 return self._get_gemini_suggestions(content, goal, file_path)
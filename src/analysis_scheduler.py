@@ -0,0 +1,190 @@
+"""
+Analysis Scheduler - Runs analysis when metrics or project configuration change
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Relative change in a summary metric, since the last analysis, that triggers a new one
+DEFAULT_THRESHOLDS = {
+    'page_views': 0.1,
+    'sessions': 0.1,
+    'bounce_rate': 0.05,
+    'conversions': 0.1
+}
+
+
+class AnalysisScheduler:
+    """Decides when a job's analyze/generate/commit cycle is due.
+
+    Instead of running on a fixed interval, the scheduler polls cheap
+    signals - the project config file's stat and the cached analytics
+    summary - and triggers only when the config content changed or a
+    metric moved past its threshold relative to the values the previous
+    analysis saw. Triggers are coalesced: once one fires, the scheduler
+    waits settle_seconds for more (an editor saving several times, metrics
+    and config changing together) and never runs more often than
+    min_interval_seconds, so a burst becomes a single run with every reason
+    attached.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        thresholds: Optional[Dict[str, float]] = None,
+        config_poll_seconds: float = 5,
+        metrics_poll_seconds: float = 30,
+        settle_seconds: float = 5,
+        min_interval_seconds: float = 60,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            config_path: project_config.json of the working copy
+            thresholds: Relative change per summary metric that triggers analysis
+            config_poll_seconds: How often the config file is checked
+            metrics_poll_seconds: How often metrics are fetched
+            settle_seconds: Delay after a trigger during which further triggers are merged
+            min_interval_seconds: Minimum time between two runs
+            clock: Monotonic time source
+        """
+        self.logger = logging.getLogger(__name__)
+        self.config_path = Path(config_path)
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.config_poll_seconds = config_poll_seconds
+        self.metrics_poll_seconds = metrics_poll_seconds
+        self.settle_seconds = settle_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.clock = clock
+
+        self.config: Optional[Dict[str, Any]] = None
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self._config_stat = None
+        self._config_hash: Optional[str] = None
+        self._analysed_config_hash: Optional[str] = None
+        self._analysed_metrics: Optional[Dict[str, Any]] = None
+        self._last_run: Optional[float] = None
+        self._pending: Dict[str, str] = {}
+        self._first_trigger: Optional[float] = None
+        self._next_metrics = float('-inf')
+        self._next_config = float('-inf')
+
+    def check_config(self) -> bool:
+        """
+        Re-read the config file if its stat changed
+
+        Returns:
+            True if its content differs from what the last analysis used
+        """
+        try:
+            stat = os.stat(self.config_path)
+        except OSError as e:
+            self.logger.warning(f"Cannot read {self.config_path}: {e}")
+            return False
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._config_stat:
+            self._config_stat = signature
+            data = self.config_path.read_bytes()
+            content_hash = hashlib.sha256(data).hexdigest()
+            if content_hash != self._config_hash:
+                try:
+                    self.config = json.loads(data)
+                    self._config_hash = content_hash
+                except ValueError as e:
+                    # Half-written file; the next stat change brings the rest
+                    self.logger.warning(f"Ignoring invalid {self.config_path}: {e}")
+        return self._config_hash is not None and self._config_hash != self._analysed_config_hash
+
+    def check_metrics(self, metrics: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Record a metrics snapshot and compare it with the one the last analysis used
+
+        Returns:
+            A reason for each metric that moved past its threshold, by metric name
+        """
+        if not metrics or 'error' in metrics:
+            return {}
+        self.metrics = metrics
+        baseline = self._analysed_metrics
+        if baseline is None:
+            # No metrics were available at the last run; compare against these from now on
+            self._analysed_metrics = metrics
+            return {}
+
+        reasons = {}
+        for name, threshold in self.thresholds.items():
+            before, after = baseline.get(name), metrics.get(name)
+            if before is None or after is None:
+                continue
+            change = abs(after - before) / abs(before) if before else (1.0 if after else 0.0)
+            if change >= threshold:
+                reasons[name] = f"{name} changed {change:.0%} ({before} -> {after})"
+        return reasons
+
+    def _trigger(self, key: str, reason: str, now: float):
+        if not self._pending:
+            self._first_trigger = now
+        self._pending[key] = reason
+
+    def next_run(
+        self,
+        wait: Callable[[float], bool],
+        fetch_metrics: Callable[[], Optional[Dict[str, Any]]]
+    ) -> Optional[List[str]]:
+        """
+        Block until an analysis run is due
+
+        Args:
+            wait: Sleeps up to the given seconds; returns True to stop (e.g. Job.wait)
+            fetch_metrics: Returns the current analytics summary
+
+        Returns:
+            The reasons for the run, or None if wait asked to stop
+        """
+        if self._last_run is None:
+            self._trigger('initial', 'initial analysis', float('-inf'))
+
+        while True:
+            now = self.clock()
+            if now >= self._next_metrics:
+                for name, reason in self.check_metrics(fetch_metrics()).items():
+                    self._trigger(f"metric:{name}", reason, now)
+                self._next_metrics = now + self.metrics_poll_seconds
+            if now >= self._next_config:
+                # The initial run reads the config anyway; only later edits are reasons
+                if self.check_config() and self._last_run is not None:
+                    self._trigger('config', 'project configuration changed', now)
+                else:
+                    self._pending.pop('config', None)
+                self._next_config = now + self.config_poll_seconds
+
+            due = float('inf')
+            if self._pending:
+                due = self._first_trigger + self.settle_seconds
+                if self._last_run is not None:
+                    due = max(due, self._last_run + self.min_interval_seconds)
+                if now >= due:
+                    return self._start_run(now)
+
+            sleep = min(self._next_metrics, self._next_config, due) - now
+            if wait(max(0.0, sleep)):
+                return None
+
+    def _start_run(self, now: float) -> List[str]:
+        """Take the pending reasons and make the current state the new baseline"""
+        reasons = list(self._pending.values())
+        self._pending.clear()
+        self._first_trigger = None
+        self._last_run = now
+        self._analysed_metrics = self.metrics
+        self._analysed_config_hash = self._config_hash
+        self.runs += 1
+        self.logger.info(f"Analysis triggered: {'; '.join(reasons)}")
+        return reasons
@@ -0,0 +1,288 @@
+"""
+Analytics Analysis - Vectorized per-page metrics analysis for strategy selection
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Goals the strategy code knows how to act on, and the prompt words that name them
+FOCUS_KEYWORDS = {
+    'performance': ('optimize performance', 'performance', 'speed'),
+    'conversions': ('increase conversions', 'conversion'),
+    'bounce_rate': ('reduce bounce rate', 'bounce')
+}
+
+
+@dataclass
+class PageMetrics:
+    """Per-page daily metrics as dense (pages x days) matrices"""
+    pages: np.ndarray
+    dates: np.ndarray
+    views: np.ndarray
+    sessions: np.ndarray
+    bounces: np.ndarray
+    conversions: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]], start: Optional[date] = None, days: Optional[int] = None) -> 'PageMetrics':
+        """
+        Build the matrices from (page, ISO date, views, sessions, bounce rate, conversions) rows
+
+        This is one Python-level pass over the rows (roughly 0.3 s for 300k
+        plain tuples), which bounds a large property's analysis; analyze()
+        itself only works on the matrices.
+
+        Args:
+            rows: Rows as returned by AnalyticsStore.page_rows
+            start: First day of the matrix; defaults to the earliest row
+            days: Number of day columns; defaults to the span of the rows
+        """
+        if not rows:
+            empty = np.zeros((0, days or 0))
+            first = np.datetime64(start or date.today(), 'D')
+            return cls(np.array([], dtype=object), first + np.arange(days or 0), empty, empty, empty, empty)
+
+        table = np.array(rows, dtype=object)
+        # Pages and dates repeat heavily; encoding them through a dict is much cheaper than sorting strings
+        page_codes: Dict[str, int] = {}
+        page_index = np.fromiter(
+            (page_codes.setdefault(page, len(page_codes)) for page in table[:, 0]), dtype=np.int64, count=len(table)
+        )
+        names = np.array(list(page_codes), dtype=object)
+        date_codes: Dict[str, int] = {}
+        date_index = np.fromiter(
+            (date_codes.setdefault(day, len(date_codes)) for day in table[:, 1]), dtype=np.int64, count=len(table)
+        )
+        day = np.array(list(date_codes), dtype='datetime64[D]')[date_index]
+        first = np.datetime64(start, 'D') if start else day.min()
+        day_index = (day - first).astype(np.int64)
+        n_days = days or int(day_index.max()) + 1
+        keep = (day_index >= 0) & (day_index < n_days)
+        values = table[:, 2:].astype(np.float64)
+
+        def matrix(column: int) -> np.ndarray:
+            out = np.zeros((len(names), n_days))
+            out[page_index[keep], day_index[keep]] = values[keep, column]
+            return out
+
+        sessions = matrix(1)
+        return cls(
+            pages=names,
+            dates=first + np.arange(n_days),
+            views=matrix(0),
+            sessions=sessions,
+            # Bounced sessions, so rates can be re-aggregated over any period
+            bounces=matrix(2) * sessions,
+            conversions=matrix(3)
+        )
+
+
+@dataclass
+class AnalysisResult:
+    """Headline numbers the strategy is chosen from"""
+    recent_days: int
+    views_change: float = 0.0
+    bounce_rate: float = 0.0
+    bounce_delta: float = 0.0
+    conversion_rate: float = 0.0
+    conversion_delta: float = 0.0
+    top_pages: List[Dict[str, Any]] = field(default_factory=list)
+    anomalies: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'recent_days': self.recent_days,
+            'views_change': self.views_change,
+            'bounce_rate': self.bounce_rate,
+            'bounce_delta': self.bounce_delta,
+            'conversion_rate': self.conversion_rate,
+            'conversion_delta': self.conversion_delta,
+            'top_pages': self.top_pages,
+            'anomalies': self.anomalies
+        }
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise numerator / denominator, 0 where the denominator is 0"""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=np.float64), where=denominator > 0)
+
+
+def rolling_baseline(values: np.ndarray, window: int) -> tuple:
+    """
+    Trailing mean and standard deviation of each day's previous window days
+
+    Args:
+        values: (pages x days) matrix
+        window: Days in the baseline
+
+    Returns:
+        (mean, std) matrices for days window..end, aligned with values[:, window:]
+    """
+    padded = np.pad(values, ((0, 0), (1, 0)))
+    sums = np.cumsum(padded, axis=1)
+    squares = np.cumsum(padded * padded, axis=1)
+    window_sums = sums[:, window:-1] - sums[:, :-window - 1]
+    window_squares = squares[:, window:-1] - squares[:, :-window - 1]
+    mean = window_sums / window
+    variance = np.maximum(window_squares / window - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+class AnalyticsAnalyzer:
+    """Rolling baselines, anomalies and period-over-period deltas for every page at once.
+
+    All computations are whole-matrix NumPy operations over the
+    (pages x days) metrics, so cost grows with the number of cells rather
+    than with Python-level loops over pages.
+    """
+
+    def __init__(
+        self,
+        window: int = 7,
+        recent_days: int = 7,
+        z_threshold: float = 3.0,
+        min_baseline_views: float = 10.0,
+        top_n: int = 5,
+        max_anomalies: int = 10
+    ):
+        """
+        Args:
+            window: Days in each rolling baseline
+            recent_days: Days compared against the preceding period of the same length
+            z_threshold: Absolute z-score from which a day counts as anomalous
+            min_baseline_views: Pages averaging fewer daily views are too noisy to flag
+            top_n: Pages (by views) reported with their deltas
+            max_anomalies: Anomalies reported, strongest first
+
+        Raises:
+            ValueError: If recent_days is not positive
+        """
+        if recent_days <= 0:
+            raise ValueError(f"recent_days must be positive, got {recent_days}")
+        self.logger = logging.getLogger(__name__)
+        self.window = window
+        self.recent_days = recent_days
+        self.z_threshold = z_threshold
+        self.min_baseline_views = min_baseline_views
+        self.top_n = top_n
+        self.max_anomalies = max_anomalies
+
+    def analyze(self, metrics: PageMetrics) -> AnalysisResult:
+        result = AnalysisResult(recent_days=self.recent_days)
+        if metrics.views.size == 0:
+            return result
+
+        recent = slice(-self.recent_days, None)
+        previous = slice(-2 * self.recent_days, -self.recent_days)
+
+        # Per-page period totals: (pages,) vectors
+        recent_views = metrics.views[:, recent].sum(axis=1)
+        previous_views = metrics.views[:, previous].sum(axis=1)
+        recent_sessions = metrics.sessions[:, recent].sum(axis=1)
+        previous_sessions = metrics.sessions[:, previous].sum(axis=1)
+        recent_bounce = _ratio(metrics.bounces[:, recent].sum(axis=1), recent_sessions)
+        previous_bounce = _ratio(metrics.bounces[:, previous].sum(axis=1), previous_sessions)
+        recent_conversion = _ratio(metrics.conversions[:, recent].sum(axis=1), recent_sessions)
+        previous_conversion = _ratio(metrics.conversions[:, previous].sum(axis=1), previous_sessions)
+        # Pages without sessions in the earlier period have no delta
+        compared = previous_sessions > 0
+        bounce_delta = np.where(compared, recent_bounce - previous_bounce, 0.0)
+        conversion_delta = np.where(compared, recent_conversion - previous_conversion, 0.0)
+
+        # Site-wide rates, weighted by sessions
+        total_recent, total_previous = recent_sessions.sum(), previous_sessions.sum()
+        result.views_change = float(recent_views.sum() / previous_views.sum() - 1) if previous_views.sum() else 0.0
+        result.bounce_rate = float(metrics.bounces[:, recent].sum() / total_recent) if total_recent else 0.0
+        result.conversion_rate = float(metrics.conversions[:, recent].sum() / total_recent) if total_recent else 0.0
+        if total_previous:
+            result.bounce_delta = result.bounce_rate - float(metrics.bounces[:, previous].sum() / total_previous)
+            result.conversion_delta = result.conversion_rate - float(metrics.conversions[:, previous].sum() / total_previous)
+
+        # Top pages by recent views
+        top_n = min(self.top_n, len(metrics.pages))
+        top = np.argpartition(-recent_views, top_n - 1)[:top_n]
+        top = top[np.argsort(-recent_views[top], kind='stable')]
+        result.top_pages = [
+            {
+                'page': str(metrics.pages[i]),
+                'views': int(recent_views[i]),
+                'bounce_rate': float(recent_bounce[i]),
+                'bounce_delta': float(bounce_delta[i]),
+                'conversion_rate': float(recent_conversion[i]),
+                'conversion_delta': float(conversion_delta[i])
+            }
+            for i in top
+        ]
+
+        result.anomalies = self._anomalies(metrics)
+        return result
+
+    def _anomalies(self, metrics: PageMetrics) -> List[Dict[str, Any]]:
+        """Recent days whose views are more than z_threshold deviations from their page's baseline"""
+        if metrics.views.shape[1] <= self.window:
+            return []
+        mean, std = rolling_baseline(metrics.views, self.window)
+        observed = metrics.views[:, self.window:]
+        z = _ratio(observed - mean, std)
+        # A flat baseline has no deviation to measure against
+        z[(std == 0) | (mean < self.min_baseline_views)] = 0.0
+        z[:, :-self.recent_days] = 0.0
+
+        flagged = np.flatnonzero(np.abs(z) >= self.z_threshold)
+        if flagged.size == 0:
+            return []
+        if flagged.size > self.max_anomalies:
+            strongest = np.argpartition(-np.abs(z.ravel()[flagged]), self.max_anomalies - 1)[:self.max_anomalies]
+            flagged = flagged[strongest]
+        flagged = flagged[np.argsort(-np.abs(z.ravel()[flagged]), kind='stable')]
+        page_index, day_index = np.unravel_index(flagged, z.shape)
+
+        return [
+            {
+                'page': str(metrics.pages[p]),
+                'date': str(metrics.dates[d + self.window]),
+                'views': float(observed[p, d]),
+                'baseline': float(mean[p, d]),
+                'z_score': float(z[p, d])
+            }
+            for p, d in zip(page_index, day_index)
+        ]
+
+
+def choose_focus(
+    result: AnalysisResult,
+    prompt: str = '',
+    bounce_threshold: float = 0.02,
+    conversion_threshold: float = 0.005,
+    traffic_threshold: float = 0.1
+) -> Optional[str]:
+    """
+    Pick the goal to work on: 'performance', 'conversions' or 'bounce_rate'
+
+    Each goal is scored by how far its metric moved the wrong way, in units
+    of its threshold; traffic drops and sudden falls on individual pages
+    count towards performance. A goal named in the prompt gets one extra
+    point, so it wins unless another metric is clearly worse.
+
+    Returns:
+        The goal with the highest positive score, or None if nothing needs attention
+    """
+    scores = {
+        'bounce_rate': max(0.0, result.bounce_delta) / bounce_threshold,
+        'conversions': max(0.0, -result.conversion_delta) / conversion_threshold,
+        'performance': (
+            max(0.0, -result.views_change) / traffic_threshold
+            + 0.5 * sum(1 for anomaly in result.anomalies if anomaly['z_score'] < 0)
+        )
+    }
+    prompt = (prompt or '').lower()
+    for focus, keywords in FOCUS_KEYWORDS.items():
+        if any(keyword in prompt for keyword in keywords):
+            scores[focus] += 1.0
+
+    focus, score = max(scores.items(), key=lambda item: item[1])
+    return focus if score > 0 else None
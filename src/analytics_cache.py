@@ -0,0 +1,101 @@
+"""
+Analytics Cache - TTL cache with single-flight fetches for analytics reports
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """An in-progress fetch that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class AnalyticsCache:
+    """Caches report results per key for ttl_seconds.
+
+    Concurrent misses for the same key are coalesced: the first caller
+    fetches while the others wait for its result, so each distinct report
+    is requested at most once per interval however many loops, dashboard
+    tabs or jobs ask for it. Results rejected by ``should_cache`` (by
+    default None, which the fetchers return on errors) are handed to the
+    waiting callers but not kept.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30,
+        should_cache: Optional[Callable[[Any], bool]] = None,
+        max_entries: int = 256
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.should_cache = should_cache or (lambda value: value is not None)
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, tuple] = {}
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling fetch at most once if it is missing or stale
+
+        Raises:
+            Whatever fetch raised, to every caller waiting on that fetch
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and self.should_cache(flight.value):
+                    if len(self._entries) >= self.max_entries:
+                        self._purge_expired()
+                    self._entries[key] = (flight.value, time.monotonic() + self.ttl_seconds)
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one cached entry, or all of them"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _purge_expired(self):
+        """Remove expired entries so keys nobody requests any more do not accumulate; caller holds the lock"""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
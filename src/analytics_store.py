@@ -0,0 +1,287 @@
+"""
+Analytics Store - Local SQLite time series of GA metrics with incremental sync
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .ga_reports import ReportRequest, ReportStream
+
+# Metrics stored for every (property, date, page) row and for the site-wide daily rows
+METRICS = [
+    'activeUsers', 'sessions', 'bounceRate', 'averageSessionDuration',
+    'screenPageViews', 'newUsers', 'conversions'
+]
+# Row kinds: one site-wide row per day, and one row per page path and day
+SITE = 'site'
+PAGE = 'page'
+INSERT_BATCH = 1000
+# Version 1 keys pages by path (with a separate kind column) instead of by title
+SCHEMA_VERSION = 1
+
+
+def resolve_date(value: str, today: Optional[date] = None) -> date:
+    """
+    Resolve a GA date expression ('today', 'yesterday', 'NdaysAgo' or YYYY-MM-DD)
+
+    Args:
+        value: Date expression
+        today: Reference date, defaults to the current date
+    """
+    today = today or date.today()
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    match = re.fullmatch(r'(\d+)daysAgo', value)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    return date.fromisoformat(value)
+
+
+class AnalyticsStore:
+    """Keeps daily GA metrics per property and page in SQLite.
+
+    The first sync of a property fetches history_days of data; later syncs
+    fetch only from the last synced date minus late_days, because GA keeps
+    revising the most recent days as late hits are processed. Those dates
+    are replaced in a single transaction, so a failed or partial fetch
+    leaves the previous data in place and readers never depend on the API
+    being reachable.
+    """
+
+    def __init__(self, path: str = 'cache/analytics.sqlite', history_days: int = 30, late_days: int = 3):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.history_days = history_days
+        self.late_days = late_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = ',\n'.join(f'{name} REAL NOT NULL DEFAULT 0' for name in METRICS)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Rows of older versions cannot be converted; the next sync fetches the history again
+                conn.execute("DROP TABLE IF EXISTS daily_metrics")
+                conn.execute("DROP TABLE IF EXISTS sync_state")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS daily_metrics (
+                    property_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    page TEXT NOT NULL,
+                    {columns},
+                    PRIMARY KEY (property_id, date, kind, page)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    property_id TEXT PRIMARY KEY,
+                    last_date TEXT NOT NULL,
+                    synced_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        """The shared connection used for reads; caller holds the lock"""
+        if self._conn is None:
+            self._conn = self._open()
+        return self._conn
+
+    def last_synced(self, property_id: str) -> Optional[date]:
+        """The most recent date included in a completed sync, or None if never synced"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT last_date FROM sync_state WHERE property_id = ?", (str(property_id),)
+            ).fetchone()
+        return date.fromisoformat(row['last_date']) if row else None
+
+    def sync_start(self, property_id: str, today: Optional[date] = None) -> date:
+        """First date the next sync has to fetch"""
+        today = today or date.today()
+        history_start = today - timedelta(days=self.history_days - 1)
+        last = self.last_synced(property_id)
+        if last is None:
+            return history_start
+        return max(history_start, min(last, today) - timedelta(days=self.late_days))
+
+    def sync(self, client, property_id: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Fetch the dates missing from the store and replace them
+
+        Args:
+            client: GAClient for the property
+            property_id: Analytics property
+            today: Last date to fetch, defaults to the current date
+
+        Returns:
+            Dict with the fetched date range and number of rows stored
+        """
+        property_id = str(property_id)
+        today = today or date.today()
+        start = self.sync_start(property_id, today)
+        date_range = [{'startDate': start.isoformat(), 'endDate': today.isoformat()}]
+        metrics = [{'name': name} for name in METRICS]
+
+        stream = ReportStream(client, property_id, [
+            ReportRequest('pages', {
+                'dateRanges': date_range,
+                'metrics': metrics,
+                'dimensions': [{'name': 'date'}, {'name': 'pagePath'}]
+            }),
+            ReportRequest('site', {
+                'dateRanges': date_range,
+                'metrics': metrics,
+                'dimensions': [{'name': 'date'}]
+            })
+        ])
+
+        placeholders = ', '.join('?' * (len(METRICS) + 4))
+        insert = f"INSERT INTO temp.staged (property_id, date, kind, page, {', '.join(METRICS)}) VALUES ({placeholders})"
+        stored = 0
+        # Rows are staged in a temporary table while pages arrive, so the
+        # database is only locked for the final swap, never during the fetch
+        conn = self._open()
+        try:
+            conn.execute("CREATE TEMP TABLE staged AS SELECT * FROM daily_metrics WHERE 0")
+            batch = []
+            for name, row in stream:
+                kind, page = (PAGE, row.get('pagePath', '')) if name == 'pages' else (SITE, '')
+                batch.append(
+                    (property_id, self._iso_date(row['date']), kind, page)
+                    + tuple(float(row.get(metric) or 0) for metric in METRICS)
+                )
+                if len(batch) >= INSERT_BATCH:
+                    conn.executemany(insert, batch)
+                    stored += len(batch)
+                    batch = []
+            conn.executemany(insert, batch)
+            stored += len(batch)
+            conn.commit()
+
+            with conn:
+                conn.execute(
+                    "DELETE FROM daily_metrics WHERE property_id = ? AND date >= ? AND date <= ?",
+                    (property_id, start.isoformat(), today.isoformat())
+                )
+                conn.execute("INSERT OR REPLACE INTO daily_metrics SELECT * FROM temp.staged")
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (property_id, last_date, synced_at) VALUES (?, ?, ?)",
+                    (property_id, today.isoformat(), time.time())
+                )
+        finally:
+            conn.close()
+
+        self.logger.info(f"Synced {stored} analytics rows for property {property_id} from {start}")
+        return {'start': start.isoformat(), 'end': today.isoformat(), 'rows': stored, 'requests': stream.requests_made}
+
+    @staticmethod
+    def _iso_date(value: str) -> str:
+        """GA reports dates as YYYYMMDD"""
+        return datetime.strptime(value, '%Y%m%d').date().isoformat()
+
+    def has_data(self, property_id: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM daily_metrics WHERE property_id = ? LIMIT 1", (str(property_id),)
+            ).fetchone()
+        return row is not None
+
+    def daily(self, property_id: str, since: str = '7daysAgo') -> List[Dict[str, Any]]:
+        """Site-wide metrics per day, oldest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"""
+                SELECT date, {', '.join(METRICS)} FROM daily_metrics
+                WHERE property_id = ? AND kind = ? AND date >= ? ORDER BY date
+                """,
+                (str(property_id), SITE, resolve_date(since).isoformat())
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def summary(self, property_id: str, days: int = 30, top_pages: int = 5, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Totals over the last days, in the shape the strategy code expects
+
+        Users are the sum of daily active users, so a user active on two days
+        counts twice; rates are weighted by sessions.
+        """
+        since = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            conn = self._connect()
+            totals = conn.execute(
+                """
+                SELECT SUM(activeUsers) AS users, SUM(sessions) AS sessions,
+                       SUM(bounceRate * sessions) AS bounces, SUM(averageSessionDuration * sessions) AS duration,
+                       SUM(screenPageViews) AS page_views, SUM(newUsers) AS new_users, SUM(conversions) AS conversions
+                FROM daily_metrics WHERE property_id = ? AND kind = ? AND date >= ?
+                """,
+                (str(property_id), SITE, since)
+            ).fetchone()
+            pages = conn.execute(
+                """
+                SELECT page, SUM(screenPageViews) AS views FROM daily_metrics
+                WHERE property_id = ? AND kind = ? AND date >= ?
+                GROUP BY page ORDER BY views DESC LIMIT ?
+                """,
+                (str(property_id), PAGE, since, top_pages)
+            ).fetchall()
+
+        sessions = totals['sessions'] or 0
+        page_views = totals['page_views'] or 0
+        return {
+            'users': int(totals['users'] or 0),
+            'sessions': int(sessions),
+            'bounce_rate': (totals['bounces'] or 0) / sessions if sessions else 0.0,
+            'avg_session_duration': (totals['duration'] or 0) / sessions if sessions else 0.0,
+            'page_views': int(page_views),
+            'pages_per_session': page_views / sessions if sessions else 0.0,
+            'new_users': int(totals['new_users'] or 0),
+            'conversions': int(totals['conversions'] or 0),
+            'top_pages': [{'page': row['page'], 'views': int(row['views'])} for row in pages]
+        }
+
+    def page_rows(self, property_id: str, days: int = 30, today: Optional[date] = None) -> List[tuple]:
+        """
+        Per-page daily rows for the last days, for columnar analysis
+
+        Returns:
+            (page, date, screenPageViews, sessions, bounceRate, conversions) tuples
+        """
+        since = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            cursor = self._connect().cursor()
+            # Plain tuples: NumPy converts them several times faster than sqlite3.Row objects
+            cursor.row_factory = None
+            return cursor.execute(
+                """
+                SELECT page, date, screenPageViews, sessions, bounceRate, conversions FROM daily_metrics
+                WHERE property_id = ? AND kind = ? AND date >= ?
+                """,
+                (str(property_id), PAGE, since)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,473 @@
+"""
+Backup Store - Content-addressed, compressed backups with a SQLite index
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits on how many backups are kept; None disables a limit"""
+    max_per_file: Optional[int] = None
+    max_total_bytes: Optional[int] = None
+    max_age_days: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(limit is not None for limit in (self.max_per_file, self.max_total_bytes, self.max_age_days))
+
+
+class BackupStore:
+    """Stores each distinct file content once, compressed, under its SHA-256.
+
+    ``index.sqlite`` maps (original path, time) to content digests, so
+    lookups by file are index seeks rather than directory listings, and
+    repeated backups of unchanged content only add an index row.
+
+    Content a writer may still need for a rollback is pinned by the
+    writer's process; retention never deletes backups of pinned content.
+    """
+
+    def __init__(self, root: Path, compression: str = 'auto'):
+        self.logger = logging.getLogger(__name__)
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        if compression == 'auto':
+            compression = 'zstd' if zstandard else 'gzip'
+        if compression == 'zstd' and not zstandard:
+            self.logger.warning("zstandard is not installed, falling back to gzip backups")
+            compression = 'gzip'
+        self.codec = compression
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Paths backed up since their per-file limit was last enforced
+        self._dirty_paths: Set[str] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index lazily, creating the schema if needed"""
+        if self._conn is None:
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.root / 'index.sqlite'), timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    digest TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    stored_size INTEGER NOT NULL,
+                    codec TEXT NOT NULL,
+                    refcount INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS backups (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    original_path TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    digest TEXT NOT NULL REFERENCES objects (digest)
+                );
+                CREATE INDEX IF NOT EXISTS idx_backups_path_time ON backups (original_path, created_at);
+                CREATE INDEX IF NOT EXISTS idx_backups_time ON backups (created_at);
+                CREATE TABLE IF NOT EXISTS stats (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (key, value) VALUES ('stored_bytes', 0);
+                CREATE TABLE IF NOT EXISTS pins (
+                    digest TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (digest, pid)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def path_key(file_path: Path) -> str:
+        """Normalise a file path into the key backups are indexed by"""
+        return str(Path(file_path).resolve())
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _decompress(self, data: bytes, codec: str) -> bytes:
+        if codec == 'zstd':
+            if not zstandard:
+                raise RuntimeError("zstandard is required to read this backup")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put(self, file_path: Path, content: Optional[bytes] = None, pin: bool = False) -> Dict[str, Any]:
+        """
+        Back up a file
+
+        Args:
+            file_path: File being backed up
+            content: Its current bytes, read from disk if None
+            pin: Also pin the content, in the same transaction, until unpin()
+
+        Returns:
+            The backup record
+        """
+        if content is None:
+            content = Path(file_path).read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        key = self.path_key(file_path)
+        created_at = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            # The check, the object write and the refcount change form one write
+            # transaction, so processes sharing the store never race on an object
+            with self._immediate(conn):
+                existing = conn.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone()
+                stored_size = 0
+                if not existing:
+                    stored_size = self._write_object(digest, content)
+                elif not self._object_path(digest).exists():
+                    # Indexed but missing on disk, e.g. removed by an interrupted delete
+                    self._write_object(digest, content)
+                conn.execute(
+                    """
+                    INSERT INTO objects (digest, size, stored_size, codec, refcount) VALUES (?, ?, ?, ?, 1)
+                    ON CONFLICT (digest) DO UPDATE SET refcount = refcount + 1
+                    """,
+                    (digest, len(content), stored_size, self.codec)
+                )
+                if not existing:
+                    conn.execute("UPDATE stats SET value = value + ? WHERE key = 'stored_bytes'", (stored_size,))
+                cursor = conn.execute(
+                    "INSERT INTO backups (original_path, created_at, digest) VALUES (?, ?, ?)",
+                    (key, created_at, digest)
+                )
+                if pin:
+                    self._pin(conn, digest)
+
+            record = {
+                'id': cursor.lastrowid,
+                'original_path': key,
+                'created_at': created_at,
+                'digest': digest,
+                'size': len(content)
+            }
+            self._dirty_paths.add(key)
+
+        self.logger.debug(f"Backed up {key} as {digest[:12]} ({'deduplicated' if existing else 'stored'})")
+        return record
+
+    @staticmethod
+    @contextmanager
+    def _immediate(conn: sqlite3.Connection):
+        """A write transaction that takes the database lock up front"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _write_object(self, digest: str, content: bytes) -> int:
+        """Write a compressed object atomically, returning its stored size"""
+        object_path = self._object_path(digest)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = self._compress(content)
+        fd, tmp_name = tempfile.mkstemp(dir=object_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_name, object_path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return len(compressed)
+
+    def get(self, backup_id: int) -> Optional[Dict[str, Any]]:
+        """Get a backup record by id"""
+        with self._lock:
+            row = self._connect().execute(
+                """
+                SELECT b.id, b.original_path, b.created_at, b.digest, o.size, o.stored_size
+                FROM backups b JOIN objects o ON o.digest = b.digest
+                WHERE b.id = ?
+                """,
+                (backup_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def read(self, backup_id: int) -> Optional[bytes]:
+        """Read the original content of a backup"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT o.digest, o.codec FROM backups b JOIN objects o ON o.digest = b.digest WHERE b.id = ?",
+                (backup_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return self.read_object(row['digest'], row['codec'])
+
+    def read_object(self, digest: str, codec: Optional[str] = None) -> bytes:
+        """Read content by digest"""
+        if codec is None:
+            with self._lock:
+                row = self._connect().execute("SELECT codec FROM objects WHERE digest = ?", (digest,)).fetchone()
+            if not row:
+                raise KeyError(digest)
+            codec = row['codec']
+        return self._decompress(self._object_path(digest).read_bytes(), codec)
+
+    def latest(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Get the most recent backup of a file"""
+        backups = self.list(file_path, limit=1)
+        return backups[0] if backups else None
+
+    def list(self, file_path: Optional[Path] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List backups, newest first
+
+        Args:
+            file_path: Only list backups of this file
+            limit: Maximum number of records to return
+        """
+        query = """
+            SELECT b.id, b.original_path, b.created_at, b.digest, o.size, o.stored_size
+            FROM backups b JOIN objects o ON o.digest = b.digest
+        """
+        params: list = []
+        if file_path is not None:
+            query += " WHERE b.original_path = ?"
+            params.append(self.path_key(file_path))
+        query += " ORDER BY b.created_at DESC, b.id DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, backup_id: int, keep_pinned: bool = False) -> bool:
+        """
+        Delete a backup, removing its object once nothing references it
+
+        Args:
+            backup_id: Backup to delete
+            keep_pinned: Leave the backup alone if its content is pinned
+
+        Returns:
+            True if the backup was deleted
+        """
+        with self._lock:
+            conn = self._connect()
+            with self._immediate(conn):
+                row = conn.execute("SELECT digest FROM backups WHERE id = ?", (backup_id,)).fetchone()
+                if not row:
+                    return False
+                digest = row['digest']
+                if keep_pinned and conn.execute("SELECT 1 FROM pins WHERE digest = ?", (digest,)).fetchone():
+                    return False
+                conn.execute("DELETE FROM backups WHERE id = ?", (backup_id,))
+                conn.execute("UPDATE objects SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+                orphan = conn.execute(
+                    "SELECT stored_size FROM objects WHERE digest = ? AND refcount <= 0", (digest,)
+                ).fetchone()
+                if orphan:
+                    conn.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+                    conn.execute(
+                        "UPDATE stats SET value = value - ? WHERE key = 'stored_bytes'", (orphan['stored_size'],)
+                    )
+                    # Still inside the transaction: no other process can re-reference it meanwhile
+                    self._object_path(digest).unlink(missing_ok=True)
+        return True
+
+    @staticmethod
+    def _pin(conn: sqlite3.Connection, digest: str):
+        conn.execute(
+            "INSERT INTO pins (digest, pid, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (digest, pid) DO UPDATE SET count = count + 1",
+            (digest, os.getpid())
+        )
+
+    def pin(self, digest: str):
+        """Keep retention away from backups of this content until unpin()"""
+        with self._lock:
+            conn = self._connect()
+            with self._immediate(conn):
+                self._pin(conn, digest)
+
+    def unpin(self, digest: str, count: int = 1):
+        """Drop count pins this process holds on the content"""
+        with self._lock:
+            conn = self._connect()
+            with self._immediate(conn):
+                conn.execute(
+                    "UPDATE pins SET count = count - ? WHERE digest = ? AND pid = ?", (count, digest, os.getpid())
+                )
+                conn.execute("DELETE FROM pins WHERE digest = ? AND pid = ? AND count <= 0", (digest, os.getpid()))
+
+    def release_stale_pins(self, alive: Callable[[int], bool]) -> int:
+        """
+        Drop the pins of processes that have exited
+
+        Args:
+            alive: Tells whether a process id is still running
+
+        Returns:
+            Number of processes whose pins were dropped
+        """
+        with self._lock:
+            conn = self._connect()
+            with self._immediate(conn):
+                pids = [row['pid'] for row in conn.execute("SELECT DISTINCT pid FROM pins").fetchall()]
+                stale = [pid for pid in pids if not alive(pid)]
+                for pid in stale:
+                    conn.execute("DELETE FROM pins WHERE pid = ?", (pid,))
+        if stale:
+            self.logger.info(f"Released backup pins of {len(stale)} exited processes")
+        return len(stale)
+
+    def stored_bytes(self) -> int:
+        """Total compressed size of all stored objects"""
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM stats WHERE key = 'stored_bytes'").fetchone()
+        return row['value'] if row else 0
+
+    def mark_all_dirty(self):
+        """Queue every indexed path for a per-file retention check"""
+        with self._lock:
+            rows = self._connect().execute("SELECT DISTINCT original_path FROM backups").fetchall()
+            self._dirty_paths.update(row['original_path'] for row in rows)
+
+    def enforce_retention(self, policy: RetentionPolicy, budget: int = 200) -> int:
+        """
+        Delete backups that fall outside the policy, doing at most budget deletions
+
+        Every step is an index seek, so this can be called repeatedly in the
+        background. Per-file limits are only checked for paths backed up
+        since the last call. Backups of pinned content are kept.
+
+        Returns:
+            Number of backups deleted; equal to budget if work may remain
+        """
+        deleted = 0
+
+        if policy.max_age_days is not None and deleted < budget:
+            cutoff = time.time() - policy.max_age_days * 86400
+            with self._lock:
+                rows = self._connect().execute(
+                    """
+                    SELECT id FROM backups WHERE created_at < ? AND digest NOT IN (SELECT digest FROM pins)
+                    ORDER BY created_at LIMIT ?
+                    """,
+                    (cutoff, budget - deleted)
+                ).fetchall()
+            for row in rows:
+                deleted += self.delete(row['id'], keep_pinned=True)
+
+        if policy.max_per_file is not None:
+            while self._dirty_paths and deleted < budget:
+                with self._lock:
+                    key = self._dirty_paths.pop()
+                    rows = self._connect().execute(
+                        """
+                        SELECT id FROM backups WHERE original_path = ?
+                        ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+                        """,
+                        (key, budget - deleted, policy.max_per_file)
+                    ).fetchall()
+                    if len(rows) == budget - deleted:
+                        # More to delete than this call may do - check the path again next time
+                        self._dirty_paths.add(key)
+                for row in rows:
+                    deleted += self.delete(row['id'], keep_pinned=True)
+
+        if policy.max_total_bytes is not None:
+            while deleted < budget and self.stored_bytes() > policy.max_total_bytes:
+                with self._lock:
+                    rows = self._connect().execute(
+                        """
+                        SELECT id FROM backups WHERE digest NOT IN (SELECT digest FROM pins)
+                        ORDER BY created_at, id LIMIT ?
+                        """,
+                        (min(50, budget - deleted),)
+                    ).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    deleted += self.delete(row['id'], keep_pinned=True)
+                    if self.stored_bytes() <= policy.max_total_bytes:
+                        break
+
+        if deleted:
+            self.logger.info(f"Retention removed {deleted} backups")
+        return deleted
+
+    def close(self):
+        """Close the index"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RetentionWorker(threading.Thread):
+    """Applies a retention policy in small steps on a background thread.
+
+    The worker wakes when notified of new backups or every interval, and
+    keeps working in budget-sized steps until nothing is left to delete.
+    """
+
+    def __init__(self, store: BackupStore, policy: RetentionPolicy, interval_seconds: float = 60, budget: int = 200):
+        super().__init__(name='backup-retention', daemon=True)
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self.budget = budget
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self):
+        """Ask the worker to run soon, e.g. after new backups were written"""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Stop the worker after its current step"""
+        self._stopping.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        try:
+            self.store.mark_all_dirty()
+        except Exception as e:
+            self.logger.error(f"Error preparing backup retention: {e}")
+
+        while not self._stopping.is_set():
+            try:
+                while not self._stopping.is_set() and self.store.enforce_retention(self.policy, self.budget) >= self.budget:
+                    # Yield between steps so foreground backups are not starved of the index lock
+                    time.sleep(0.01)
+            except Exception as e:
+                self.logger.error(f"Error applying backup retention: {e}")
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
@@ -5,6 +5,7 @@ CLI - Command-line interface and interactive chat functionality
 import logging
 import sys
 import time
+from pathlib import Path
 from typing import Dict, Any, List, Optional
 import typer
 from rich.console import Console
@@ -15,6 +16,7 @@ from rich.prompt import Prompt, Confirm
 from rich.text import Text
 
 from .task_manager import TaskManager
+from .run_planner import RunPlanner
 
 
 class CLI:
@@ -178,7 +180,12 @@ class CLI:
         ) as progress:
             task = progress.add_task(f"Executing {tasks_created} tasks...", total=tasks_created)
             
-            results = self.task_manager.execute_all_tasks()
+            def on_progress(event: Dict[str, Any]):
+                if event["event"] == "task_finished":
+                    progress.advance(task)
+                    progress.update(task, description=f"Finished {event['repo']}: {event['goal']}")
+            
+            results = self.task_manager.execute_all_tasks(progress_callback=on_progress)
             
             progress.update(task, completed=tasks_created)
         
@@ -220,6 +227,73 @@ class CLI:
             
             self.console.print(repo_table)
     
+    def _show_plan(self, repo_name: Optional[str] = None, goal: Optional[str] = None):
+        """Show estimated files, tokens, cost and wall time without calling any provider"""
+        repos = [repo['name'] for repo in self._get_available_repositories()]
+        if repo_name:
+            repos = [name for name in repos if name == repo_name]
+        if goal:
+            goals = [self._get_available_goals().get(goal, goal)]
+        else:
+            goals = self.task_manager.get_default_goals()
+        
+        if not repos or not goals:
+            self.console.print("[red]No repositories or goals to plan[/red]")
+            return
+        
+        tasks = [self.task_manager.build_task(name, g) for name in repos for g in goals]
+        planner = RunPlanner(self.task_manager)
+        estimates = planner.plan(tasks)
+        
+        plan_table = Table(title="Run Plan")
+        plan_table.add_column("Repository", style="cyan")
+        plan_table.add_column("Goal", style="white")
+        plan_table.add_column("Provider", style="magenta")
+        plan_table.add_column("Files (sent/cached)", style="blue", justify="right")
+        plan_table.add_column("Input tokens", justify="right")
+        plan_table.add_column("Output tokens", justify="right")
+        plan_table.add_column("Cost", style="green", justify="right")
+        plan_table.add_column("Wall time", style="yellow", justify="right")
+        
+        for estimate in estimates:
+            latency_note = "" if estimate.latency_from_history else "*"
+            plan_table.add_row(
+                estimate.repo_name,
+                estimate.goal,
+                estimate.provider,
+                f"{estimate.files_to_send}/{estimate.files_cached}",
+                f"{estimate.input_tokens:,}",
+                f"{estimate.output_tokens:,}",
+                f"${estimate.cost:.2f}",
+                f"{estimate.wall_seconds / 60:.1f} min{latency_note}"
+            )
+        
+        self.console.print(plan_table)
+        
+        for provider in planner.get_providers():
+            total_cost = sum(e.cost for e in estimates if e.provider == provider)
+            total_wall = planner.estimate_total_wall_seconds(estimates, provider)
+            self.console.print(
+                f"[bold]{provider}[/bold]: ${total_cost:.2f} total, about {total_wall / 60:.1f} min wall time"
+            )
+        if any(not e.latency_from_history for e in estimates):
+            self.console.print(
+                f"* no latency history yet, assuming {RunPlanner.DEFAULT_LATENCY_SECONDS:.0f}s per file"
+            )
+    
+    def _apply_bundle(self, bundle: str, repo_path: Optional[str] = None):
+        """Apply a patch bundle from a preview run"""
+        summary = self.task_manager.apply_bundle(Path(bundle), Path(repo_path) if repo_path else None)
+        
+        for path in summary['drifted']:
+            self.console.print(f"[yellow]{path} changed since the bundle was written[/yellow]")
+        if summary['errors']:
+            for error in summary['errors']:
+                self.console.print(f"[red]{error}[/red]")
+            self.console.print("[red]Bundle not applied[/red]")
+            return
+        self.console.print(f"[green]Applied {len(summary['applied'])} files from {bundle}[/green]")
+    
     def _configure_repositories(self):
         """Configure repositories interactively"""
         self.console.print("[yellow]Repository configuration is done via config/settings.yaml[/yellow]")
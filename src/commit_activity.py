@@ -0,0 +1,156 @@
+"""
+Commit Activity - Incremental per-repository commit counters for the dashboard
+"""
+
+import logging
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .shared_state import SharedState
+
+# Unit separator between fields of one --format line
+_FIELD = '\x1f'
+
+
+class CommitActivityError(Exception):
+    """Raised when git cannot describe a working copy's commits"""
+
+
+@dataclass
+class CommitInfo:
+    """One commit seen in a tracked working copy"""
+    sha: str
+    repo: str
+    author: str
+    timestamp: int
+    message: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class CommitActivity:
+    """Counts new commits from the last HEAD seen in each working copy.
+
+    ``track`` records a working copy's HEAD when it is checked out;
+    ``update`` asks git only for the commits between that HEAD and the
+    current one, so the cost of an update depends on what changed rather
+    than on the history. Counts and the most recent commits are kept per
+    repository (several working copies of one repository add up) and
+    across all of them, so the dashboard reads them without any git call.
+
+    The last seen HEADs, counts and recent commits live in a SharedState,
+    so with several worker processes each commit is counted once and every
+    worker reports the same activity.
+    """
+
+    def __init__(self, recent_size: int = 50, state: Optional[SharedState] = None):
+        """
+        Args:
+            recent_size: Commits kept per repository and in the overall recent list
+            state: Store shared by the worker processes; an in-memory one if None
+        """
+        self.logger = logging.getLogger(__name__)
+        self.recent_size = recent_size
+        self.state = state or SharedState(':memory:')
+
+    @staticmethod
+    def _git(repo_path: str, *args: str) -> str:
+        result = subprocess.run(['git', '-C', repo_path, *args], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommitActivityError(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout.strip()
+
+    def _head(self, repo_path: str) -> Optional[str]:
+        try:
+            return self._git(repo_path, 'rev-parse', '--verify', '-q', 'HEAD')
+        except CommitActivityError:
+            # Unborn branch
+            return None
+
+    @staticmethod
+    def _key(repo_path: str) -> str:
+        return str(Path(repo_path).resolve())
+
+    def track(self, repo_path: str, repo: Optional[str] = None) -> Optional[str]:
+        """
+        Start counting from a working copy's current HEAD
+
+        Commits already in the history are not activity; call this after
+        every fresh checkout, which replaces whatever was tracked at the path.
+
+        Args:
+            repo_path: Working copy
+            repo: Repository name used for the counters, defaults to the directory name
+
+        Returns:
+            The HEAD commit counting starts from
+        """
+        head = self._head(repo_path)
+        self.state.track_head(self._key(repo_path), repo or Path(repo_path).name, head)
+        return head
+
+    def update(self, repo_path: str) -> List[CommitInfo]:
+        """
+        Count the commits made since the last seen HEAD
+
+        An untracked working copy is tracked from its current HEAD. If the
+        last seen HEAD is no longer in the repository (history rewritten),
+        counting restarts from the current HEAD.
+
+        Returns:
+            The new commits, oldest first
+        """
+        key = self._key(repo_path)
+        while True:
+            tracked = self.state.tracked_head(key)
+            if tracked is None:
+                self.track(repo_path)
+                return []
+
+            head = self._head(repo_path)
+            if head is None or head == tracked['head']:
+                return []
+            try:
+                commits = self._commits_between(repo_path, tracked['repo'], tracked['head'], head)
+            except CommitActivityError as e:
+                self.logger.warning(f"Restarting commit count for {repo_path}: {e}")
+                self.state.advance_head(key, tracked['head'], head, [], self.recent_size)
+                return []
+            if self.state.advance_head(key, tracked['head'], head, [c.to_dict() for c in commits], self.recent_size):
+                return commits
+            # Another worker recorded these commits first; count whatever it did not
+
+    def _commits_between(self, repo_path: str, repo: str, old: Optional[str], new: str) -> List[CommitInfo]:
+        revision = f"{old}..{new}" if old else new
+        output = self._git(
+            repo_path, 'log', '--reverse', f'--format=%H{_FIELD}%an{_FIELD}%ct{_FIELD}%s', revision, '--'
+        )
+        commits = []
+        for line in output.splitlines():
+            sha, author, timestamp, message = line.split(_FIELD, 3)
+            commits.append(CommitInfo(sha=sha, repo=repo, author=author, timestamp=int(timestamp), message=message))
+        return commits
+
+    def summary(self, repo: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Counters and recent commits, newest first
+
+        Args:
+            repo: Only this repository's recent commits; None for all
+            limit: At most this many recent commits
+        """
+        limit = self.recent_size if limit is None else min(limit, self.recent_size)
+        counts = self.state.commit_counts()
+        repos = {}
+        for name, count in counts.items():
+            # Counted commits may all have been trimmed from the recent list
+            last = self.state.recent_commits(name, limit=1)
+            repos[name] = {'commits': count, 'last_commit': last[0] if last else None}
+        return {
+            'total': sum(counts.values()),
+            'repos': repos,
+            'recent': self.state.recent_commits(repo, limit=limit)
+        }
@@ -0,0 +1,214 @@
+"""
+Credential Store - Server-side OAuth grants shared by requests and background workers
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from google.oauth2.credentials import Credentials
+
+from .ga_client import GAClient, GAClientCache
+
+
+class CredentialStore:
+    """Keeps each user's OAuth grant in SQLite, linked to the properties they use.
+
+    Background jobs have no Flask session, so they look credentials up here
+    by property (and user, when known). Clients come from a shared
+    GAClientCache, so every session and poller using the same grant shares
+    one authorized client, and a refreshed token is written back once for
+    all of them.
+    """
+
+    def __init__(self, path: str = 'cache/credentials.sqlite', clients: Optional[GAClientCache] = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.clients = clients or GAClientCache()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Tokens are secrets: create the database readable by this user only
+            if not self.path.exists():
+                os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS grants (
+                    user_id TEXT PRIMARY KEY,
+                    credentials TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS property_users (
+                    property_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL REFERENCES grants (user_id) ON DELETE CASCADE,
+                    linked_at REAL NOT NULL,
+                    PRIMARY KEY (property_id, user_id)
+                );
+                CREATE TABLE IF NOT EXISTS property_access (
+                    property_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL REFERENCES grants (user_id) ON DELETE CASCADE,
+                    verified_at REAL NOT NULL,
+                    PRIMARY KEY (property_id, user_id)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _serialize(credentials: Credentials) -> str:
+        return json.dumps({
+            'token': credentials.token,
+            'refresh_token': credentials.refresh_token,
+            'token_uri': credentials.token_uri,
+            'client_id': credentials.client_id,
+            'client_secret': credentials.client_secret,
+            'scopes': credentials.scopes,
+            'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+        })
+
+    @staticmethod
+    def _deserialize(data: str) -> Credentials:
+        info = json.loads(data)
+        expiry = info.pop('expiry', None)
+        credentials = Credentials(**info)
+        if expiry:
+            credentials.expiry = datetime.fromisoformat(expiry)
+        return credentials
+
+    def save(self, user_id: str, credentials: Any):
+        """
+        Store a user's grant, replacing any previous one
+
+        Args:
+            user_id: Stable id for the signed-in user
+            credentials: Credentials, or the dict kept in the Flask session
+        """
+        if isinstance(credentials, dict):
+            credentials = Credentials(**credentials)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO grants (user_id, credentials, updated_at) VALUES (?, ?, ?)",
+                    (user_id, self._serialize(credentials), time.time())
+                )
+
+    def link_property(self, user_id: str, property_id: str):
+        """Record that a user works with a property, so jobs for it can use their grant"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO property_users (property_id, user_id, linked_at) VALUES (?, ?, ?)",
+                    (str(property_id), user_id, time.time())
+                )
+
+    def record_access(self, user_id: str, property_id: str, allowed: bool = True):
+        """Record whether a user's grant could read a property's reports"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if allowed:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO property_access (property_id, user_id, verified_at) VALUES (?, ?, ?)",
+                        (str(property_id), user_id, time.time())
+                    )
+                else:
+                    conn.execute(
+                        "DELETE FROM property_access WHERE property_id = ? AND user_id = ?",
+                        (str(property_id), user_id)
+                    )
+
+    def has_access(self, user_id: str, property_id: str) -> bool:
+        """Whether the user's own grant has read the property's reports successfully"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM property_access WHERE property_id = ? AND user_id = ?", (str(property_id), user_id)
+            ).fetchone()
+        return row is not None
+
+    def load(self, property_id: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Credentials]:
+        """
+        Find stored credentials
+
+        With a user id, that user's grant is returned. With only a property,
+        the grant of the user who most recently linked it is used.
+        """
+        found = self._find(property_id, user_id)
+        return found[1] if found else None
+
+    def _find(self, property_id: Optional[str], user_id: Optional[str]) -> Optional[Tuple[str, Credentials]]:
+        """Look up (owner user id, credentials)"""
+        with self._lock:
+            conn = self._connect()
+            if user_id:
+                row = conn.execute(
+                    "SELECT user_id, credentials FROM grants WHERE user_id = ?", (user_id,)
+                ).fetchone()
+            elif property_id:
+                row = conn.execute(
+                    """
+                    SELECT g.user_id, g.credentials FROM property_users p JOIN grants g ON g.user_id = p.user_id
+                    WHERE p.property_id = ? ORDER BY p.linked_at DESC LIMIT 1
+                    """,
+                    (str(property_id),)
+                ).fetchone()
+            else:
+                row = None
+        return (row['user_id'], self._deserialize(row['credentials'])) if row else None
+
+    def client_for(self, property_id: Optional[str] = None, user_id: Optional[str] = None) -> Optional[GAClient]:
+        """
+        Get the shared authorized client for a property or user
+
+        Returns:
+            The client, or None if no usable credentials are stored
+        """
+        found = self._find(property_id, user_id)
+        if found is None:
+            return None
+        owner, credentials = found
+        client = self.clients.get(credentials, on_refresh=lambda refreshed: self.save(owner, refreshed))
+
+        # Another process may have refreshed the token since this client was built
+        with client.lock:
+            current = client.credentials
+            if credentials.expiry and (current.expiry is None or credentials.expiry > current.expiry):
+                current.token = credentials.token
+                current.expiry = credentials.expiry
+
+        try:
+            client.ensure_fresh()
+        except Exception as e:
+            self.logger.warning(f"Could not refresh credentials for property {property_id}: {e}")
+            return None
+        return client if client.credentials.token else None
+
+    def delete(self, user_id: str):
+        """Forget a user's grant, e.g. on logout"""
+        credentials = self.load(user_id=user_id)
+        if credentials:
+            self.clients.discard(credentials)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM property_users WHERE user_id = ?", (user_id,))
+                conn.execute("DELETE FROM property_access WHERE user_id = ?", (user_id,))
+                conn.execute("DELETE FROM grants WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
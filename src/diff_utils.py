@@ -0,0 +1,119 @@
+"""
+Diff Utilities - Cheap change statistics and on-demand unified diffs
+"""
+
+import difflib
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+# Above this many changed lines, stats come from a line-hash multiset
+# comparison instead of a full sequence alignment
+LARGE_DIFF_LINES = 5000
+
+
+@dataclass
+class DiffStats:
+    """Number of lines added and removed by a change"""
+    added: int
+    removed: int
+
+    def __str__(self) -> str:
+        return f"+{self.added} -{self.removed}"
+
+
+def _trim_common(a: List[int], b: List[int]) -> Tuple[int, int]:
+    """Length of the common prefix and suffix of two sequences"""
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def diff_stats(original_lines: List[str], new_lines: List[str]) -> DiffStats:
+    """
+    Count added and removed lines without rendering a patch
+
+    Lines are compared by hash. The unchanged head and tail are skipped,
+    and large middles are compared as multisets, which is linear but may
+    count a moved line as unchanged.
+    """
+    a = [hash(line) for line in original_lines]
+    b = [hash(line) for line in new_lines]
+    prefix, suffix = _trim_common(a, b)
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+
+    if not a or not b:
+        return DiffStats(added=len(b), removed=len(a))
+
+    if len(a) + len(b) > LARGE_DIFF_LINES:
+        original_counts = Counter(a)
+        new_counts = Counter(b)
+        return DiffStats(
+            added=sum((new_counts - original_counts).values()),
+            removed=sum((original_counts - new_counts).values())
+        )
+
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag in ('replace', 'delete'):
+            removed += i2 - i1
+        if tag in ('replace', 'insert'):
+            added += j2 - j1
+    return DiffStats(added=added, removed=removed)
+
+
+class LazyDiff:
+    """A change to one file whose stats and patch are computed only when asked for.
+
+    ``str()`` renders the unified diff, so passing a LazyDiff as a logging
+    argument defers the work until a handler actually emits the record.
+    """
+
+    def __init__(self, file_path: Path, original_content: str, new_content: str, label: Optional[str] = None):
+        self.file_path = file_path
+        self.original_content = original_content
+        self.new_content = new_content
+        self.label = label or str(file_path)
+        self._original_lines: Optional[List[str]] = None
+        self._new_lines: Optional[List[str]] = None
+        self._stats: Optional[DiffStats] = None
+        self._patch: Optional[str] = None
+
+    def _lines(self) -> Tuple[List[str], List[str]]:
+        if self._original_lines is None:
+            self._original_lines = self.original_content.splitlines(keepends=True)
+            self._new_lines = self.new_content.splitlines(keepends=True)
+        return self._original_lines, self._new_lines
+
+    @property
+    def stats(self) -> DiffStats:
+        """Lines added and removed"""
+        if self._stats is None:
+            self._stats = diff_stats(*self._lines())
+        return self._stats
+
+    def render(self, fromfile: Optional[str] = None, tofile: Optional[str] = None) -> str:
+        """Render the unified diff, caching the default rendering"""
+        if fromfile is None and tofile is None and self._patch is not None:
+            return self._patch
+        original_lines, new_lines = self._lines()
+        patch = ''.join(difflib.unified_diff(
+            original_lines,
+            new_lines,
+            fromfile=fromfile or self.label,
+            tofile=tofile or self.label
+        ))
+        if fromfile is None and tofile is None:
+            self._patch = patch
+        return patch
+
+    def __str__(self) -> str:
+        return self.render()
@@ -0,0 +1,220 @@
+"""
+Event Bus - Room-scoped, coalesced Socket.IO event delivery
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple, Union
+
+Rooms = Union[None, str, Sequence[str]]
+
+
+def property_room(property_id: Any) -> str:
+    """Room joined by dashboards showing an Analytics property"""
+    return f'property:{property_id}'
+
+
+def job_room(job_id: str) -> str:
+    """Room joined by clients following one setup job"""
+    return f'job:{job_id}'
+
+
+class EventBus:
+    """Buffers outgoing events and delivers them to rooms in short batches.
+
+    Events are published to rooms rather than broadcast, so a client only
+    receives what concerns the property or job it is watching. Within each
+    flush window, coalesced events keep only the latest payload per
+    (rooms, event, key) - counters and progress bars need nothing else -
+    while log-style events are delivered in order. State published with
+    ``publish_state`` is diffed against what each room last received and
+    sent as ``<name>_delta`` containing only the changed top-level keys;
+    clients that join later get the full state from ``snapshot``. With a
+    state store (SharedState), delivered state is also saved there, so a
+    client connecting to any worker process gets the same snapshot.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[..., Any],
+        window_seconds: float = 0.25,
+        spawn: Optional[Callable[..., Any]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        state_store: Optional[Any] = None
+    ):
+        """
+        Args:
+            emit: ``emit(event, data, to=rooms)``, e.g. socketio.emit
+            window_seconds: How long events are collected before a flush
+            spawn: Starts ``fn()`` in the background (socketio.start_background_task);
+                None flushes only when flush() is called
+            sleep: Sleep compatible with the server's concurrency model
+            state_store: Shared store with save_room_state/room_states, for several workers
+        """
+        self.logger = logging.getLogger(__name__)
+        self._emit = emit
+        self.window_seconds = window_seconds
+        self._spawn = spawn
+        self._sleep = sleep
+        self.state_store = state_store
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[Optional[Tuple[str, ...]], str, Any]] = []
+        self._latest: Dict[Tuple[Optional[Tuple[str, ...]], str, Hashable], int] = {}
+        self._pending_states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._sent_states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Rooms to forget once their pending state has been delivered
+        self._forgetting: Set[str] = set()
+        self._flush_scheduled = False
+        self.published = 0
+        self.sent = 0
+
+    @staticmethod
+    def _rooms(to: Rooms) -> Optional[Tuple[str, ...]]:
+        if to is None:
+            return None
+        if isinstance(to, str):
+            return (to,)
+        return tuple(to)
+
+    def publish(self, event: str, data: Any = None, to: Rooms = None, coalesce: bool = False, key: Hashable = None):
+        """
+        Queue an event for the next flush
+
+        Args:
+            event: Socket.IO event name
+            data: Payload
+            to: Room or rooms; None broadcasts to every client
+            coalesce: Keep only the latest payload per (rooms, event, key) in a window
+            key: Distinguishes coalesced streams of the same event, e.g. clone stages
+        """
+        rooms = self._rooms(to)
+        with self._lock:
+            self.published += 1
+            if coalesce:
+                slot = (rooms, event, key)
+                index = self._latest.get(slot)
+                if index is not None:
+                    self._queue[index] = (rooms, event, data)
+                else:
+                    self._latest[slot] = len(self._queue)
+                    self._queue.append((rooms, event, data))
+            else:
+                self._queue.append((rooms, event, data))
+            self._schedule()
+
+    def publish_state(self, name: str, state: Dict[str, Any], to: str):
+        """
+        Publish the current value of a room's state; only changes are sent
+
+        Args:
+            name: State name; clients receive ``<name>_delta`` events
+            state: Full current state (top-level keys are diffed)
+            to: Room the state belongs to
+        """
+        with self._lock:
+            self.published += 1
+            self._pending_states[(to, name)] = dict(state)
+            self._schedule()
+
+    def snapshot(self, room: str) -> Dict[str, Dict[str, Any]]:
+        """The last delivered state of every name in a room, for clients that just joined"""
+        if self.state_store is not None:
+            return self.state_store.room_states(room)
+        with self._lock:
+            return {name: dict(state) for (state_room, name), state in self._sent_states.items() if state_room == room}
+
+    def _schedule(self):
+        """Arrange a flush at the end of the window; caller holds the lock"""
+        if self._spawn is None or self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        self._spawn(self._flush_later)
+
+    def _flush_later(self):
+        self._sleep(self.window_seconds)
+        self.flush()
+
+    @staticmethod
+    def _delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if previous is None:
+            return {'changed': current, 'removed': []}
+        changed = {key: value for key, value in current.items() if previous.get(key, object()) != value}
+        removed = [key for key in previous if key not in current]
+        if not changed and not removed:
+            return None
+        return {'changed': changed, 'removed': removed}
+
+    def flush(self) -> int:
+        """
+        Deliver everything queued since the last flush
+
+        Returns:
+            Number of messages emitted
+        """
+        with self._lock:
+            queue, self._queue = self._queue, []
+            self._latest.clear()
+            states, self._pending_states = self._pending_states, {}
+            self._flush_scheduled = False
+
+            outgoing = list(queue)
+            changed_states = []
+            for (room, name), state in states.items():
+                delta = self._delta(self._sent_states.get((room, name)), state)
+                self._sent_states[(room, name)] = state
+                if delta is not None:
+                    outgoing.append(((room,), f'{name}_delta', delta))
+                    changed_states.append((room, name, state))
+            forgotten, self._forgetting = self._forgetting, set()
+            self._drop_states(forgotten)
+            changed_states = [change for change in changed_states if change[0] not in forgotten]
+
+        if self.state_store is not None:
+            for room, name, state in changed_states:
+                try:
+                    self.state_store.save_room_state(room, name, state)
+                except Exception as e:
+                    self.logger.warning(f"Could not save {name} state of {room}: {e}")
+            self._delete_stored_states(forgotten)
+
+        for rooms, event, data in outgoing:
+            try:
+                if rooms is None:
+                    self._emit(event, data)
+                else:
+                    self._emit(event, data, to=rooms[0] if len(rooms) == 1 else list(rooms))
+            except Exception as e:
+                self.logger.error(f"Failed to emit {event}: {e}")
+        with self._lock:
+            self.sent += len(outgoing)
+        return len(outgoing)
+
+    def forget(self, room: str):
+        """
+        Drop the remembered state of a room, e.g. when its job ends
+
+        State already published to the room is still delivered by the next
+        flush and forgotten after it.
+        """
+        with self._lock:
+            if any(state_room == room for state_room, _ in self._pending_states):
+                self._forgetting.add(room)
+                self._schedule()
+                return
+            self._drop_states({room})
+        self._delete_stored_states({room})
+
+    def _drop_states(self, rooms: Set[str]):
+        """Forget what was sent to rooms; caller holds the lock"""
+        for state_key in [k for k in self._sent_states if k[0] in rooms]:
+            del self._sent_states[state_key]
+
+    def _delete_stored_states(self, rooms: Set[str]):
+        if self.state_store is None:
+            return
+        for room in rooms:
+            try:
+                self.state_store.delete_room_states(room)
+            except Exception as e:
+                self.logger.warning(f"Could not delete the state of {room}: {e}")
@@ -0,0 +1,203 @@
+"""
+File Ranker - Ranks repository files by git churn, recency and size
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .repo_scanner import RepoScanner
+
+# Version 2 caches hold paths relative to the ranked directory rather than the repository root
+CACHE_VERSION = 2
+
+
+class FileRanker:
+    """Picks the files most worth spending a limited per-run budget on.
+
+    Churn is computed from ``git log --numstat`` and cached per repository
+    together with the HEAD it was computed at, so later runs only read the
+    commits made since then.
+    """
+
+    def __init__(self, config: Dict[str, Any], repo_scanner: Optional[RepoScanner] = None):
+        self.logger = logging.getLogger(__name__)
+        ranking_config = config.get('monitoring', {}).get('ranking', {})
+        self.cache_dir = Path(ranking_config.get('cache_directory', './cache/ranking'))
+        self.churn_weight = ranking_config.get('churn_weight', 0.5)
+        self.recency_weight = ranking_config.get('recency_weight', 0.3)
+        self.size_weight = ranking_config.get('size_weight', 0.2)
+        self.recency_half_life_days = ranking_config.get('recency_half_life_days', 14)
+        self.max_file_size = int(config.get('file_processing', {}).get('max_file_size_mb', 1) * 1024 * 1024)
+        self.repo_scanner = repo_scanner or RepoScanner()
+
+    def rank_files(
+        self,
+        repo_path: str,
+        file_extensions: List[str],
+        exclude_patterns: List[str],
+        limit: Optional[int] = None
+    ) -> Optional[List[Path]]:
+        """
+        Rank candidate files of a git repository, most valuable first
+
+        Args:
+            repo_path: Path to the repository
+            file_extensions: List of file extensions to include
+            exclude_patterns: List of patterns to exclude
+            limit: Maximum number of files to return, all if None
+
+        Returns:
+            Ranked list of file paths, or None if the path is not a git repository
+        """
+        repo_path = Path(repo_path)
+        head = self._git(repo_path, 'rev-parse', 'HEAD')
+        if head is None:
+            return None
+        head = head.strip()
+
+        churn = self._update_churn(repo_path, head)
+        if churn is None:
+            return None
+
+        listing = self._git(repo_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard')
+        if listing is None:
+            return None
+        candidates = self.repo_scanner.filter_candidates(
+            str(repo_path),
+            [name for name in listing.split('\0') if name],
+            file_extensions,
+            exclude_patterns
+        )
+
+        now = time.time()
+        scored = []
+        for file_path in candidates:
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            if stat.st_size > self.max_file_size:
+                continue
+            rel_path = file_path.relative_to(repo_path).as_posix()
+            entry = churn.get(rel_path, {})
+            scored.append((
+                self._score(entry.get('churn', 0), max(entry.get('last_commit', 0), stat.st_mtime), stat.st_size, now),
+                rel_path,
+                file_path
+            ))
+
+        if limit is not None:
+            ranked = heapq.nlargest(limit, scored)
+        else:
+            ranked = sorted(scored, reverse=True)
+
+        self.logger.info(f"Ranked {len(scored)} candidate files in {repo_path}, selected {len(ranked)}")
+        return [file_path for _, _, file_path in ranked]
+
+    def _score(self, churn: int, last_modified: float, size: int, now: float) -> float:
+        """Combine churn, recency and size into a single score"""
+        churn_score = 1 - 1 / (1 + math.log1p(churn))
+        age_days = max(now - last_modified, 0) / 86400
+        recency_score = 0.5 ** (age_days / self.recency_half_life_days)
+        size_score = math.log1p(size) / math.log1p(self.max_file_size)
+        return (
+            self.churn_weight * churn_score
+            + self.recency_weight * recency_score
+            + self.size_weight * size_score
+        )
+
+    def _update_churn(self, repo_path: Path, head: str) -> Optional[Dict[str, Dict[str, int]]]:
+        """Bring the cached churn table up to HEAD, reading only new commits"""
+        cache_path = self._cache_path(repo_path)
+        cache = self._load_cache(cache_path)
+        if cache.get('version') != CACHE_VERSION:
+            cache = {}
+        cached_head = cache.get('head')
+        files = cache.get('files', {})
+
+        if cached_head == head:
+            return files
+
+        if cached_head and self._git(repo_path, 'merge-base', '--is-ancestor', cached_head, head) is not None:
+            revision_range = f"{cached_head}..{head}"
+        else:
+            # History was rewritten or there is no cache yet
+            revision_range = head
+            files = {}
+
+        # Paths relative to repo_path, which may be a subdirectory of the repository
+        log = self._git(repo_path, 'log', '--no-renames', '--relative', '--numstat', '--format=%x00%ct', revision_range)
+        if log is None:
+            return None
+        self._apply_log(files, log)
+
+        self._save_cache(cache_path, {'version': CACHE_VERSION, 'head': head, 'files': files})
+        self.logger.debug(f"Updated churn cache for {repo_path} ({revision_range})")
+        return files
+
+    def _apply_log(self, files: Dict[str, Dict[str, int]], log: str):
+        """Accumulate churn from ``git log --numstat`` output"""
+        commit_time = 0
+        for line in log.splitlines():
+            if line.startswith('\0'):
+                commit_time = int(line[1:] or 0)
+                continue
+            parts = line.split('\t')
+            if len(parts) != 3:
+                continue
+            added, removed, rel_path = parts
+            # Binary files report '-' for both counts
+            lines_changed = (int(added) if added.isdigit() else 0) + (int(removed) if removed.isdigit() else 0)
+            entry = files.setdefault(rel_path, {'churn': 0, 'last_commit': 0})
+            entry['churn'] += lines_changed
+            entry['last_commit'] = max(entry['last_commit'], commit_time)
+
+    def _cache_path(self, repo_path: Path) -> Path:
+        """Get the churn cache file for a repository"""
+        key = hashlib.sha1(str(repo_path.resolve()).encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"churn_{key}.json"
+
+    def _load_cache(self, cache_path: Path) -> Dict[str, Any]:
+        """Load a churn cache, returning an empty one if missing or corrupt"""
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable churn cache {cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, cache_path: Path, cache: Dict[str, Any]):
+        """Persist a churn cache"""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            tmp_path.replace(cache_path)
+        except Exception as e:
+            self.logger.warning(f"Could not save churn cache {cache_path}: {e}")
+
+    def _git(self, repo_path: Path, *args: str) -> Optional[str]:
+        """Run a git command in the repository, returning stdout or None on failure"""
+        try:
+            result = subprocess.run(
+                ['git', '-C', str(repo_path), *args],
+                capture_output=True,
+                text=True,
+                check=False
+            )
+        except OSError as e:
+            self.logger.warning(f"git is not available: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout
@@ -2,13 +2,23 @@
 File Writer - Applies changes to files with backup functionality
 """
 
+import hashlib
+import json
 import logging
 import shutil
 import os
-from typing import Optional, Dict, Any
+import stat
+import tempfile
+import time
+import uuid
+from typing import Optional, Dict, Any, Union, Callable, List
 from pathlib import Path
 from datetime import datetime
-import difflib
+
+from .backup_store import BackupStore, RetentionPolicy, RetentionWorker
+from .diff_utils import LazyDiff
+from .merge_utils import three_way_merge
+from .patch_bundle import PatchBundleWriter
 
 
 class FileWriter:
@@ -21,47 +31,127 @@ class FileWriter:
         self.auto_apply = config.get('file_processing', {}).get('auto_apply_changes', True)
         self.backup_original = config.get('file_processing', {}).get('backup_original_files', True)
         
+        # Durability: "none", "always" (fsync every file) or "batch" (group fsyncs until flush)
+        self.fsync_mode = config.get('file_processing', {}).get('fsync', 'batch')
+        self.fsync_batch_size = config.get('file_processing', {}).get('fsync_batch_size', 200)
+        self._pending_writes: Dict[Path, Path] = {}
+        self._pending_backups: Dict[Path, Optional[str]] = {}
+        # Backup digests pinned against retention while a rollback may need them, with pin counts
+        self._pins: Dict[str, int] = {}
+        
+        # Task transactions: staged writes are applied through a rollback journal
+        self.transaction_batch_size = config.get('file_processing', {}).get('transaction_batch_size', 0)
+        self.journal_dir = self.backup_dir / 'journals'
+        self._transaction: Optional[str] = None
+        # Set when a batch of the current task failed and the task's writes were rolled back
+        self._transaction_failed = False
+        self._journal_path: Optional[Path] = None
+        self._journal_entries: Dict[str, Dict[str, Any]] = {}
+        self.committed_paths: List[Path] = []
+        
+        # Files whose AI edit conflicted with a concurrent change, for the caller to retry
+        self.merge_conflicts: List[Path] = []
+        
+        # Consumers of per-file diffs; patches are only rendered if one asks for them
+        self.diff_sinks: List[Callable[[LazyDiff], None]] = []
+        
+        # Preview mode keeps each task's diffs as a patch bundle that can be applied later
+        self.patch_bundles: Optional[PatchBundleWriter] = None
+        if not self.auto_apply and config.get('file_processing', {}).get('patch_bundles', True):
+            self.patch_bundles = PatchBundleWriter(config)
+            self.diff_sinks.append(self.patch_bundles.add)
+        
         # Ensure backup directory exists
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.backup_store = BackupStore(
+            self.backup_dir,
+            compression=config.get('file_processing', {}).get('backup_compression', 'auto')
+        )
+        
+        # Retention runs on a background thread so pruning never stalls a task
+        retention = config.get('file_processing', {}).get('backup_retention') or {}
+        max_total_mb = retention.get('max_total_mb')
+        self.retention_policy = RetentionPolicy(
+            max_per_file=retention.get('max_per_file'),
+            max_total_bytes=int(max_total_mb * 1024 * 1024) if max_total_mb else None,
+            max_age_days=retention.get('max_age_days')
+        )
+        self.retention_worker: Optional[RetentionWorker] = None
+        if self.retention_policy.enabled and retention.get('background', True):
+            self.retention_worker = RetentionWorker(
+                self.backup_store,
+                self.retention_policy,
+                interval_seconds=retention.get('interval_seconds', 60),
+                budget=retention.get('batch_size', 200)
+            )
+            self.retention_worker.start()
+        
+        # Undo anything a previous process left half-applied
+        self.recover_journals()
     
-    def apply_changes(self, file_path: Path, new_content: str) -> bool:
+    def apply_changes(self, file_path: Path, new_content: str, original_content: Optional[str] = None) -> bool:
         """
         Apply changes to a file with optional backup
         
         Args:
             file_path: Path to the file to modify
             new_content: New content to write to the file
+            original_content: Content the changes were based on, read from disk if None.
+                If the file has changed since, the edits are three-way merged.
         
         Returns:
-            True if changes were applied successfully, False otherwise
+            True if changes were applied successfully, False otherwise. Files
+            whose merge conflicts are added to merge_conflicts.
         """
         try:
-            # Read original content
-            original_content = self._read_file(file_path)
+            # Read original content unless the caller already has it
             if original_content is None:
-                return False
+                original_content = self._read_file(file_path)
+                if original_content is None:
+                    return False
             
             # Check if content actually changed
             if original_content.strip() == new_content.strip():
                 self.logger.info(f"No changes needed for {file_path}")
                 return True
             
-            # Create backup if enabled
-            if self.backup_original:
-                backup_path = self._create_backup(file_path)
-                if not backup_path:
+            current_bytes = file_path.read_bytes()
+            current_digest = hashlib.sha256(current_bytes).hexdigest()
+            
+            # Someone edited the file since it was read - merge rather than clobber
+            base_bytes = original_content.encode('utf-8')
+            if self.auto_apply and hashlib.sha256(base_bytes).hexdigest() != current_digest:
+                merge = three_way_merge(base_bytes, new_content.encode('utf-8'), current_bytes)
+                if not merge.clean:
+                    self.logger.warning(
+                        f"{file_path} changed while the AI was working on it ({merge.conflicts} conflicts), queued for retry"
+                    )
+                    self.merge_conflicts.append(file_path)
+                    return False
+                self.logger.info(f"Merged AI changes with concurrent edits to {file_path}")
+                original_content = current_bytes.decode('utf-8')
+                new_content = merge.content.decode('utf-8')
+            
+            # Create backup if enabled - staged writes always need one for rollback.
+            # Only after the conflict check, so a conflicting edit leaves no pin behind
+            backup = None
+            if self.backup_original or (self.auto_apply and self._stages_writes()):
+                backup = self._create_backup(file_path, current_bytes, pin=self.auto_apply and self._stages_writes())
+                if not backup:
                     self.logger.warning(f"Failed to create backup for {file_path}")
                     return False
             
             # Write new content
             if self.auto_apply:
-                success = self._write_file(file_path, new_content)
+                success = self._write_file(file_path, new_content, current_digest)
                 if success:
                     self.logger.info(f"Applied changes to {file_path}")
                     self._log_changes(file_path, original_content, new_content)
                     return True
                 else:
                     self.logger.error(f"Failed to write changes to {file_path}")
+                    self._release_pins()
                     return False
             else:
                 # Preview mode - just log what would be changed
@@ -74,123 +164,509 @@ class FileWriter:
             return False
     
     def _read_file(self, file_path: Path) -> Optional[str]:
-        """Read file content safely"""
+        """Read file content safely, keeping line endings as they are on disk"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return file_path.read_bytes().decode('utf-8')
         except Exception as e:
             self.logger.error(f"Error reading file {file_path}: {e}")
             return None
     
-    def _write_file(self, file_path: Path, content: str) -> bool:
-        """Write content to file safely"""
+    def _write_file(self, file_path: Path, content: str, original_digest: Optional[str] = None) -> bool:
+        """
+        Write content to file atomically
+        
+        The content goes to a temporary file in the same directory which then
+        replaces the target, so readers never see a partially written file.
+        In batch fsync mode, and inside a task transaction, the replace is
+        deferred until flush() so that one journal and one sync pass cover
+        the whole batch.
+        
+        Args:
+            file_path: File to write
+            content: New content
+            original_digest: Backup store digest of the current content, used for rollback
+        """
+        if self._transaction_failed:
+            self.logger.error(f"Not writing {file_path}: {self._transaction} was already rolled back")
+            return False
         try:
             # Create parent directories if they don't exist
             file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            tmp_path = self._write_temp_file(file_path, content)
+            
+            if self._stages_writes():
+                superseded = self._pending_writes.pop(file_path, None)
+                if superseded:
+                    superseded.unlink(missing_ok=True)
+                else:
+                    self._pending_backups[file_path] = original_digest
+                self._pending_writes[file_path] = tmp_path
+                
+                batch_size = self.transaction_batch_size if self._transaction else self.fsync_batch_size
+                if batch_size and len(self._pending_writes) >= batch_size:
+                    return self.flush()
+                return True
+            
+            os.replace(tmp_path, file_path)
+            if self.fsync_mode == 'always':
+                self._fsync_directory(file_path.parent)
             return True
         except Exception as e:
             self.logger.error(f"Error writing file {file_path}: {e}")
             return False
     
-    def _create_backup(self, file_path: Path) -> Optional[Path]:
-        """Create a backup of the original file"""
+    def _stages_writes(self) -> bool:
+        """Whether writes are staged until flush() rather than applied immediately"""
+        return self.fsync_mode == 'batch' or self._transaction is not None
+    
+    def _write_temp_file(self, file_path: Path, content: Union[str, bytes]) -> Path:
+        """Write content to a temporary sibling of file_path, keeping its permissions"""
+        fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+        tmp_path = Path(tmp_name)
+        try:
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                if self.fsync_mode == 'always':
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(file_path.stat().st_mode))
+            except FileNotFoundError:
+                pass
+            return tmp_path
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    def begin_task(self, label: str, root: Optional[Path] = None):
+        """
+        Start a task transaction
+        
+        Until commit_task() or rollback_task(), writes are staged instead of
+        applied. With transaction_batch_size set, staged writes are applied
+        in batches but remain journaled until the task ends, so rollback
+        still covers the whole task. In preview mode a patch bundle is opened
+        for the task instead.
+        
+        Args:
+            label: Task description
+            root: Repository root, which patch bundle paths are relative to
+        """
+        if self._transaction is not None:
+            self.logger.warning(f"Committing unfinished transaction {self._transaction} before starting {label}")
+            self.commit_task()
+        else:
+            self.flush()
+        
+        self._transaction = label
+        self._transaction_failed = False
+        self.committed_paths = []
+        if self.patch_bundles:
+            self.patch_bundles.open(label, root)
+        self.logger.debug(f"Started transaction for {label}")
+    
+    def commit_task(self) -> bool:
+        """
+        Apply every staged write of the current task
+        
+        Returns:
+            True if the task's changes are fully applied, False if they were rolled back
+        """
+        if self._transaction_failed:
+            self.rollback_task()
+            self.committed_paths = []
+            return False
+        success = self.flush()
+        if success:
+            self.committed_paths = [Path(entry['path']) for entry in self._journal_entries.values()]
+            self._clear_journal()
+        else:
+            self.committed_paths = []
+        self._transaction = None
+        if self.patch_bundles:
+            self.patch_bundles.close('complete' if success else 'rolled_back')
+        return success
+    
+    def rollback_task(self):
+        """Discard staged writes and undo any already applied for the current task"""
+        for tmp_path in self._pending_writes.values():
+            tmp_path.unlink(missing_ok=True)
+        self._pending_writes = {}
+        self._pending_backups = {}
+        
+        if self._journal_entries:
+            self._restore_entries(list(self._journal_entries.values()))
+            self.logger.info(f"Rolled back {len(self._journal_entries)} files for {self._transaction}")
+        self._clear_journal()
+        self._transaction = None
+        self._transaction_failed = False
+        if self.patch_bundles:
+            self.patch_bundles.close('rolled_back')
+    
+    def flush(self) -> bool:
+        """
+        Make all pending staged writes visible and durable
+        
+        The batch is first recorded in the rollback journal. The batch's
+        temporary files are then fsynced, each one replaces its target and
+        each affected directory is synced once. If anything fails
+        part way, every file in the journal is restored.
+        
+        Returns:
+            True if every pending write was applied, False otherwise
+        """
+        if not self._pending_writes:
+            return True
+        
+        pending, self._pending_writes = self._pending_writes, {}
+        backups, self._pending_backups = self._pending_backups, {}
+        
+        # Files edited on disk since they were staged are merged again or dropped
+        for file_path in list(pending):
+            expected = backups.get(file_path)
+            if expected and not self._reconcile_staged(file_path, pending[file_path], expected, backups):
+                pending.pop(file_path).unlink(missing_ok=True)
+                self.merge_conflicts.append(file_path)
+        if not pending:
+            self._release_pins()
+            return True
+        
+        for file_path, tmp_path in pending.items():
+            entry = self._journal_entries.setdefault(str(file_path), {
+                'path': str(file_path),
+                'backup': backups.get(file_path),
+                'existed': backups.get(file_path) is not None or file_path.exists()
+            })
+            entry['temp'] = str(tmp_path)
+        
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"{file_path.stem}_{timestamp}{file_path.suffix}"
-            backup_path = self.backup_dir / backup_name
+            self._write_journal()
+            if self.fsync_mode == 'batch':
+                self._sync_files(list(pending.values()))
             
-            shutil.copy2(file_path, backup_path)
-            self.logger.debug(f"Created backup: {backup_path}")
-            return backup_path
+            directories = set()
+            for file_path, tmp_path in pending.items():
+                os.replace(tmp_path, file_path)
+                directories.add(file_path.parent)
+            
+            for directory in directories:
+                self._fsync_directory(directory)
+        except Exception as e:
+            self.logger.error(f"Error applying {len(pending)} staged writes, rolling back: {e}")
+            for tmp_path in pending.values():
+                tmp_path.unlink(missing_ok=True)
+            self._restore_entries(list(self._journal_entries.values()))
+            self._clear_journal()
+            if self._transaction is not None:
+                # The task's earlier batches were undone too, so it cannot commit
+                self._transaction_failed = True
+            return False
+        
+        if self._transaction is None:
+            self._clear_journal()
+        else:
+            self._release_pins()
+        
+        self.logger.debug(f"Flushed {len(pending)} writes across {len(directories)} directories")
+        return True
+    
+    def _reconcile_staged(self, file_path: Path, tmp_path: Path, expected_digest: str, backups: Dict[Path, Optional[str]]) -> bool:
+        """
+        Check a staged file against what is on disk before replacing it
+        
+        Returns:
+            True if the staged content can be applied (merging in any
+            concurrent edit), False if the edits conflict
+        """
+        try:
+            current_bytes = file_path.read_bytes()
+        except FileNotFoundError:
+            current_bytes = b''
+        current_digest = hashlib.sha256(current_bytes).hexdigest()
+        if current_digest == expected_digest:
+            return True
+        
+        merge = three_way_merge(
+            self.backup_store.read_object(expected_digest),
+            tmp_path.read_bytes(),
+            current_bytes
+        )
+        if not merge.clean:
+            self.logger.warning(f"{file_path} changed before its staged edit was applied, queued for retry")
+            return False
+        
+        self.logger.info(f"Merged staged changes with concurrent edits to {file_path}")
+        with open(tmp_path, 'wb') as f:
+            f.write(merge.content)
+        if str(file_path) not in self._journal_entries:
+            backup = self._create_backup(file_path, current_bytes, pin=True)
+            if not backup:
+                return False
+            backups[file_path] = backup['digest']
+        return True
+    
+    def take_merge_conflicts(self) -> List[Path]:
+        """Return and clear the files whose edits conflicted with concurrent changes"""
+        conflicts, self.merge_conflicts = self.merge_conflicts, []
+        return conflicts
+    
+    def _write_journal(self):
+        """Durably record the files about to be replaced and how to restore them"""
+        if self._journal_path is None:
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+            self._journal_path = self.journal_dir / f"{time.time_ns()}_{uuid.uuid4().hex[:8]}.json"
+        
+        journal = {
+            'transaction': self._transaction,
+            'pid': os.getpid(),
+            'created_at': time.time(),
+            'entries': list(self._journal_entries.values())
+        }
+        tmp_path = self._journal_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._journal_path)
+        self._fsync_directory(self.journal_dir)
+    
+    def _clear_journal(self):
+        """Forget the current journal once its changes are final"""
+        if self._journal_path is not None:
+            self._journal_path.unlink(missing_ok=True)
+        self._journal_path = None
+        self._journal_entries = {}
+        self._release_pins()
+    
+    def _release_pins(self):
+        """Unpin backups that no staged write or journal entry refers to any more"""
+        needed = {digest for digest in self._pending_backups.values() if digest}
+        needed.update(entry['backup'] for entry in self._journal_entries.values() if entry.get('backup'))
+        for digest in [digest for digest in self._pins if digest not in needed]:
+            try:
+                self.backup_store.unpin(digest, self._pins.pop(digest))
+            except Exception as e:
+                self.logger.error(f"Error unpinning backup {digest[:12]}: {e}")
+    
+    def _restore_entries(self, entries: list):
+        """Put journaled files back to their original content"""
+        directories = set()
+        for entry in entries:
+            file_path = Path(entry['path'])
+            try:
+                if entry.get('temp'):
+                    Path(entry['temp']).unlink(missing_ok=True)
+                if entry.get('backup'):
+                    content = self.backup_store.read_object(entry['backup'])
+                    tmp_path = self._write_temp_file(file_path, content)
+                    os.replace(tmp_path, file_path)
+                elif not entry.get('existed', True):
+                    file_path.unlink(missing_ok=True)
+                else:
+                    self.logger.warning(f"No backup recorded for {file_path}, leaving it as is")
+                    continue
+                directories.add(file_path.parent)
+            except Exception as e:
+                self.logger.error(f"Error restoring {file_path} during rollback: {e}")
+        
+        for directory in directories:
+            self._fsync_directory(directory)
+    
+    def recover_journals(self):
+        """Roll back transactions left unfinished by a crashed process"""
+        try:
+            # Backups pinned by crashed processes are no longer needed for a rollback
+            self.backup_store.release_stale_pins(lambda pid: pid == os.getpid() or self._process_alive(pid))
+        except Exception as e:
+            self.logger.error(f"Error releasing stale backup pins: {e}")
+        
+        if not self.journal_dir.exists():
+            return
+        
+        for journal_path in self.journal_dir.glob('*.json'):
+            try:
+                with open(journal_path, 'r', encoding='utf-8') as f:
+                    journal = json.load(f)
+                if self._process_alive(journal.get('pid')):
+                    # Another worker sharing this backup directory is mid-transaction
+                    continue
+                self.logger.warning(
+                    f"Rolling back unfinished transaction {journal.get('transaction')} "
+                    f"({len(journal.get('entries', []))} files)"
+                )
+                self._restore_entries(journal.get('entries', []))
+                journal_path.unlink()
+            except Exception as e:
+                self.logger.error(f"Error recovering journal {journal_path}: {e}")
+    
+    def _sync_files(self, paths: list):
+        """Flush the data of the batch's own files to disk, one fsync per file"""
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    @staticmethod
+    def _process_alive(pid: Optional[int]) -> bool:
+        """Check whether a journal's owning process is still running"""
+        if not pid or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+    
+    def _fsync_directory(self, directory: Path):
+        """Persist directory entries (renames) on platforms that support it"""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def _create_backup(self, file_path: Path, content: Optional[bytes] = None, pin: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Create a backup of the original file in the backup store
+        
+        Args:
+            file_path: File to back up
+            content: Its current bytes, read from disk if None
+            pin: Keep retention from deleting the backup until no staged
+                write or journal entry needs it
+        """
+        try:
+            backup = self.backup_store.put(file_path, content, pin=pin)
+            if pin:
+                self._pins[backup['digest']] = self._pins.get(backup['digest'], 0) + 1
+            self.logger.debug(f"Created backup {backup['id']} of {file_path}")
+            if self.retention_worker:
+                self.retention_worker.notify()
+            return backup
             
         except Exception as e:
             self.logger.error(f"Error creating backup for {file_path}: {e}")
             return None
     
-    def _log_changes(self, file_path: Path, original_content: str, new_content: str):
-        """Log the changes made to a file"""
+    def _log_changes(self, file_path: Path, original_content: str, new_content: str) -> Optional[LazyDiff]:
+        """
+        Report the changes made to a file
+        
+        Line counts are logged at INFO. The full patch is only rendered if
+        DEBUG logging is enabled or a registered diff sink renders it.
+        """
         try:
-            # Generate diff
-            diff = list(difflib.unified_diff(
-                original_content.splitlines(keepends=True),
-                new_content.splitlines(keepends=True),
-                fromfile=str(file_path),
-                tofile=str(file_path)
-            ))
+            diff = LazyDiff(file_path, original_content, new_content)
+            self.logger.info(f"Changes for {file_path}: {diff.stats} lines")
+            self.logger.debug("Diff for %s:\n%s", file_path, diff)
             
-            if diff:
-                diff_text = ''.join(diff)
-                self.logger.info(f"Changes for {file_path}:\n{diff_text}")
-            else:
-                self.logger.info(f"No changes detected for {file_path}")
+            for sink in self.diff_sinks:
+                try:
+                    sink(diff)
+                except Exception as e:
+                    self.logger.error(f"Diff sink failed for {file_path}: {e}")
+            return diff
                 
         except Exception as e:
             self.logger.error(f"Error logging changes for {file_path}: {e}")
+            return None
     
-    def restore_from_backup(self, file_path: Path, backup_path: Path) -> bool:
-        """Restore a file from its backup"""
+    def restore_from_backup(self, file_path: Path, backup: Union[int, Path]) -> bool:
+        """
+        Restore a file from a backup
+        
+        Args:
+            file_path: File to restore
+            backup: Backup id from list_backups(), or the path of a legacy backup copy
+        """
         try:
-            if not backup_path.exists():
-                self.logger.error(f"Backup file does not exist: {backup_path}")
+            if isinstance(backup, Path):
+                if not backup.exists():
+                    self.logger.error(f"Backup file does not exist: {backup}")
+                    return False
+                shutil.copy2(backup, file_path)
+                self.logger.info(f"Restored {file_path} from backup {backup}")
+                return True
+            
+            content = self.backup_store.read(backup)
+            if content is None:
+                self.logger.error(f"Backup does not exist: {backup}")
                 return False
             
-            shutil.copy2(backup_path, file_path)
-            self.logger.info(f"Restored {file_path} from backup {backup_path}")
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._write_temp_file(file_path, content)
+            os.replace(tmp_path, file_path)
+            self.logger.info(f"Restored {file_path} from backup {backup}")
             return True
             
         except Exception as e:
             self.logger.error(f"Error restoring {file_path} from backup: {e}")
             return False
     
-    def list_backups(self, file_path: Path = None) -> list:
-        """List available backups"""
-        try:
-            backups = []
-            for backup_file in self.backup_dir.glob("*"):
-                if backup_file.is_file():
-                    backup_info = {
-                        'path': backup_file,
-                        'name': backup_file.name,
-                        'size': backup_file.stat().st_size,
-                        'modified': datetime.fromtimestamp(backup_file.stat().st_mtime)
-                    }
-                    
-                    # Filter by original file if specified
-                    if file_path:
-                        if file_path.stem in backup_file.stem:
-                            backups.append(backup_info)
-                    else:
-                        backups.append(backup_info)
-            
-            # Sort by modification time (newest first)
-            backups.sort(key=lambda x: x['modified'], reverse=True)
-            return backups
+    def list_backups(self, file_path: Path = None, limit: Optional[int] = None) -> list:
+        """List available backups, newest first"""
+        try:
+            return [
+                {
+                    'id': record['id'],
+                    'path': Path(record['original_path']),
+                    'name': Path(record['original_path']).name,
+                    'digest': record['digest'],
+                    'size': record['size'],
+                    'stored_size': record['stored_size'],
+                    'modified': datetime.fromtimestamp(record['created_at'])
+                }
+                for record in self.backup_store.list(file_path, limit=limit)
+            ]
             
         except Exception as e:
             self.logger.error(f"Error listing backups: {e}")
             return []
     
     def cleanup_old_backups(self, max_backups: int = 10):
-        """Clean up old backups, keeping only the most recent ones"""
+        """Clean up old backups, keeping only the most recent ones of each file"""
         try:
-            backups = self.list_backups()
-            
-            if len(backups) > max_backups:
-                backups_to_delete = backups[max_backups:]
-                
-                for backup in backups_to_delete:
-                    try:
-                        backup['path'].unlink()
-                        self.logger.info(f"Deleted old backup: {backup['name']}")
-                    except Exception as e:
-                        self.logger.error(f"Error deleting backup {backup['name']}: {e}")
+            self.backup_store.mark_all_dirty()
+            policy = RetentionPolicy(max_per_file=max_backups)
+            budget = 200
+            deleted = 0
+            while True:
+                step = self.backup_store.enforce_retention(policy, budget)
+                deleted += step
+                if step < budget:
+                    break
+            if deleted:
+                self.logger.info(f"Deleted {deleted} old backups")
                         
         except Exception as e:
             self.logger.error(f"Error cleaning up backups: {e}")
     
+    def close(self):
+        """Apply any staged writes, stop background retention and close the backup index"""
+        if self._transaction is not None:
+            self.logger.warning(f"Committing unfinished transaction {self._transaction} on close")
+            self.commit_task()
+        else:
+            self.flush()
+        self._release_pins()
+        if self.retention_worker:
+            self.retention_worker.stop()
+            self.retention_worker = None
+        self.backup_store.close()
+    
     def get_file_stats(self, file_path: Path) -> Dict[str, Any]:
         """Get statistics about a file"""
         try:
@@ -0,0 +1,140 @@
+"""
+GA Client - Cached, authorized Analytics Data API clients
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+API_NAME = 'analyticsdata'
+API_VERSION = 'v1beta'
+
+
+@lru_cache(maxsize=None)
+def discovery_document(api_name: str = API_NAME, api_version: str = API_VERSION) -> Dict[str, Any]:
+    """The discovery document shipped with google-api-python-client, parsed once per process"""
+    document = get_static_doc(api_name, api_version)
+    if document is None:
+        raise RuntimeError(f"No static discovery document for {api_name} {api_version}")
+    return json.loads(document)
+
+
+class GAClient:
+    """An authorized Analytics Data API client bound to one set of credentials.
+
+    The service object and its HTTP connection are reused for every call.
+    httplib2 connections are not thread-safe, so calls are serialized per
+    client; the access token is refreshed under the same lock, and only
+    when it is within refresh_margin of expiring.
+    """
+
+    def __init__(
+        self,
+        credentials: Credentials,
+        api_endpoint: Optional[str] = None,
+        refresh_margin: timedelta = timedelta(minutes=5),
+        timeout: float = 60,
+        on_refresh: Optional[Callable[[Credentials], None]] = None
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self.on_refresh = on_refresh
+        self.lock = threading.RLock()
+        self.http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        self.service = build_from_document(
+            discovery_document(),
+            http=self.http,
+            client_options=client_options
+        )
+
+    def needs_refresh(self) -> bool:
+        """True if the token is missing or expires within refresh_margin"""
+        if not self.credentials.token:
+            return True
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return False
+        # google-auth stores expiry as naive UTC
+        return expiry - datetime.utcnow() <= self.refresh_margin
+
+    def ensure_fresh(self):
+        """Refresh the access token if it is close to expiring"""
+        with self.lock:
+            if not self.needs_refresh():
+                return
+            if not self.credentials.refresh_token:
+                return
+            self.credentials.refresh(Request())
+            self.logger.info("Refreshed Analytics access token")
+            if self.on_refresh:
+                self.on_refresh(self.credentials)
+
+    def execute(self, make_request: Callable[[Any], Any]) -> Dict[str, Any]:
+        """
+        Build and execute a request on the shared service
+
+        Args:
+            make_request: Given the service, returns an HttpRequest, e.g.
+                ``lambda s: s.properties().runReport(property=..., body=...)``
+        """
+        with self.lock:
+            self.ensure_fresh()
+            return make_request(self.service).execute()
+
+
+class GAClientCache:
+    """Keeps one GAClient per credential, so each is built and authorized once"""
+
+    def __init__(self, api_endpoint: Optional[str] = None, refresh_margin: timedelta = timedelta(minutes=5)):
+        self.logger = logging.getLogger(__name__)
+        self.api_endpoint = api_endpoint
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._clients: Dict[str, GAClient] = {}
+
+    @staticmethod
+    def credential_key(credentials: Credentials) -> str:
+        """Identify a grant by its client and refresh token, which outlive access tokens"""
+        identity = f"{credentials.client_id}:{credentials.refresh_token or credentials.token}"
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def get(self, credentials: Credentials, on_refresh: Optional[Callable[[Credentials], None]] = None) -> GAClient:
+        """
+        Return the cached client for these credentials, creating it on first use
+
+        A cached client keeps its own credentials object, which holds the
+        most recently refreshed token; the passed-in copy may be older.
+        """
+        key = self.credential_key(credentials)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = GAClient(
+                    credentials,
+                    api_endpoint=self.api_endpoint,
+                    refresh_margin=self.refresh_margin,
+                    on_refresh=on_refresh
+                )
+                self._clients[key] = client
+                self.logger.debug(f"Created Analytics client {key[:12]}")
+            elif on_refresh and client.on_refresh is None:
+                client.on_refresh = on_refresh
+            return client
+
+    def discard(self, credentials: Credentials):
+        """Forget the client for revoked or replaced credentials"""
+        with self._lock:
+            self._clients.pop(self.credential_key(credentials), None)
@@ -0,0 +1,174 @@
+"""
+Git Committer - Commits exactly the files a task changed through the git index
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class GitCommitError(Exception):
+    """Raised when a git plumbing command fails"""
+
+
+class GitCommitter:
+    """Creates commits with git plumbing instead of ``git add .``.
+
+    A throwaway index is built from HEAD's tree, only the given paths are
+    hashed into it, and the resulting tree is committed. The working tree
+    is never walked, so cost scales with the number of changed files and
+    anything the developer staged themselves stays out of the commit.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        file_processing = config.get('file_processing', {})
+        self.enabled = file_processing.get('create_git_commits', False)
+        self.branch_per_run = file_processing.get('git_branch_per_run', False)
+        self.branch_prefix = file_processing.get('git_branch_prefix', 'ai/run-')
+        self.batch_size = file_processing.get('commit_batch_size', 0)
+        self.author_name = file_processing.get('git_author_name', 'AI Code Assistant')
+        self.author_email = file_processing.get('git_author_email', 'ai-assistant@localhost')
+        self._run_branches: Dict[str, str] = {}
+
+    def _git(self, repo_path: Path, *args: str, input: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> str:
+        """Run a git command and return its stripped stdout"""
+        result = subprocess.run(
+            ['git', '-C', str(repo_path), *args],
+            input=input,
+            capture_output=True,
+            text=True,
+            env={**os.environ, **(env or {})}
+        )
+        if result.returncode != 0:
+            raise GitCommitError(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout.strip()
+
+    def _head(self, repo_path: Path) -> Optional[str]:
+        """Current HEAD commit, or None on an unborn branch"""
+        try:
+            return self._git(repo_path, 'rev-parse', '--verify', '-q', 'HEAD')
+        except GitCommitError:
+            return None
+
+    def start_run(self, repo_path: str) -> Optional[str]:
+        """
+        Switch the repository to a fresh branch for this run, if configured
+
+        Only HEAD is repointed, at the same commit, so the working tree and
+        index are left untouched. Repeated calls for a repository reuse the
+        branch created by the first one.
+
+        Returns:
+            The run branch name, or None if branch-per-run is disabled
+        """
+        if not self.branch_per_run:
+            return None
+        if repo_path in self._run_branches:
+            return self._run_branches[repo_path]
+
+        path = Path(repo_path)
+        branch = f"{self.branch_prefix}{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        try:
+            head = self._head(path)
+            if head:
+                self._git(path, 'branch', branch, head)
+            self._git(path, 'symbolic-ref', 'HEAD', f'refs/heads/{branch}')
+        except GitCommitError as e:
+            self.logger.error(f"Could not create run branch in {repo_path}: {e}")
+            return None
+
+        self._run_branches[repo_path] = branch
+        self.logger.info(f"Committing to branch {branch} in {repo_path}")
+        return branch
+
+    def commit_files(self, repo_path: str, file_paths: List[Path], message: str) -> List[str]:
+        """
+        Commit exactly the given files, in batches if commit_batch_size is set
+
+        Args:
+            repo_path: Repository containing the files
+            file_paths: Files changed by the task (absolute or relative to repo_path)
+            message: Commit message
+
+        Returns:
+            The new commit SHAs, empty if nothing changed or committing failed
+        """
+        if not file_paths:
+            return []
+
+        path = Path(repo_path)
+        try:
+            top_level = Path(self._git(path, 'rev-parse', '--show-toplevel')).resolve()
+        except GitCommitError as e:
+            self.logger.error(f"Not a git repository, skipping commit: {repo_path} ({e})")
+            return []
+
+        rel_paths = sorted({
+            (Path(p) if Path(p).is_absolute() else path / p).resolve().relative_to(top_level).as_posix()
+            for p in file_paths
+        })
+
+        batch_size = self.batch_size or len(rel_paths)
+        batches = [rel_paths[i:i + batch_size] for i in range(0, len(rel_paths), batch_size)]
+        commits = []
+        for number, batch in enumerate(batches, start=1):
+            batch_message = message if len(batches) == 1 else f"{message} ({number}/{len(batches)})"
+            try:
+                sha = self._commit_paths(top_level, batch, batch_message)
+            except GitCommitError as e:
+                self.logger.error(f"Error committing {len(batch)} files in {repo_path}: {e}")
+                break
+            if sha:
+                commits.append(sha)
+
+        if commits:
+            self.logger.info(f"Created {len(commits)} commit(s) for {len(rel_paths)} files in {repo_path}")
+        return commits
+
+    def _commit_paths(self, top_level: Path, rel_paths: List[str], message: str) -> Optional[str]:
+        """Commit rel_paths on top of HEAD using a temporary index"""
+        head = self._head(top_level)
+        paths_input = '\0'.join(rel_paths) + '\0'
+
+        fd, index_path = tempfile.mkstemp(prefix='ai-index-')
+        os.close(fd)
+        os.unlink(index_path)
+        index_env = {'GIT_INDEX_FILE': index_path}
+        try:
+            if head:
+                self._git(top_level, 'read-tree', head, env=index_env)
+            else:
+                self._git(top_level, 'read-tree', '--empty', env=index_env)
+            self._git(top_level, 'update-index', '--add', '--remove', '-z', '--stdin',
+                      input=paths_input, env=index_env)
+            tree = self._git(top_level, 'write-tree', env=index_env)
+        finally:
+            Path(index_path).unlink(missing_ok=True)
+
+        if head and tree == self._git(top_level, 'rev-parse', f'{head}^{{tree}}'):
+            self.logger.info("No changes to commit")
+            return None
+
+        identity = {
+            'GIT_AUTHOR_NAME': os.environ.get('GIT_AUTHOR_NAME', self.author_name),
+            'GIT_AUTHOR_EMAIL': os.environ.get('GIT_AUTHOR_EMAIL', self.author_email),
+            'GIT_COMMITTER_NAME': os.environ.get('GIT_COMMITTER_NAME', self.author_name),
+            'GIT_COMMITTER_EMAIL': os.environ.get('GIT_COMMITTER_EMAIL', self.author_email),
+        }
+        parents = ['-p', head] if head else []
+        commit = self._git(top_level, 'commit-tree', tree, *parents, '-m', message, env=identity)
+
+        # Compare-and-swap so a concurrent commit is never silently discarded
+        update_args = ['update-ref', '-m', f'commit: {message.splitlines()[0]}', 'HEAD', commit]
+        if head:
+            update_args.append(head)
+        self._git(top_level, *update_args)
+
+        # Bring the real index in line with the new HEAD for these paths only
+        self._git(top_level, 'update-index', '--add', '--remove', '-z', '--stdin', input=paths_input)
+        return commit
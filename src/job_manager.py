@@ -0,0 +1,303 @@
+"""
+Job Manager - Tracked, cancellable background jobs for the web dashboard
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+from .shared_state import SharedState
+
+ACTIVE_STATES = ('queued', 'running', 'cancelling')
+
+
+@dataclass
+class Job:
+    """A unit of background work; targets poll ``stopped`` or sleep with ``wait``"""
+    id: str
+    kind: str
+    key: Hashable
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = 'queued'
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    _stop: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def stopped(self) -> bool:
+        """True once the job has been cancelled or the manager is shutting down"""
+        return self._stop.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep for up to seconds, returning True early if the job is stopped"""
+        return self._stop.wait(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'progress': self.progress
+        }
+
+
+class JobManager:
+    """Runs jobs with deduplication, a concurrency limit and cancellation.
+
+    Submitting a job whose key matches an active job returns the existing
+    job instead of starting another. At most max_concurrent jobs run at
+    once; the rest wait in a FIFO queue and are started as running jobs
+    finish, so no thread is held while queued.
+
+    With a SharedState, job records are also written to the shared store:
+    deduplication then spans every worker process, status queries and
+    cancellation work from any worker, and the owning worker refreshes its
+    jobs' records every sync_seconds.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        spawn: Optional[Callable[..., Any]] = None,
+        max_finished: int = 100,
+        state: Optional[SharedState] = None,
+        sync_seconds: float = 1.0
+    ):
+        """
+        Args:
+            max_concurrent: Jobs allowed to run at the same time
+            spawn: Starts ``fn(*args)`` in the background and returns an object
+                with ``join()``, e.g. ``socketio.start_background_task``.
+                Defaults to a daemon thread.
+            max_finished: Finished jobs kept for status queries
+            state: Shared store for running in several processes
+            sync_seconds: How often running jobs are written to the store
+                and cancellations from other workers are picked up
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_concurrent = max_concurrent
+        self.max_finished = max_finished
+        self._spawn = spawn or self._spawn_thread
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Job] = {}
+        self._targets: Dict[str, Callable[..., None]] = {}
+        self._active_keys: Dict[Hashable, str] = {}
+        self._queue: Deque[str] = deque()
+        self._handles: Dict[str, Any] = {}
+        self._finished: Deque[str] = deque()
+        self._accepting = True
+        self.state = state
+        self.sync_seconds = sync_seconds
+        self._syncing = None
+        self._stop_sync = threading.Event()
+
+    @staticmethod
+    def _spawn_thread(fn: Callable[..., None], *args):
+        thread = threading.Thread(target=fn, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, kind: str, key: Hashable, target: Callable[[Job], None], params: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        Queue a job unless an equivalent one is already active
+
+        Args:
+            kind: Job type, for display
+            key: Deduplication key, e.g. (repo URL, property id)
+            target: Called with the Job; should return promptly once job.stopped
+            params: Parameters shown in the job's status
+
+        Returns:
+            The new job, or the existing active job with the same key
+
+        Raises:
+            RuntimeError: If the manager is shutting down
+        """
+        with self._lock:
+            if not self._accepting:
+                raise RuntimeError("Job manager is shutting down")
+
+            existing_id = self._active_keys.get(key)
+            if existing_id:
+                self.logger.info(f"Reusing active {kind} job {existing_id}")
+                return self._jobs[existing_id]
+
+            job = Job(id=uuid.uuid4().hex[:12], kind=kind, key=key, params=params or {})
+            if self.state is not None:
+                existing = self.state.claim_job(job.to_dict(), key, ACTIVE_STATES)
+                if existing:
+                    self.logger.info(f"Reusing {kind} job {existing['id']} of worker {existing['owner']}")
+                    return self._from_record(existing)
+                if self._syncing is None:
+                    self._syncing = self._spawn(self._sync_loop)
+            self._jobs[job.id] = job
+            self._targets[job.id] = target
+            self._active_keys[key] = job.id
+            self._queue.append(job.id)
+            self.logger.info(f"Queued {kind} job {job.id}")
+            self._start_queued()
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.state is not None:
+            record = self.state.load_job(job_id)
+            job = self._from_record(record) if record else None
+        return job
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            jobs = dict(self._jobs)
+        if self.state is not None:
+            for record in self.state.list_jobs():
+                jobs.setdefault(record['id'], self._from_record(record))
+        return sorted(jobs.values(), key=lambda job: job.created_at)
+
+    @staticmethod
+    def _from_record(record: Dict[str, Any]) -> Job:
+        """A read-only copy of a job owned by another worker"""
+        return Job(
+            id=record['id'],
+            kind=record['kind'],
+            key=record.get('key'),
+            params=record.get('params') or {},
+            status=record['status'],
+            created_at=record['created_at'],
+            started_at=record.get('started_at'),
+            finished_at=record.get('finished_at'),
+            error=record.get('error'),
+            progress=record.get('progress') or {}
+        )
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job; queued jobs never start, running jobs are asked to stop
+
+        Returns:
+            The job, or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and self.state is not None:
+                if not self.state.request_cancel(job_id):
+                    return None
+                record = self.state.load_job(job_id)
+                self.logger.info(f"Asked worker {record['owner']} to cancel job {job_id}")
+                return self._from_record(record)
+            if not job or job.status not in ACTIVE_STATES:
+                return job
+
+            job._stop.set()
+            if job.status == 'queued':
+                self._queue.remove(job_id)
+                self._finish(job, 'cancelled')
+            else:
+                job.status = 'cancelling'
+                self._persist(job)
+            self.logger.info(f"Cancelling {job.kind} job {job_id}")
+            return job
+
+    def shutdown(self, timeout: float = 30):
+        """Stop accepting jobs, cancel everything and wait for running jobs to exit"""
+        with self._lock:
+            self._accepting = False
+            for job_id in list(self._jobs):
+                self.cancel(job_id)
+            handles = list(self._handles.values())
+            self._stop_sync.set()
+            if self._syncing is not None:
+                handles.append(self._syncing)
+
+        deadline = time.time() + timeout
+        for handle in handles:
+            try:
+                handle.join(max(0, deadline - time.time()))
+            except TypeError:
+                # Green threads join without a timeout
+                handle.join()
+        self.logger.info("Job manager stopped")
+
+    def _start_queued(self):
+        """Start queued jobs while below the concurrency limit; caller holds the lock"""
+        while self._queue and len(self._handles) < self.max_concurrent:
+            job_id = self._queue.popleft()
+            job = self._jobs[job_id]
+            job.status = 'running'
+            job.started_at = time.time()
+            self._persist(job)
+            self._handles[job_id] = None
+            try:
+                self._handles[job_id] = self._spawn(self._run, job_id)
+            except Exception as e:
+                self._handles.pop(job_id, None)
+                job.error = str(e)
+                self._finish(job, 'failed')
+
+    def _run(self, job_id: str):
+        job = self._jobs[job_id]
+        target = self._targets[job_id]
+        status = 'succeeded'
+        try:
+            target(job)
+        except Exception as e:
+            self.logger.error(f"{job.kind} job {job_id} failed: {e}")
+            job.error = str(e)
+            status = 'failed'
+
+        with self._lock:
+            if job.stopped and status == 'succeeded':
+                status = 'cancelled'
+            self._handles.pop(job_id, None)
+            self._finish(job, status)
+            if self._accepting:
+                self._start_queued()
+
+    def _finish(self, job: Job, status: str):
+        """Record a job's final state and forget old finished jobs; caller holds the lock"""
+        job.status = status
+        job.finished_at = time.time()
+        self._targets.pop(job.id, None)
+        if self._active_keys.get(job.key) == job.id:
+            del self._active_keys[job.key]
+
+        self._persist(job)
+
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self._jobs.pop(self._finished.popleft(), None)
+        self.logger.info(f"{job.kind} job {job.id} {status}")
+
+    def _persist(self, job: Job):
+        """Write a job's record to the shared store, if there is one"""
+        if self.state is None:
+            return
+        try:
+            self.state.save_jobs([job.to_dict()], [job.key])
+        except Exception as e:
+            self.logger.warning(f"Could not record job {job.id}: {e}")
+
+    def _sync_loop(self):
+        """Keep this worker's active jobs fresh in the store and apply cancellations from other workers"""
+        while not self._stop_sync.wait(self.sync_seconds):
+            try:
+                with self._lock:
+                    active = [job for job in self._jobs.values() if job.status in ACTIVE_STATES]
+                if active:
+                    self.state.save_jobs([job.to_dict() for job in active], [job.key for job in active])
+                for job_id in self.state.cancel_requests():
+                    self.cancel(job_id)
+            except Exception as e:
+                self.logger.warning(f"Job state sync failed: {e}")
@@ -0,0 +1,64 @@
+"""
+Merge Utilities - Three-way merges of AI edits with concurrent changes
+"""
+
+import logging
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MergeResult:
+    """Outcome of a three-way merge"""
+    content: bytes
+    conflicts: int
+
+    @property
+    def clean(self) -> bool:
+        return self.conflicts == 0
+
+
+def three_way_merge(base: bytes, ours: bytes, theirs: bytes) -> MergeResult:
+    """
+    Merge two edits of the same base content with ``git merge-file``
+
+    Args:
+        base: Content both edits started from
+        ours: The AI's edit
+        theirs: The file as it is on disk now
+
+    Returns:
+        The merged content and the number of conflicting hunks. If git is
+        not available the merge is reported as a single conflict.
+    """
+    if ours == theirs:
+        return MergeResult(content=ours, conflicts=0)
+    if base == theirs:
+        return MergeResult(content=ours, conflicts=0)
+    if base == ours:
+        return MergeResult(content=theirs, conflicts=0)
+
+    with tempfile.TemporaryDirectory(prefix='ai-merge-') as tmp_dir:
+        paths = {}
+        for name, content in (('ours', ours), ('base', base), ('theirs', theirs)):
+            paths[name] = Path(tmp_dir) / name
+            paths[name].write_bytes(content)
+
+        try:
+            result = subprocess.run(
+                ['git', 'merge-file', '-p', '-L', 'ai', '-L', 'base', '-L', 'working tree',
+                 str(paths['ours']), str(paths['base']), str(paths['theirs'])],
+                capture_output=True
+            )
+        except OSError as e:
+            logger.warning(f"git merge-file is not available: {e}")
+            return MergeResult(content=theirs, conflicts=1)
+
+    if result.returncode < 0 or result.returncode > 127:
+        logger.warning(f"git merge-file failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return MergeResult(content=theirs, conflicts=1)
+    return MergeResult(content=result.stdout, conflicts=result.returncode)
@@ -0,0 +1,103 @@
+"""
+Message Queue - Socket.IO client managers for running several worker processes
+"""
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import socketio
+
+
+class SQLiteQueueManager(socketio.PubSubManager):
+    """Socket.IO pub/sub over a SQLite table, for workers on one host.
+
+    A stand-in for Redis or RabbitMQ when every worker runs on the same
+    machine (and in tests): emits, room changes and disconnects are
+    appended to a table that each worker polls, so an event emitted by a
+    job in one worker reaches clients connected to any other. Messages
+    older than retention_seconds are pruned by the publishers.
+    """
+
+    name = 'sqlite'
+
+    def __init__(
+        self,
+        path: str = 'cache/socketio-queue.sqlite',
+        channel: str = 'flask-socketio',
+        write_only: bool = False,
+        logger=None,
+        json=None,
+        poll_seconds: float = 0.05,
+        retention_seconds: float = 60
+    ):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = Path(path)
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._last_prune = 0.0
+        self._publisher = self._connect()
+        # Only messages published after this worker started are delivered
+        self._last_id = self._publisher.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def _sleep(self, seconds: float):
+        if self.server is not None:
+            self.server.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _publish(self, data: Dict[str, Any]):
+        now = time.time()
+        self._publisher.execute(
+            "INSERT INTO messages (channel, payload, created_at) VALUES (?, ?, ?)",
+            (self.channel, self.json.dumps(data), now)
+        )
+        if now - self._last_prune > self.retention_seconds:
+            self._last_prune = now
+            self._publisher.execute("DELETE FROM messages WHERE created_at < ?", (now - self.retention_seconds,))
+
+    def _listen(self):
+        conn = self._connect()
+        while True:
+            rows = conn.execute(
+                "SELECT id, payload FROM messages WHERE id > ? AND channel = ? ORDER BY id",
+                (self._last_id, self.channel)
+            ).fetchall()
+            for message_id, payload in rows:
+                self._last_id = message_id
+                yield payload
+            if not rows:
+                self._sleep(self.poll_seconds)
+
+
+def socketio_options(message_queue: Optional[str]) -> Dict[str, Any]:
+    """
+    SocketIO keyword arguments for a message queue URL
+
+    ``sqlite:///relative/path`` and ``sqlite:////absolute/path`` select
+    SQLiteQueueManager; Redis, Kafka and Kombu URLs are handed to
+    Flask-SocketIO; an empty value runs single-process.
+    """
+    if not message_queue:
+        return {}
+    if message_queue.startswith('sqlite:///'):
+        path = message_queue[len('sqlite:///'):]
+        logging.getLogger(__name__).info(f"Socket.IO message queue: SQLite at {path}")
+        return {'client_manager': SQLiteQueueManager(path)}
+    return {'message_queue': message_queue}
@@ -0,0 +1,77 @@
+"""
+Offload - Run blocking git and disk work in native threads, off the eventlet hub
+"""
+
+import functools
+import logging
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar, Union
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+
+def hub_is_patched() -> bool:
+    """Whether eventlet has monkey patched threading, i.e. callers are green threads"""
+    # Patching happens after importing eventlet; never import it just to ask
+    if 'eventlet' not in sys.modules:
+        return False
+    from eventlet import patcher
+    return patcher.is_monkey_patched('thread')
+
+
+def configure(threads: Optional[int] = None):
+    """
+    Size the native thread pool used for blocking calls
+
+    Args:
+        threads: Pool size; None keeps eventlet's default (EVENTLET_THREADPOOL_SIZE or 20)
+    """
+    if threads and hub_is_patched():
+        from eventlet import tpool
+        tpool.set_num_threads(threads)
+        logger.info(f"Blocking calls run in a pool of {threads} threads")
+
+
+def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call without stalling other green threads
+
+    Under eventlet the call runs in a native thread while the calling green
+    thread yields to the hub, so WebSocket heartbeats and other jobs keep
+    running; its result or exception is handed back to the caller. Without
+    monkey patching every caller is already a native thread and fn is
+    simply called.
+
+    fn runs outside the hub: it must not use green locks, sockets, Socket.IO
+    emits or anything else that needs the hub. Filesystem calls and GitPython
+    read operations are fine.
+    """
+    if hub_is_patched():
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def blocking(fn: Callable[..., T]) -> Callable[..., T]:
+    """Decorator: every call of fn goes through run_blocking"""
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        return run_blocking(fn, *args, **kwargs)
+    return wrapper
+
+
+@blocking
+def rmtree(path: Union[str, Path], ignore_errors: bool = False):
+    """shutil.rmtree off the hub; removing a large working copy can take seconds"""
+    shutil.rmtree(path, ignore_errors=ignore_errors)
+
+
+@blocking
+def append_text(path: Union[str, Path], text: str):
+    """Append text to a file off the hub"""
+    with open(path, 'a') as f:
+        f.write(text)
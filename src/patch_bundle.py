@@ -0,0 +1,356 @@
+"""
+Patch Bundles - Reviewable, re-appliable output of preview runs
+"""
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .diff_utils import LazyDiff
+
+INDEX_NAME = 'index.json'
+SERIES_NAME = 'series.mbox'
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+class PatchApplyError(Exception):
+    """Raised when a patch does not apply to the current file content"""
+
+
+def render_patch(rel_path: str, original_content: str, new_content: str) -> str:
+    """
+    Render a git-style unified diff that ``git apply`` and apply_patch() accept
+
+    Unlike a plain difflib diff, a last line without a newline is followed by
+    the ``\\ No newline at end of file`` marker instead of running into the
+    next line.
+    """
+    lines = [
+        f"diff --git a/{rel_path} b/{rel_path}\n",
+        f"--- a/{rel_path}\n",
+        f"+++ b/{rel_path}\n",
+    ]
+    diff = difflib.unified_diff(
+        original_content.splitlines(keepends=True),
+        new_content.splitlines(keepends=True),
+        n=3
+    )
+    for line in diff:
+        if line.startswith(('---', '+++')):
+            continue
+        if line.endswith('\n'):
+            lines.append(line)
+        else:
+            lines.append(line + '\n\\ No newline at end of file\n')
+    return ''.join(lines)
+
+
+def apply_patch(content: str, patch: str) -> str:
+    """
+    Apply a single-file unified diff to content
+
+    Hunks are matched at their recorded position first, then searched for
+    nearby, so a patch still applies if unrelated lines moved.
+
+    Raises:
+        PatchApplyError: If a hunk's context is not found
+    """
+    lines = content.splitlines(keepends=True)
+    hunks = _parse_hunks(patch)
+    result: List[str] = []
+    position = 0
+    offset = 0
+
+    for start, old_lines, new_lines in hunks:
+        expected = max(start - 1 + offset, position)
+        found = _find_block(lines, old_lines, expected, position)
+        if found is None:
+            raise PatchApplyError(f"hunk at line {start} does not match the current content")
+        result.extend(lines[position:found])
+        result.extend(new_lines)
+        position = found + len(old_lines)
+        offset = found - (start - 1)
+
+    result.extend(lines[position:])
+    return ''.join(result)
+
+
+def _parse_hunks(patch: str):
+    """Split a unified diff into (old start, old lines, new lines) hunks"""
+    hunks = []
+    old_lines: Optional[List[str]] = None
+    new_lines: List[str] = []
+    last_kind = None
+    start = 0
+
+    for line in patch.splitlines(keepends=True):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            if old_lines is not None:
+                hunks.append((start, old_lines, new_lines))
+            start = int(header.group(1)) or 1
+            old_lines, new_lines, last_kind = [], [], None
+            continue
+        if old_lines is None:
+            continue
+        if line.startswith('\\'):
+            # The previous line has no trailing newline
+            if last_kind in (' ', '-'):
+                old_lines[-1] = old_lines[-1].rstrip('\n')
+            if last_kind in (' ', '+'):
+                new_lines[-1] = new_lines[-1].rstrip('\n')
+            continue
+        kind, text = line[:1], line[1:]
+        if kind == ' ':
+            old_lines.append(text)
+            new_lines.append(text)
+        elif kind == '-':
+            old_lines.append(text)
+        elif kind == '+':
+            new_lines.append(text)
+        else:
+            continue
+        last_kind = kind
+
+    if old_lines is not None:
+        hunks.append((start, old_lines, new_lines))
+    return hunks
+
+
+def _find_block(lines: List[str], block: List[str], expected: int, lower: int) -> Optional[int]:
+    """Find block in lines, trying expected first and then moving outwards"""
+    size = len(block)
+    upper = len(lines) - size
+    if upper < lower:
+        return None
+    for distance in range(0, max(expected - lower, upper - expected) + 1):
+        for index in (expected - distance, expected + distance):
+            if lower <= index <= upper and lines[index:index + size] == block:
+                return index
+    return None
+
+
+class PatchBundleWriter:
+    """Streams one task's preview diffs into a patch bundle.
+
+    Each bundle is a directory holding ``series.mbox`` - a git-format-patch
+    style series with one message per file, usable with ``git am`` - and
+    ``index.json`` describing every patch with the content hashes needed to
+    apply it later. Patches are appended and flushed as each file's diff
+    arrives, so an interrupted run still leaves every finished result.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        file_processing = config.get('file_processing', {})
+        self.bundle_dir = Path(file_processing.get('patch_bundle_directory', './patches'))
+        self.author_name = file_processing.get('git_author_name', 'AI Code Assistant')
+        self.author_email = file_processing.get('git_author_email', 'ai-assistant@localhost')
+        self.current: Optional[Path] = None
+        self._root: Optional[Path] = None
+        self._index: Dict[str, Any] = {}
+        self._series = None
+
+    def open(self, label: str, root: Optional[Path] = None) -> Path:
+        """
+        Start a bundle for a task
+
+        Args:
+            label: Task description, used for the bundle name and patch subjects
+            root: Directory patch paths are relative to, usually the repository
+
+        Returns:
+            The bundle directory
+        """
+        if self.current is not None:
+            self.close()
+
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-').lower()[:60] or 'task'
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{slug}"
+        bundle = self.bundle_dir / name
+        suffix = 1
+        while bundle.exists():
+            suffix += 1
+            bundle = self.bundle_dir / f"{name}-{suffix}"
+        bundle.mkdir(parents=True)
+
+        self.current = bundle
+        self._root = Path(root).resolve() if root else None
+        self._index = {
+            'label': label,
+            'root': str(self._root) if self._root else None,
+            'created_at': datetime.now().isoformat(),
+            'status': 'open',
+            'patches': []
+        }
+        self._series = open(bundle / SERIES_NAME, 'ab')
+        self._write_index()
+        self.logger.info(f"Writing patch bundle {bundle}")
+        return bundle
+
+    def add(self, diff: LazyDiff):
+        """Append a file's diff to the open bundle; a diff sink for FileWriter"""
+        if self.current is None:
+            return
+
+        file_path = Path(diff.file_path).resolve()
+        if self._root:
+            try:
+                rel_path = file_path.relative_to(self._root).as_posix()
+            except ValueError:
+                rel_path = file_path.as_posix().lstrip('/')
+        else:
+            rel_path = file_path.as_posix().lstrip('/')
+
+        patch = render_patch(rel_path, diff.original_content, diff.new_content)
+        number = len(self._index['patches']) + 1
+
+        # A later patch for the same file replaces the earlier one on apply
+        for entry in self._index['patches']:
+            if entry['path'] == rel_path:
+                entry['superseded'] = True
+
+        header = self._message_header(number, rel_path, diff).encode('utf-8')
+        body = patch.encode('utf-8')
+        offset = self._series.tell()
+        self._series.write(header + body + b"-- \n\n")
+        self._series.flush()
+        os.fsync(self._series.fileno())
+
+        self._index['patches'].append({
+            'number': number,
+            'path': rel_path,
+            'patch_offset': offset + len(header),
+            'length': len(body),
+            'base_sha256': hashlib.sha256(diff.original_content.encode('utf-8')).hexdigest(),
+            'result_sha256': hashlib.sha256(diff.new_content.encode('utf-8')).hexdigest(),
+            'added': diff.stats.added,
+            'removed': diff.stats.removed,
+            'superseded': False
+        })
+        self._write_index()
+
+    def close(self, status: str = 'complete') -> Optional[Path]:
+        """Finish the open bundle, removing it if no patches were written"""
+        bundle = self.current
+        if bundle is None:
+            return None
+
+        self._series.close()
+        self._series = None
+        self.current = None
+
+        if not self._index['patches']:
+            for name in (SERIES_NAME, INDEX_NAME):
+                (bundle / name).unlink(missing_ok=True)
+            bundle.rmdir()
+            return None
+
+        self._index['status'] = status
+        self._write_index(bundle)
+        self.logger.info(f"Patch bundle {bundle}: {len(self._index['patches'])} patches ({status})")
+        return bundle
+
+    def _message_header(self, number: int, rel_path: str, diff: LazyDiff) -> str:
+        return (
+            "From 0000000000000000000000000000000000000000 Mon Sep 17 00:00:00 2001\n"
+            f"From: {self.author_name} <{self.author_email}>\n"
+            f"Date: {formatdate(localtime=True)}\n"
+            f"Subject: [PATCH {number}] {self._index['label']}: {rel_path}\n"
+            "\n"
+            "---\n"
+            f" {rel_path} | {diff.stats}\n"
+            "\n"
+        )
+
+    def _write_index(self, bundle: Optional[Path] = None):
+        """Rewrite index.json atomically"""
+        bundle = bundle or self.current
+        fd, tmp_name = tempfile.mkstemp(dir=bundle, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, indent=2)
+            os.replace(tmp_name, bundle / INDEX_NAME)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+
+def load_bundle(bundle: Path) -> Dict[str, Any]:
+    """
+    Read a bundle's index and the patch text of each file it changes
+
+    Returns:
+        The index, with a ``patch`` key added to each current patch and
+        superseded patches dropped
+    """
+    bundle = Path(bundle)
+    index = json.loads((bundle / INDEX_NAME).read_text(encoding='utf-8'))
+    with open(bundle / SERIES_NAME, 'rb') as f:
+        patches = []
+        for entry in index['patches']:
+            if entry.get('superseded'):
+                continue
+            f.seek(entry['patch_offset'])
+            entry['patch'] = f.read(entry['length']).decode('utf-8')
+            patches.append(entry)
+    index['patches'] = patches
+    return index
+
+
+def apply_bundle(bundle: Path, file_writer, root: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Apply a bundle's patches as one FileWriter task, without any AI calls
+
+    Every patch is checked against the current files first; if any does not
+    apply, nothing is written.
+
+    Args:
+        bundle: Bundle directory
+        file_writer: FileWriter with auto_apply_changes enabled
+        root: Directory to apply to, defaulting to the root recorded in the bundle
+
+    Returns:
+        Summary with the root applied to, the applied paths, the paths that
+        changed since the bundle was written, and any errors
+    """
+    index = load_bundle(bundle)
+    root = Path(root or index.get('root') or '/')
+    summary: Dict[str, Any] = {'root': str(root), 'applied': [], 'drifted': [], 'errors': []}
+
+    updates = []
+    for entry in index['patches']:
+        file_path = root / entry['path']
+        try:
+            current = file_path.read_bytes().decode('utf-8')
+            if hashlib.sha256(current.encode('utf-8')).hexdigest() != entry['base_sha256']:
+                summary['drifted'].append(entry['path'])
+            updates.append((file_path, current, apply_patch(current, entry['patch'])))
+        except (OSError, UnicodeDecodeError, PatchApplyError) as e:
+            summary['errors'].append(f"{entry['path']}: {e}")
+
+    if summary['errors']:
+        return summary
+
+    file_writer.begin_task(f"apply {Path(bundle).name}")
+    for file_path, current, new_content in updates:
+        if not file_writer.apply_changes(file_path, new_content, original_content=current):
+            summary['errors'].append(f"{file_path}: could not be written")
+    if summary['errors']:
+        file_writer.rollback_task()
+        return summary
+    if not file_writer.commit_task():
+        summary['errors'].append("writes could not be applied and were rolled back")
+        return summary
+
+    summary['applied'] = [str(path) for path in file_writer.committed_paths]
+    return summary
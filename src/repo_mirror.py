@@ -0,0 +1,241 @@
+"""
+Repository Mirror - Shared bare mirrors and cheap working copies made from them
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from . import offload
+
+ProgressCallback = Callable[[str, Optional[int]], None]
+
+# "Receiving objects:  45% (450/1000)" and similar git --progress lines
+_PROGRESS_LINE = re.compile(r'^(?:remote: )?([A-Za-z ]+):\s+(\d+)%')
+
+
+class MirrorError(Exception):
+    """Raised when a git command against a mirror or working copy fails"""
+
+
+def strip_credentials(url: str) -> str:
+    """Remove any user/token from a URL so it is safe to store and log"""
+    parts = urlsplit(url)
+    if '@' not in parts.netloc:
+        return url
+    return urlunsplit(parts._replace(netloc=parts.netloc.rsplit('@', 1)[1]))
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a lock file, against other threads and processes
+
+    Every holder opens the file itself, so the flock also excludes other
+    threads of this process. The file is created if needed and left in place.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # The holder may be cloning a large repository; wait off the hub
+        offload.run_blocking(fcntl.flock, fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def run_git(*args: str, cwd: Optional[Path] = None, progress: Optional[ProgressCallback] = None,
+            stage: str = 'git') -> str:
+    """Run git, forwarding --progress output to the callback"""
+    process = subprocess.Popen(
+        ['git', *args],
+        cwd=str(cwd) if cwd else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    # Drain stdout alongside stderr, or git blocks once the stdout pipe is full
+    stdout_chunks: List[bytes] = []
+    stdout_reader = threading.Thread(target=lambda: stdout_chunks.append(process.stdout.read()), daemon=True)
+    stdout_reader.start()
+    stderr_lines = []
+    buffer = b''
+    last_reported = None
+    while True:
+        chunk = process.stderr.read(256)
+        if not chunk:
+            break
+        buffer += chunk
+        # git redraws progress lines with \r
+        *lines, buffer = re.split(rb'[\r\n]', buffer)
+        for raw_line in lines:
+            line = raw_line.decode('utf-8', 'replace').strip()
+            if not line:
+                continue
+            match = _PROGRESS_LINE.match(line)
+            if match:
+                phase, percent = match.group(1).strip(), int(match.group(2))
+                # Report each phase in steps of at least 5% to keep event volume low
+                if progress and (
+                    last_reported is None or phase != last_reported[0]
+                    or percent >= last_reported[1] + 5 or percent == 100
+                ):
+                    progress(f"{stage}: {phase}", percent)
+                    last_reported = (phase, percent)
+            else:
+                stderr_lines.append(line)
+    stdout_reader.join()
+    stdout = b''.join(stdout_chunks)
+    if process.wait() != 0:
+        raise MirrorError(f"git {args[0]} failed: {strip_credentials(' '.join(stderr_lines[-5:]))}")
+    return stdout.decode('utf-8', 'replace').strip()
+
+
+class MirrorCache:
+    """Keeps one bare mirror per repository URL.
+
+    The first request for a URL pays for a full clone; afterwards the
+    mirror is brought up to date with an incremental fetch, so no request
+    transfers more from the remote than what changed. The app's jobs work
+    in worktrees of repositories that borrow the mirror's objects (see
+    WorktreePool), so garbage collection is disabled on mirrors: objects a
+    forced push or deleted branch leaves unreferenced may still be needed
+    by those repositories.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        web = config.get('web', {})
+        self.mirror_dir = Path(web.get('mirror_directory', 'repos/mirrors'))
+        self.checkout_depth = web.get('checkout_depth', 1)
+        self.sparse_extensions: List[str] = web.get('sparse_extensions', [])
+        self.always_checkout: List[str] = web.get('always_checkout', ['project_config.json'])
+
+    def mirror_path(self, url: str) -> Path:
+        """Local mirror location for a URL, independent of any credentials in it"""
+        clean_url = strip_credentials(url).rstrip('/')
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', clean_url.rsplit('/', 1)[-1].replace('.git', '')) or 'repo'
+        digest = hashlib.sha256(clean_url.encode('utf-8')).hexdigest()[:16]
+        return self.mirror_dir / f"{name}-{digest}.git"
+
+    def _lock_for(self, path: Path):
+        """Lock on a mirror, shared by every worker process using the mirror directory"""
+        return file_lock(path.with_name(path.name + '.lock'))
+
+    _git = staticmethod(run_git)
+
+    def update(self, auth_url: str, progress: Optional[ProgressCallback] = None) -> Path:
+        """
+        Create or refresh the mirror for a URL
+
+        Args:
+            auth_url: Repository URL, possibly with a token; the token is used
+                for this fetch only and never written to the mirror's config
+            progress: Called with (stage, percent) as git reports progress
+
+        Returns:
+            Path of the bare mirror
+        """
+        mirror = self.mirror_path(auth_url)
+        with self._lock_for(mirror):
+            if (mirror / 'HEAD').exists():
+                if progress:
+                    progress('Fetching updates', None)
+                self._git(
+                    '--git-dir', str(mirror), 'fetch', '--prune', '--progress', auth_url,
+                    '+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*',
+                    progress=progress, stage='fetch'
+                )
+                self.logger.info(f"Updated mirror {mirror}")
+            else:
+                if progress:
+                    progress('Cloning mirror', None)
+                mirror.parent.mkdir(parents=True, exist_ok=True)
+                tmp_mirror = mirror.with_name(mirror.name + '.tmp')
+                offload.rmtree(tmp_mirror, ignore_errors=True)
+                self._git('clone', '--mirror', '--progress', auth_url, str(tmp_mirror), progress=progress, stage='clone')
+                self._git('--git-dir', str(tmp_mirror), 'remote', 'set-url', 'origin', strip_credentials(auth_url))
+                tmp_mirror.rename(mirror)
+                self.logger.info(f"Created mirror {mirror}")
+            # Also applied to mirrors created before this setting existed
+            for key, value in (('gc.auto', '0'), ('gc.pruneExpire', 'never'), ('maintenance.auto', 'false')):
+                self._git('--git-dir', str(mirror), 'config', key, value)
+        return mirror
+
+    def checkout(
+        self,
+        auth_url: str,
+        dest: Path,
+        branch: Optional[str] = None,
+        new_branch: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Path:
+        """
+        Create a standalone shallow working copy from the mirror, replacing anything at dest
+
+        The app hands jobs worktrees from WorktreePool instead; this is for
+        scripts and the tests that need an independent clone.
+
+        Args:
+            auth_url: Repository URL the mirror was made from
+            dest: Working copy location
+            branch: Branch to check out, the remote's default if None or missing
+            new_branch: Create and switch to this branch after checking out
+            progress: Called with (stage, percent) as git reports progress
+
+        Returns:
+            Path of the working copy
+        """
+        mirror = self.update(auth_url, progress)
+        dest = Path(dest)
+
+        if branch and not self._has_branch(mirror, branch):
+            self.logger.warning(f"Branch {branch} not found in {strip_credentials(auth_url)}, using the default branch")
+            branch = None
+
+        if dest.exists():
+            # Deleting a large working copy must not stall the server's other green threads
+            offload.rmtree(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+        if progress:
+            progress('Creating working copy', None)
+        clone_args = ['clone', '--no-checkout', '--progress']
+        if self.checkout_depth:
+            clone_args += ['--depth', str(self.checkout_depth)]
+        if branch:
+            clone_args += ['--branch', branch]
+        # file:// makes git honour --depth for a local source
+        self._git(*clone_args, mirror.resolve().as_uri(), str(dest), progress=progress, stage='checkout')
+
+        if self.sparse_extensions:
+            patterns = [f'*{ext}' for ext in self.sparse_extensions] + self.always_checkout
+            self._git('sparse-checkout', 'set', '--no-cone', *patterns, cwd=dest)
+        self._git('checkout', '--progress', cwd=dest, progress=progress, stage='checkout')
+        if new_branch:
+            self._git('checkout', '-b', new_branch, cwd=dest)
+
+        # Point the working copy at the real remote rather than the local mirror
+        self._git('remote', 'set-url', 'origin', strip_credentials(auth_url), cwd=dest)
+
+        if progress:
+            progress('Ready', 100)
+        self.logger.info(f"Checked out {strip_credentials(auth_url)} into {dest}")
+        return dest
+
+    def _has_branch(self, mirror: Path, branch: str) -> bool:
+        try:
+            self._git('--git-dir', str(mirror), 'rev-parse', '--verify', '-q', f'refs/heads/{branch}')
+            return True
+        except MirrorError:
+            return False
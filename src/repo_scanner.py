@@ -59,7 +59,38 @@ class RepoScanner:
         
         self.logger.info(f"Found {len(matching_files)} matching files, excluded {excluded_count} files")
         return matching_files
-    
+
+    def filter_candidates(
+        self,
+        repo_path: str,
+        candidates: List[str],
+        file_extensions: List[str],
+        exclude_patterns: List[str]
+    ) -> List[Path]:
+        """
+        Filter a known list of repository files instead of walking the tree
+
+        Args:
+            repo_path: Path to the repository
+            candidates: File paths relative to the repository root
+            file_extensions: List of file extensions to include
+            exclude_patterns: List of patterns to exclude
+
+        Returns:
+            List of Path objects for matching files
+        """
+        repo_path = Path(repo_path)
+        matching_files = []
+
+        for candidate in candidates:
+            file_path = repo_path / candidate
+            if self._should_exclude(file_path, exclude_patterns):
+                continue
+            if self._has_matching_extension(file_path, file_extensions):
+                matching_files.append(file_path)
+
+        return matching_files
+
     def _should_exclude(self, file_path: Path, exclude_patterns: List[str]) -> bool:
         """Check if a file should be excluded based on patterns"""
         file_path_str = str(file_path)
@@ -102,9 +133,8 @@ class RepoScanner:
                 self.logger.warning(f"File too large ({file_size} bytes): {file_path}")
                 return None
             
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # Read file content, keeping line endings so edits can be merged byte for byte
+            content = file_path.read_bytes().decode('utf-8')
             
             self.logger.debug(f"Read file: {file_path} ({len(content)} characters)")
             return content
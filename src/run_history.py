@@ -0,0 +1,159 @@
+"""
+Run History - Records provider latencies and content fingerprints across runs
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class RunHistory:
+    """SQLite-backed history shared by every process working on the same cache directory.
+
+    Two things are kept:
+
+    * per-provider call statistics (latency and prompt/response sizes), used
+      to estimate the duration and cost of future runs
+    * fingerprints of (goal, content) pairs the AI left unchanged, so the
+      same file is not sent again for the same goal until it changes
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        history_config = config.get('monitoring', {}).get('history', {})
+        self.db_path = Path(history_config.get('database', './cache/run_history.sqlite'))
+        self.max_fingerprints = history_config.get('max_fingerprints', 100000)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inserts_since_trim = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the history database lazily, creating the schema if needed"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS provider_stats (
+                    provider TEXT PRIMARY KEY,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    total_seconds REAL NOT NULL DEFAULT 0,
+                    input_chars INTEGER NOT NULL DEFAULT 0,
+                    output_chars INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS unchanged_fingerprints (
+                    fingerprint TEXT PRIMARY KEY,
+                    recorded_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_fingerprints_recorded_at
+                    ON unchanged_fingerprints (recorded_at);
+            """)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def fingerprint(goal: str, content: str) -> str:
+        """Fingerprint a (goal, content) pair"""
+        digest = hashlib.sha256()
+        digest.update(goal.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(content.encode('utf-8'))
+        return digest.hexdigest()
+
+    def record_call(self, provider: str, seconds: float, input_chars: int, output_chars: int):
+        """Record one completed provider call"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        """
+                        INSERT INTO provider_stats (provider, calls, total_seconds, input_chars, output_chars)
+                        VALUES (?, 1, ?, ?, ?)
+                        ON CONFLICT(provider) DO UPDATE SET
+                            calls = calls + 1,
+                            total_seconds = total_seconds + excluded.total_seconds,
+                            input_chars = input_chars + excluded.input_chars,
+                            output_chars = output_chars + excluded.output_chars
+                        """,
+                        (provider, seconds, input_chars, output_chars)
+                    )
+        except Exception as e:
+            self.logger.warning(f"Could not record provider call: {e}")
+
+    def get_provider_stats(self, provider: str) -> Optional[Dict[str, float]]:
+        """
+        Get aggregated statistics for a provider
+
+        Returns:
+            Dict with calls, avg_seconds and output_ratio, or None if the provider has no history
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT calls, total_seconds, input_chars, output_chars FROM provider_stats WHERE provider = ?",
+                    (provider,)
+                ).fetchone()
+        except Exception as e:
+            self.logger.warning(f"Could not read provider stats: {e}")
+            return None
+
+        if not row or not row[0]:
+            return None
+        calls, total_seconds, input_chars, output_chars = row
+        return {
+            'calls': calls,
+            'avg_seconds': total_seconds / calls,
+            'output_ratio': output_chars / input_chars if input_chars else 1.0
+        }
+
+    def record_unchanged(self, goal: str, content: str):
+        """Remember that the AI made no changes to this content for this goal"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO unchanged_fingerprints (fingerprint, recorded_at) VALUES (?, ?)",
+                        (self.fingerprint(goal, content), time.time())
+                    )
+                    self._inserts_since_trim += 1
+                    if self._inserts_since_trim < 1000:
+                        return
+                    # Keep the table bounded by dropping the oldest fingerprints
+                    self._inserts_since_trim = 0
+                    conn.execute(
+                        """
+                        DELETE FROM unchanged_fingerprints WHERE fingerprint IN (
+                            SELECT fingerprint FROM unchanged_fingerprints
+                            ORDER BY recorded_at DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (self.max_fingerprints,)
+                    )
+        except Exception as e:
+            self.logger.warning(f"Could not record fingerprint: {e}")
+
+    def is_unchanged(self, goal: str, content: str) -> bool:
+        """Check whether this content was already left unchanged for this goal"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT 1 FROM unchanged_fingerprints WHERE fingerprint = ?",
+                    (self.fingerprint(goal, content),)
+                ).fetchone()
+            return row is not None
+        except Exception as e:
+            self.logger.warning(f"Could not look up fingerprint: {e}")
+            return False
+
+    def close(self):
+        """Close the history database"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,141 @@
+"""
+Run Planner - Estimates tokens, cost and duration of a batch before running it
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+
+@dataclass
+class PlanEstimate:
+    """Estimated cost of running one goal on one repository with one provider"""
+    repo_name: str
+    goal: str
+    provider: str
+    files_selected: int
+    files_cached: int
+    files_to_send: int
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    wall_seconds: float
+    latency_from_history: bool
+
+
+class RunPlanner:
+    """Builds a run plan from the scanner, the fingerprint cache and past latencies.
+
+    Nothing here calls an AI provider: prompts are built locally only to
+    measure their size.
+    """
+
+    CHARS_PER_TOKEN = 4
+    DEFAULT_LATENCY_SECONDS = 10.0
+
+    def __init__(self, task_manager):
+        self.task_manager = task_manager
+        self.config = task_manager.config
+        self.logger = logging.getLogger(__name__)
+
+    def get_providers(self) -> List[str]:
+        """Get enabled providers from configuration, default provider first"""
+        default = self.config.get('default_provider', 'gemini')
+        enabled = [
+            name for name, settings in self.config.get('ai_providers', {}).items()
+            if settings.get('enabled', False)
+        ]
+        return sorted(enabled, key=lambda name: name != default)
+
+    def plan(self, tasks: List[Any]) -> List[PlanEstimate]:
+        """
+        Estimate every (task, provider) combination
+
+        Args:
+            tasks: Tasks to plan; they are not queued or executed
+
+        Returns:
+            One estimate per task and enabled provider
+        """
+        repo_scanner = self.task_manager.repo_scanner
+        run_history = self.task_manager.run_history
+        ai_interface = self.task_manager.ai_interface
+
+        # Files are selected and read once per repository and shared across goals
+        tasks_by_repo: Dict[str, List[Any]] = {}
+        for task in tasks:
+            tasks_by_repo.setdefault(task.repo_name, []).append(task)
+
+        counts: Dict[int, Dict[str, int]] = {
+            id(task): {'selected': 0, 'cached': 0, 'send': 0, 'prompt_chars': 0, 'content_chars': 0}
+            for task in tasks
+        }
+        for repo_tasks in tasks_by_repo.values():
+            files = self.task_manager._select_files(repo_tasks[0])
+            for file_path in files:
+                content = repo_scanner.read_file(file_path)
+                if not content:
+                    continue
+                for task in repo_tasks:
+                    task_counts = counts[id(task)]
+                    task_counts['selected'] += 1
+                    if run_history.is_unchanged(task.goal, content):
+                        task_counts['cached'] += 1
+                        continue
+                    task_counts['send'] += 1
+                    task_counts['prompt_chars'] += len(ai_interface._build_prompt(content, task.goal, str(file_path)))
+                    task_counts['content_chars'] += len(content)
+
+        estimates = []
+        for provider in self.get_providers():
+            provider_config = self.config.get('ai_providers', {}).get(provider, {})
+            stats = run_history.get_provider_stats(provider)
+            latency = stats['avg_seconds'] if stats else self.DEFAULT_LATENCY_SECONDS
+            output_ratio = stats['output_ratio'] if stats else 1.0
+
+            for task in tasks:
+                task_counts = counts[id(task)]
+                input_tokens = task_counts['prompt_chars'] // self.CHARS_PER_TOKEN
+                output_tokens = int(task_counts['content_chars'] * output_ratio) // self.CHARS_PER_TOKEN
+                cost = (
+                    input_tokens / 1000 * provider_config.get('cost_per_1k_input_tokens', 0.0)
+                    + output_tokens / 1000 * provider_config.get('cost_per_1k_output_tokens', 0.0)
+                )
+                estimates.append(PlanEstimate(
+                    repo_name=task.repo_name,
+                    goal=task.goal,
+                    provider=provider,
+                    files_selected=task_counts['selected'],
+                    files_cached=task_counts['cached'],
+                    files_to_send=task_counts['send'],
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    cost=cost,
+                    wall_seconds=task_counts['send'] * latency,
+                    latency_from_history=stats is not None
+                ))
+
+        return estimates
+
+    def estimate_total_wall_seconds(self, estimates: List[PlanEstimate], provider: str) -> float:
+        """
+        Estimate the wall time of the whole batch for one provider
+
+        Tasks for a repository run one after another. In parallel mode the
+        repositories run side by side, limited by the shared AI concurrency.
+        """
+        per_repo: Dict[str, float] = {}
+        for estimate in estimates:
+            if estimate.provider == provider:
+                per_repo[estimate.repo_name] = per_repo.get(estimate.repo_name, 0.0) + estimate.wall_seconds
+
+        if not per_repo:
+            return 0.0
+
+        monitoring = self.config.get('monitoring', {})
+        if not monitoring.get('parallel_processing', False) or len(per_repo) == 1:
+            return sum(per_repo.values())
+
+        workers = monitoring.get('max_workers') or len(per_repo)
+        concurrency = max(1, min(workers, monitoring.get('max_concurrent_ai_requests', 4), len(per_repo)))
+        return max(max(per_repo.values()), sum(per_repo.values()) / concurrency)
@@ -0,0 +1,328 @@
+"""
+Shared State - Counters, job records and room state shared by worker processes
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional
+
+
+def worker_id() -> str:
+    """Identifies this process among the workers sharing the store"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def encode_key(key: Hashable) -> str:
+    """Job deduplication keys are tuples; store them as JSON arrays"""
+    return json.dumps(list(key) if isinstance(key, tuple) else key)
+
+
+def decode_key(value: str) -> Hashable:
+    key = json.loads(value)
+    return tuple(key) if isinstance(key, list) else key
+
+
+class SharedState:
+    """SQLite-backed state for running the dashboard in several processes.
+
+    Counters are incremented atomically in the database instead of in
+    module globals, job records are visible to every worker (each job is
+    owned by the worker running it, which keeps its heartbeat fresh), and
+    the last state delivered to each Socket.IO room is kept so a client
+    connecting to any worker gets the same snapshot. Commit activity (the
+    last HEAD seen in each working copy, per-repository counts and recent
+    commits) is kept here too, so every worker counts each commit once.
+    """
+
+    def __init__(self, path: str = 'cache/state.sqlite', stale_seconds: float = 30):
+        """
+        Args:
+            path: Database file, on storage every worker can reach
+            stale_seconds: Active jobs whose owner has not written for this long are considered lost
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.stale_seconds = stale_seconds
+        self.owner = worker_id()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    job_key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (job_key, status);
+                CREATE TABLE IF NOT EXISTS room_state (
+                    room TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (room, name)
+                );
+                CREATE TABLE IF NOT EXISTS commit_heads (
+                    path TEXT PRIMARY KEY,
+                    repo TEXT NOT NULL,
+                    head TEXT
+                );
+                CREATE TABLE IF NOT EXISTS commit_counts (
+                    repo TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS recent_commits (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    repo TEXT NOT NULL,
+                    sha TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_recent_commits_repo ON recent_commits (repo, seq);
+            """)
+            self._conn = conn
+        return self._conn
+
+    # Counters
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        """Atomically add to a counter and return its new value"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (name, amount)
+                )
+                value = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()['value']
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def set_counter(self, name: str, value: int):
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, value))
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row['value'] if row else 0
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT name, value FROM counters").fetchall()
+        return {row['name']: row['value'] for row in rows}
+
+    # Jobs
+
+    def claim_job(self, record: Dict[str, Any], key: Hashable, active_states) -> Optional[Dict[str, Any]]:
+        """
+        Register a new job unless a live worker already has an active job with the same key
+
+        Returns:
+            None if the job was registered, otherwise the existing job's record
+        """
+        placeholders = ', '.join('?' * len(active_states))
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT * FROM jobs WHERE job_key = ? AND status IN ({placeholders}) AND updated_at > ? "
+                    "ORDER BY updated_at DESC LIMIT 1",
+                    (encode_key(key), *active_states, time.time() - self.stale_seconds)
+                ).fetchone()
+                if row is None:
+                    self._write_job(conn, record, key)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._record(row) if row else None
+
+    def _write_job(self, conn: sqlite3.Connection, record: Dict[str, Any], key: Hashable):
+        conn.execute(
+            """
+            INSERT INTO jobs (id, job_key, owner, status, record, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET status = excluded.status, record = excluded.record,
+                updated_at = excluded.updated_at
+            """,
+            (record['id'], encode_key(key), self.owner, record['status'], json.dumps(record, default=str), time.time())
+        )
+
+    def save_jobs(self, records: List[Dict[str, Any]], keys: List[Hashable]):
+        """Write this worker's current view of its jobs, refreshing their heartbeat"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for record, key in zip(records, keys):
+                    self._write_job(conn, record, key)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def list_jobs(self, limit: int = 200) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def _record(self, row: sqlite3.Row) -> Dict[str, Any]:
+        record = json.loads(row['record'])
+        record['key'] = decode_key(row['job_key'])
+        record['owner'] = row['owner']
+        if record['status'] in ('queued', 'running', 'cancelling') and row['updated_at'] < time.time() - self.stale_seconds:
+            # The owning worker died without recording an outcome
+            record['status'] = 'lost'
+        return record
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask the worker owning a job to cancel it"""
+        with self._lock:
+            cursor = self._connect().execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def cancel_requests(self) -> List[str]:
+        """Ids of this worker's jobs that another worker asked to cancel"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id FROM jobs WHERE owner = ? AND cancel_requested = 1 AND status IN ('queued', 'running')",
+                (self.owner,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    # Socket.IO room state
+
+    def save_room_state(self, room: str, name: str, state: Dict[str, Any]):
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO room_state (room, name, state) VALUES (?, ?, ?)",
+                (room, name, json.dumps(state, default=str))
+            )
+
+    def room_states(self, room: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute("SELECT name, state FROM room_state WHERE room = ?", (room,)).fetchall()
+        return {row['name']: json.loads(row['state']) for row in rows}
+
+    def delete_room_states(self, room: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM room_state WHERE room = ?", (room,))
+
+    # Commit activity
+
+    def track_head(self, path: str, repo: str, head: Optional[str]):
+        """Start counting a working copy's commits from head, replacing whatever was tracked at path"""
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO commit_heads (path, repo, head) VALUES (?, ?, ?)", (path, repo, head)
+            )
+
+    def tracked_head(self, path: str) -> Optional[Dict[str, Any]]:
+        """The repository name and last seen HEAD of a working copy, or None if it is not tracked"""
+        with self._lock:
+            row = self._connect().execute("SELECT repo, head FROM commit_heads WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def advance_head(self, path: str, old: Optional[str], new: str,
+                     commits: List[Dict[str, Any]], keep: int) -> bool:
+        """
+        Move a working copy's last seen HEAD and record the commits in between
+
+        Nothing is recorded unless the HEAD is still old, so when workers
+        race on one working copy only one of them counts its commits.
+
+        Args:
+            path: Tracked working copy
+            old: HEAD the commits were listed from
+            new: HEAD they were listed up to
+            commits: The commits, oldest first, as CommitInfo dicts
+            keep: Recent commits kept per repository
+
+        Returns:
+            True if the HEAD moved and the commits were recorded
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "UPDATE commit_heads SET head = ? WHERE path = ? AND head IS ?", (new, path, old)
+                )
+                if cursor.rowcount:
+                    conn.executemany(
+                        "INSERT INTO recent_commits (repo, sha, author, timestamp, message) "
+                        "VALUES (:repo, :sha, :author, :timestamp, :message)",
+                        commits
+                    )
+                    for repo in {commit['repo'] for commit in commits}:
+                        conn.execute(
+                            "INSERT INTO commit_counts (repo, count) VALUES (?, ?) "
+                            "ON CONFLICT (repo) DO UPDATE SET count = count + excluded.count",
+                            (repo, sum(1 for commit in commits if commit['repo'] == repo))
+                        )
+                        conn.execute(
+                            "DELETE FROM recent_commits WHERE repo = ? AND seq <= "
+                            "(SELECT seq FROM recent_commits WHERE repo = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                            (repo, repo, keep)
+                        )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount > 0
+
+    def commit_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT repo, count FROM commit_counts").fetchall()
+        return {row['repo']: row['count'] for row in rows}
+
+    def recent_commits(self, repo: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recorded commits, newest first"""
+        query = "SELECT repo, sha, author, timestamp, message FROM recent_commits"
+        params: list = []
+        if repo is not None:
+            query += " WHERE repo = ?"
+            params.append(repo)
+        query += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
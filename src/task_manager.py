@@ -3,7 +3,11 @@ Task Manager - Handles goals and task orchestration
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 from pathlib import Path
 import yaml
@@ -11,6 +15,10 @@ import yaml
 from .repo_scanner import RepoScanner
 from .ai_interface import AIInterface
 from .file_writer import FileWriter
+from .file_ranker import FileRanker
+from .run_history import RunHistory
+from .git_committer import GitCommitter
+from .patch_bundle import apply_bundle
 
 
 @dataclass
@@ -37,9 +45,15 @@ class TaskManager:
         self.repo_scanner = RepoScanner()
         self.ai_interface = AIInterface(self.config)
         self.file_writer = FileWriter(self.config)
+        self.file_ranker = FileRanker(self.config, self.repo_scanner)
+        self.run_history = RunHistory(self.config)
+        self.git_committer = GitCommitter(self.config)
+        self.merge_retries = self.config.get('file_processing', {}).get('merge_retries', 1)
+        self.max_files_per_run = self.config.get('monitoring', {}).get('max_files_per_run')
         
         self.tasks: List[Task] = []
         self.completed_tasks: List[Task] = []
+        self.progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file"""
@@ -56,11 +70,19 @@ class TaskManager:
     
     def create_task(self, repo_name: str, goal: str, priority: int = 1) -> Task:
         """Create a new task for a repository"""
+        task = self.build_task(repo_name, goal, priority)
+        
+        self.tasks.append(task)
+        self.logger.info(f"Created task: {repo_name} - {goal}")
+        return task
+    
+    def build_task(self, repo_name: str, goal: str, priority: int = 1) -> Task:
+        """Build a task for a repository without queueing it"""
         repo_config = self._get_repo_config(repo_name)
         if not repo_config:
             raise ValueError(f"Repository '{repo_name}' not found in configuration")
         
-        task = Task(
+        return Task(
             repo_name=repo_name,
             repo_path=repo_config['path'],
             goal=goal,
@@ -68,10 +90,6 @@ class TaskManager:
             exclude_patterns=repo_config['exclude_patterns'],
             priority=priority
         )
-        
-        self.tasks.append(task)
-        self.logger.info(f"Created task: {repo_name} - {goal}")
-        return task
     
     def _get_repo_config(self, repo_name: str) -> Optional[Dict[str, Any]]:
         """Get repository configuration by name"""
@@ -93,16 +111,15 @@ class TaskManager:
         try:
             self.logger.info(f"Executing task: {task.repo_name} - {task.goal}")
             task.status = "running"
+            self._report_progress("task_started", task)
+            self.file_writer.begin_task(f"{task.repo_name}: {task.goal}", Path(task.repo_path))
             
-            # 1. Scan repository for files
-            files = self.repo_scanner.scan_repository(
-                task.repo_path,
-                task.file_extensions,
-                task.exclude_patterns
-            )
+            # 1. Select files, ranked when a per-run budget applies
+            files = self._select_files(task)
             
             if not files:
                 self.logger.warning(f"No files found in {task.repo_name}")
+                self.file_writer.commit_task()
                 task.status = "completed"
                 return True
             
@@ -115,6 +132,13 @@ class TaskManager:
                         processed_files += 1
                 except Exception as e:
                     self.logger.error(f"Error processing {file_path}: {e}")
+                self._report_progress("file_processed", task, file=str(file_path))
+            
+            # Apply the task's staged writes all together, or not at all
+            self._commit_task_changes(task)
+            
+            # Files edited concurrently with conflicting changes get another pass
+            self._retry_merge_conflicts(task)
             
             # 3. Update task status
             task.status = "completed"
@@ -122,13 +146,114 @@ class TaskManager:
             self.tasks.remove(task)
             
             self.logger.info(f"Task completed: {processed_files} files processed")
+            self._report_progress("task_finished", task, success=True)
             return True
             
         except Exception as e:
             self.logger.error(f"Error executing task: {e}")
+            self.file_writer.rollback_task()
             task.status = "failed"
+            self._report_progress("task_finished", task, success=False)
             return False
     
+    def _commit_task_changes(self, task: Task):
+        """Apply the task's staged writes and commit them to git if configured"""
+        if not self.file_writer.commit_task():
+            raise RuntimeError(f"Changes for {task.repo_name} could not be applied and were rolled back")
+        
+        if self.git_committer.enabled and self.file_writer.committed_paths:
+            self.git_committer.start_run(task.repo_path)
+            self.git_committer.commit_files(
+                task.repo_path,
+                self.file_writer.committed_paths,
+                f"AI-assisted update: {task.goal}"
+            )
+    
+    def apply_bundle(self, bundle: Path, root: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Apply a patch bundle written by a preview run, without calling any provider
+        
+        Args:
+            bundle: Bundle directory
+            root: Repository to apply to, defaulting to the one the bundle was written for
+        
+        Returns:
+            Summary from patch_bundle.apply_bundle()
+        """
+        file_processing = {**self.config.get('file_processing', {}), 'auto_apply_changes': True}
+        writer = FileWriter({**self.config, 'file_processing': file_processing})
+        try:
+            summary = apply_bundle(Path(bundle), writer, root)
+            if summary['applied'] and self.git_committer.enabled:
+                self.git_committer.commit_files(
+                    summary['root'], [Path(p) for p in summary['applied']], f"Apply patch bundle {Path(bundle).name}"
+                )
+            return summary
+        finally:
+            writer.close()
+    
+    def _retry_merge_conflicts(self, task: Task) -> int:
+        """
+        Re-run files whose edits conflicted with changes made while the AI worked
+        
+        Each retry re-reads the file, so the AI works from the latest content.
+        
+        Returns:
+            Number of files still conflicting after all retries
+        """
+        conflicts = self.file_writer.take_merge_conflicts()
+        for attempt in range(1, self.merge_retries + 1):
+            if not conflicts:
+                return 0
+            
+            self.logger.info(f"Retrying {len(conflicts)} conflicted files in {task.repo_name} (attempt {attempt})")
+            self.file_writer.begin_task(f"{task.repo_name}: {task.goal} (retry {attempt})", Path(task.repo_path))
+            for file_path in conflicts:
+                self._process_file(file_path, task.goal)
+            self._commit_task_changes(task)
+            conflicts = self.file_writer.take_merge_conflicts()
+        
+        for file_path in conflicts:
+            self.logger.warning(f"Giving up on {file_path}: it keeps changing while the AI works on it")
+        return len(conflicts)
+    
+    def _report_progress(self, event: str, task: Task, **data):
+        """Send a progress event to the registered callback, if any"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback({"event": event, "repo": task.repo_name, "goal": task.goal, **data})
+        except Exception as e:
+            self.logger.debug(f"Progress callback failed: {e}")
+    
+    def _select_files(self, task: Task) -> List[Path]:
+        """Select the files to process, keeping to max_files_per_run if set"""
+        if not self.max_files_per_run:
+            return self.repo_scanner.scan_repository(
+                task.repo_path,
+                task.file_extensions,
+                task.exclude_patterns
+            )
+        
+        files = self.file_ranker.rank_files(
+            task.repo_path,
+            task.file_extensions,
+            task.exclude_patterns,
+            limit=self.max_files_per_run
+        )
+        if files is not None:
+            return files
+        
+        # Not a git repository - fall back to a full scan ranked by recency
+        self.logger.info(f"No git history for {task.repo_name}, selecting most recently modified files")
+        files = self.repo_scanner.scan_repository(
+            task.repo_path,
+            task.file_extensions,
+            task.exclude_patterns
+        )
+        files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+        return files[:self.max_files_per_run]
+    
     def _process_file(self, file_path: Path, goal: str) -> bool:
         """Process a single file with the given goal"""
         try:
@@ -137,35 +262,145 @@ class TaskManager:
             if not content:
                 return False
             
+            # Skip content the AI already left unchanged for this goal
+            if self.run_history.is_unchanged(goal, content):
+                self.logger.debug(f"Skipping {file_path}: unchanged since last run for this goal")
+                return True
+            
             # Get AI suggestions
+            started = time.monotonic()
             suggestions = self.ai_interface.get_suggestions(content, goal, str(file_path))
             if not suggestions:
                 return False
             
+            self.run_history.record_call(
+                self.ai_interface.default_provider,
+                time.monotonic() - started,
+                len(content),
+                len(suggestions)
+            )
+            if suggestions.strip() == content.strip():
+                self.run_history.record_unchanged(goal, content)
+                return True
+            
             # Apply changes
-            success = self.file_writer.apply_changes(file_path, suggestions)
+            success = self.file_writer.apply_changes(file_path, suggestions, original_content=content)
             return success
             
         except Exception as e:
             self.logger.error(f"Error processing file {file_path}: {e}")
             return False
     
-    def execute_all_tasks(self) -> Dict[str, int]:
-        """Execute all pending tasks"""
+    def execute_all_tasks(self, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, int]:
+        """
+        Execute all pending tasks
+        
+        Args:
+            progress_callback: Called with a progress event dict as tasks and files complete
+        
+        Returns:
+            Summary with completed, failed and total task counts
+        """
         results = {"completed": 0, "failed": 0, "total": 0}
         
         pending_tasks = self.get_pending_tasks()
         results["total"] = len(pending_tasks)
         
+        monitoring = self.config.get('monitoring', {})
+        repo_names = {task.repo_name for task in pending_tasks}
+        if monitoring.get('parallel_processing', False) and len(repo_names) > 1:
+            return self._execute_in_process_pool(pending_tasks, results, progress_callback)
+        
+        self.progress_callback = progress_callback
+        try:
+            for task in pending_tasks:
+                success = self.execute_task(task)
+                if success:
+                    results["completed"] += 1
+                else:
+                    results["failed"] += 1
+        finally:
+            self.progress_callback = None
+        
+        return results
+    
+    def _execute_in_process_pool(
+        self,
+        pending_tasks: List[Task],
+        results: Dict[str, int],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> Dict[str, int]:
+        """Execute tasks with one worker process per repository"""
+        monitoring = self.config.get('monitoring', {})
+        
+        tasks_by_repo: Dict[str, List[Task]] = {}
         for task in pending_tasks:
-            success = self.execute_task(task)
-            if success:
-                results["completed"] += 1
-            else:
-                results["failed"] += 1
+            tasks_by_repo.setdefault(task.repo_name, []).append(task)
+        
+        max_workers = monitoring.get('max_workers') or len(tasks_by_repo)
+        max_ai_requests = monitoring.get('max_concurrent_ai_requests', 4)
+        self.logger.info(
+            f"Executing {len(pending_tasks)} tasks across {len(tasks_by_repo)} repositories "
+            f"with {max_workers} workers and {max_ai_requests} concurrent AI requests"
+        )
+        
+        with multiprocessing.Manager() as manager:
+            progress_queue = manager.Queue()
+            ai_semaphore = manager.BoundedSemaphore(max_ai_requests)
+            
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(
+                        _run_repository_tasks,
+                        self.config_path,
+                        repo_tasks,
+                        progress_queue,
+                        ai_semaphore
+                    ): repo_tasks
+                    for repo_tasks in tasks_by_repo.values()
+                }
+                
+                remaining = set(futures)
+                while remaining:
+                    done, remaining = wait(remaining, timeout=0.2, return_when=FIRST_COMPLETED)
+                    self._drain_progress(progress_queue, progress_callback)
+                    
+                    for future in done:
+                        repo_tasks = futures[future]
+                        try:
+                            outcomes = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Worker for {repo_tasks[0].repo_name} failed: {e}")
+                            outcomes = [False] * len(repo_tasks)
+                        
+                        for task, success in zip(repo_tasks, outcomes):
+                            self.tasks.remove(task)
+                            if success:
+                                task.status = "completed"
+                                self.completed_tasks.append(task)
+                                results["completed"] += 1
+                            else:
+                                task.status = "failed"
+                                self.tasks.append(task)
+                                results["failed"] += 1
+            
+            self._drain_progress(progress_queue, progress_callback)
         
         return results
     
+    def _drain_progress(self, progress_queue, progress_callback: Optional[Callable[[Dict[str, Any]], None]]):
+        """Forward queued worker progress events to the callback"""
+        while True:
+            try:
+                event = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            if progress_callback:
+                try:
+                    progress_callback(event)
+                except Exception as e:
+                    self.logger.debug(f"Progress callback failed: {e}")
+    
     def get_task_status(self) -> Dict[str, Any]:
         """Get current task status"""
         return {
@@ -186,4 +421,21 @@ class TaskManager:
     
     def get_default_goals(self) -> List[str]:
         """Get default goals from configuration"""
-        return self.config.get('tasks', {}).get('default_goals', []) 
\ No newline at end of file
+        return self.config.get('tasks', {}).get('default_goals', []) 
+
+
+def _run_repository_tasks(config_path: str, tasks: List[Task], progress_queue, ai_semaphore) -> List[bool]:
+    """Process pool entry point - run one repository's tasks in this process"""
+    manager = TaskManager(config_path)
+    manager.ai_interface.concurrency_limiter = ai_semaphore
+    manager.progress_callback = progress_queue.put
+    
+    outcomes = []
+    try:
+        for task in tasks:
+            task.status = "pending"
+            manager.tasks.append(task)
+            outcomes.append(manager.execute_task(task))
+    finally:
+        manager.file_writer.close()
+    return outcomes
@@ -0,0 +1,330 @@
+"""
+Worktree Pool - Lightweight git worktrees for concurrent jobs on one repository
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from . import offload
+from .repo_mirror import MirrorCache, MirrorError, ProgressCallback, file_lock, run_git, strip_credentials
+
+
+class WorktreeError(Exception):
+    """Raised when a worktree cannot be created or handed out"""
+
+
+@dataclass
+class Worktree:
+    """A worktree leased to one job"""
+    path: Path
+    base: Path
+    branch: str
+    owner: str
+
+
+class WorktreePool:
+    """Hands out git worktrees that share one object store per repository.
+
+    Each repository gets a base repository next to its mirror, cloned with
+    ``--shared`` so it borrows the mirror's objects instead of copying
+    them (MirrorCache never garbage-collects a mirror, so they cannot
+    disappear from under it), and each job gets its own worktree of the
+    base on its own branch. A new job therefore costs a checkout rather
+    than a clone, and jobs on the same repository never touch each
+    other's files. Job branches live in the base repository, not in the
+    mirror, so mirror fetches (which track the remote's branches exactly)
+    never conflict with them.
+
+    Job branches are always created fresh: a requested branch name that
+    already exists gets the job id appended, so a later job never resets
+    an earlier job's commits. When a job ends, its branch is deleted if
+    every commit on it has reached the remote; branches with work that
+    exists nowhere else are kept.
+
+    Released worktrees are detached and kept, up to idle_per_repo per
+    repository; the next job checks one out at its start commit, which
+    only rewrites the files that differ. The rest are removed.
+
+    Worker processes share the pool: each base repository has a lock file
+    and a state file next to it, recording which worktrees are leased (by
+    which process, on which branch) and which are idle. Both are only read
+    and written under the lock. Worktrees leased by a process that has
+    exited are removed the next time the pool state is read.
+    """
+
+    def __init__(self, mirrors: MirrorCache, config: Dict[str, Any]):
+        """
+        Args:
+            mirrors: Mirror cache the base repositories borrow objects from
+            config: Settings; uses web.workspace_directory, web.idle_worktrees
+                and web.worktree_branch_prefix
+        """
+        self.logger = logging.getLogger(__name__)
+        web = config.get('web', {})
+        self.mirrors = mirrors
+        self.workspace_dir = Path(web.get('workspace_directory', 'repos'))
+        self.idle_per_repo = web.get('idle_worktrees', 2)
+        self.branch_prefix = web.get('worktree_branch_prefix', 'jobs/')
+        self._lock = threading.Lock()
+        self._bases: Set[Path] = set()
+        self._leases: Dict[Path, Worktree] = {}
+
+    def base_path(self, url: str) -> Path:
+        """Base repository of a URL, next to its mirror"""
+        mirror = self.mirrors.mirror_path(url)
+        return mirror.with_name(mirror.name[:-len('.git')] + '.work')
+
+    def _base_lock(self, base: Path):
+        """Lock on a base repository and its pool state, shared by every worker process"""
+        return file_lock(base.with_name(base.name + '.lock'))
+
+    @staticmethod
+    def _state_path(base: Path) -> Path:
+        return base.with_name(base.name + '.pool.json')
+
+    def _load_state(self, base: Path) -> Dict[str, Any]:
+        """
+        Read a base's leases and idle worktrees; caller holds its lock
+
+        Worktrees leased by processes that have exited are removed.
+        """
+        try:
+            state = json.loads(self._state_path(base).read_text())
+        except FileNotFoundError:
+            state = {}
+        state.setdefault('leases', {})
+        state.setdefault('idle', [])
+
+        for path, lease in list(state['leases'].items()):
+            if not self._process_alive(lease['pid']):
+                self.logger.warning(f"Removing worktree {path} of exited process {lease['pid']}")
+                del state['leases'][path]
+                try:
+                    self._remove(base, Path(path))
+                    self._prune_branch(base, lease['branch'])
+                except MirrorError as e:
+                    self.logger.warning(f"Could not remove worktree {path}: {e}")
+        return state
+
+    def _save_state(self, base: Path, state: Dict[str, Any]):
+        """Replace a base's pool state; caller holds its lock"""
+        path = self._state_path(base)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    def _prepare_base(self, auth_url: str, mirror: Path, base: Path):
+        """Create the base repository or bring its remote branches up to the mirror's; caller holds its lock"""
+        if (base / '.git').exists():
+            # A local fetch: the objects are already in the mirror, only refs move
+            run_git('fetch', '--prune', '--quiet', 'origin', cwd=base)
+            return
+        tmp_base = base.with_name(base.name + '.tmp')
+        offload.rmtree(tmp_base, ignore_errors=True)
+        run_git('clone', '--shared', '--no-checkout', '--quiet', str(mirror.resolve()), str(tmp_base))
+        try:
+            # Detach the base's own HEAD so every branch name is free for worktrees
+            run_git('update-ref', '--no-deref', 'HEAD', 'HEAD', cwd=tmp_base)
+        except MirrorError:
+            # Empty repository
+            pass
+        # Fetch from the mirror, push to the real remote
+        run_git('config', 'remote.origin.pushurl', strip_credentials(auth_url), cwd=tmp_base)
+        tmp_base.rename(base)
+        self.logger.info(f"Created base repository {base}")
+
+    @staticmethod
+    def _resolve(base: Path, ref: str) -> Optional[str]:
+        try:
+            return run_git('rev-parse', '--verify', '-q', f'{ref}^{{commit}}', cwd=base)
+        except MirrorError:
+            return None
+
+    def acquire(
+        self,
+        auth_url: str,
+        owner: str,
+        branch: Optional[str] = None,
+        new_branch: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Worktree:
+        """
+        Lease a worktree of the repository, on a branch of its own
+
+        Args:
+            auth_url: Repository URL, possibly with a token (used only to update the mirror)
+            owner: Job id; names the worktree's branch when new_branch is not given
+            branch: Branch to start from, the remote's default if None or missing
+            new_branch: Branch name for the job's commits; if a branch of that name
+                already exists, the job id is appended
+            progress: Called with (stage, percent) as git reports progress
+
+        Returns:
+            The leased worktree; hand it back with release()
+        """
+        mirror = self.mirrors.update(auth_url, progress)
+        base = self.base_path(auth_url)
+        job_branch = new_branch or f"{self.branch_prefix}{owner}"
+        if progress:
+            progress('Preparing worktree', None)
+
+        with self._base_lock(base):
+            with self._lock:
+                self._bases.add(base)
+            self._prepare_base(auth_url, mirror, base)
+            start = self._resolve(base, f'refs/remotes/origin/{branch}') if branch else None
+            if branch and start is None:
+                self.logger.warning(f"Branch {branch} not found in {strip_credentials(auth_url)}, using the default branch")
+            start = start or self._resolve(base, 'refs/remotes/origin/HEAD')
+            if start is None:
+                raise WorktreeError(f"{strip_credentials(auth_url)} has no commits to check out")
+
+            state = self._load_state(base)
+            if any(lease['branch'] == job_branch for lease in state['leases'].values()):
+                self._save_state(base, state)
+                raise WorktreeError(f"Branch {job_branch} is checked out by another job")
+            if self._resolve(base, f'refs/heads/{job_branch}') is not None:
+                unique_branch = f"{job_branch}-{owner}"
+                if self._resolve(base, f'refs/heads/{unique_branch}') is not None:
+                    self._save_state(base, state)
+                    raise WorktreeError(f"Branches {job_branch} and {unique_branch} already exist")
+                self.logger.warning(f"Branch {job_branch} already exists, using {unique_branch}")
+                job_branch = unique_branch
+            path = Path(state['idle'].pop()) if state['idle'] else None
+
+            try:
+                if path is not None:
+                    # Only files that differ from the start commit are rewritten
+                    run_git('checkout', '--force', '--quiet', '-b', job_branch, start, cwd=path)
+                    run_git('clean', '-ffdxq', cwd=path)
+                    self.logger.info(f"Reusing worktree {path} for {owner}")
+                else:
+                    path = self._add(base, job_branch, start)
+                    self.logger.info(f"Created worktree {path} for {owner}")
+            except MirrorError as e:
+                if path is not None:
+                    self._remove(base, path)
+                self._save_state(base, state)
+                raise WorktreeError(f"Could not prepare a worktree of {strip_credentials(auth_url)}: {e}") from e
+
+            state['leases'][str(path)] = {'branch': job_branch, 'owner': owner, 'pid': os.getpid()}
+            self._save_state(base, state)
+            worktree = Worktree(path=path, base=base, branch=job_branch, owner=owner)
+            with self._lock:
+                self._leases[path] = worktree
+
+        if progress:
+            progress('Ready', 100)
+        return worktree
+
+    def _add(self, base: Path, job_branch: str, start: str) -> Path:
+        """Create a new worktree of base; caller holds the base lock"""
+        self.workspace_dir.mkdir(parents=True, exist_ok=True)
+        name = base.name[:-len('.work')].rsplit('-', 1)[0]
+        path = (self.workspace_dir / f"{name}-{uuid.uuid4().hex[:8]}").resolve()
+        sparse = self.mirrors.sparse_extensions
+        run_git('worktree', 'add', '--quiet', *(['--no-checkout'] if sparse else []),
+                '-b', job_branch, str(path), start, cwd=base)
+        if sparse:
+            patterns = [f'*{ext}' for ext in sparse] + self.mirrors.always_checkout
+            run_git('sparse-checkout', 'set', '--no-cone', *patterns, cwd=path)
+            run_git('checkout', '--quiet', cwd=path)
+        return path
+
+    def _remove(self, base: Path, path: Path):
+        try:
+            run_git('worktree', 'remove', '--force', str(path), cwd=base)
+        except MirrorError as e:
+            self.logger.warning(f"Removing worktree {path} by hand: {e}")
+            offload.rmtree(path, ignore_errors=True)
+            run_git('worktree', 'prune', cwd=base)
+
+    def _prune_branch(self, base: Path, branch: str) -> bool:
+        """
+        Delete a job's branch if all of its commits are on the remote; caller holds the base lock
+
+        Returns:
+            True if the branch was deleted
+        """
+        try:
+            unpushed = run_git('rev-list', '--count', f'refs/heads/{branch}', '--not', '--remotes', cwd=base)
+        except MirrorError:
+            # Already gone
+            return False
+        if unpushed != '0':
+            self.logger.info(f"Keeping branch {branch} with {unpushed} commits not on the remote")
+            return False
+        run_git('branch', '-D', '--quiet', branch, cwd=base)
+        return True
+
+    def release(self, worktree: Worktree):
+        """
+        Hand a worktree back when its job finishes
+
+        The worktree is detached from the job's branch and kept for reuse or
+        removed. The branch is deleted unless it has commits the remote does
+        not.
+        """
+        with self._lock:
+            if self._leases.pop(worktree.path, None) is None:
+                return
+
+        with self._base_lock(worktree.base):
+            state = self._load_state(worktree.base)
+            state['leases'].pop(str(worktree.path), None)
+            keep = len(state['idle']) < self.idle_per_repo
+            try:
+                if keep:
+                    run_git('checkout', '--detach', '--quiet', cwd=worktree.path)
+                    state['idle'].append(str(worktree.path))
+                else:
+                    self._remove(worktree.base, worktree.path)
+            except MirrorError as e:
+                self.logger.error(f"Could not recycle worktree {worktree.path}, removing it: {e}")
+                if keep:
+                    state['idle'].remove(str(worktree.path))
+                    self._remove(worktree.base, worktree.path)
+            finally:
+                self._save_state(worktree.base, state)
+            try:
+                self._prune_branch(worktree.base, worktree.branch)
+            except MirrorError as e:
+                self.logger.warning(f"Could not delete branch {worktree.branch}: {e}")
+
+    def leased(self) -> List[Worktree]:
+        """Worktrees leased by this process"""
+        with self._lock:
+            return list(self._leases.values())
+
+    def close(self):
+        """Remove the idle worktrees of the bases this process used, e.g. when it exits"""
+        with self._lock:
+            bases = list(self._bases)
+        for base in bases:
+            with self._base_lock(base):
+                state = self._load_state(base)
+                idle, state['idle'] = state['idle'], []
+                for path in idle:
+                    try:
+                        self._remove(base, Path(path))
+                    except MirrorError as e:
+                        self.logger.warning(f"Could not remove worktree {path}: {e}")
+                self._save_state(base, state)
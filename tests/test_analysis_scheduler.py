@@ -0,0 +1,150 @@
+"""
+Tests for the analysis scheduler module
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.analysis_scheduler import AnalysisScheduler
+
+
+class FakeTime:
+    """A clock whose wait() advances time and runs scheduled actions"""
+
+    def __init__(self, actions=None, stop_at=1000.0):
+        self.now = 0.0
+        self.actions = sorted(actions or [], key=lambda action: action[0])
+        self.stop_at = stop_at
+
+    def clock(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.now += seconds
+        while self.actions and self.actions[0][0] <= self.now:
+            self.actions.pop(0)[1]()
+        return self.now >= self.stop_at
+
+
+class TestAnalysisScheduler:
+    """Test cases for AnalysisScheduler"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_path = Path(self.temp_dir) / 'project_config.json'
+        self.write_config('reduce bounce rate')
+        self.metrics = {'page_views': 1000, 'sessions': 400, 'bounce_rate': 0.4, 'conversions': 10}
+        self.fetches = 0
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_config(self, prompt, mtime=None):
+        self.config_path.write_text(json.dumps({'prompt': prompt}))
+        if mtime is not None:
+            os.utime(self.config_path, (mtime, mtime))
+
+    def fetch(self):
+        self.fetches += 1
+        return dict(self.metrics)
+
+    def make_scheduler(self, fake_time):
+        return AnalysisScheduler(
+            str(self.config_path),
+            config_poll_seconds=5,
+            metrics_poll_seconds=30,
+            settle_seconds=5,
+            min_interval_seconds=60,
+            clock=fake_time.clock
+        )
+
+    def test_first_call_runs_immediately(self):
+        """Test that the initial analysis needs no trigger"""
+        fake_time = FakeTime()
+        scheduler = self.make_scheduler(fake_time)
+
+        assert scheduler.next_run(fake_time.wait, self.fetch) == ['initial analysis']
+        assert fake_time.now == 0
+        assert scheduler.config == {'prompt': 'reduce bounce rate'}
+        assert scheduler.metrics == self.metrics
+
+    def test_no_run_without_changes(self):
+        """Test that unchanged metrics and config never trigger"""
+        fake_time = FakeTime(stop_at=600)
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert scheduler.next_run(fake_time.wait, self.fetch) is None
+        assert scheduler.runs == 1
+        # Metrics were still polled every metrics_poll_seconds
+        assert self.fetches == 600 // 30
+
+    def test_metric_threshold_triggers(self):
+        """Test that a metric moving past its threshold triggers a run after the settle delay"""
+        def traffic_spike():
+            self.metrics['page_views'] = 1200
+
+        fake_time = FakeTime(actions=[(100, traffic_spike)])
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        reasons = scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert reasons == ['page_views changed 20% (1000 -> 1200)']
+        assert fake_time.now == 120 + 5
+        assert scheduler.metrics['page_views'] == 1200
+
+    def test_small_moves_do_not_trigger(self):
+        """Test that changes under the thresholds are ignored"""
+        def small_change():
+            self.metrics['page_views'] = 1050
+            self.metrics['bounce_rate'] = 0.41
+
+        fake_time = FakeTime(actions=[(100, small_change)], stop_at=300)
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert scheduler.next_run(fake_time.wait, self.fetch) is None
+
+    def test_burst_is_coalesced_into_one_run(self):
+        """Test that config saves and a metric change close together make one run"""
+        def save(prompt, mtime):
+            return lambda: self.write_config(prompt, mtime)
+
+        def conversions_drop():
+            self.metrics['conversions'] = 5
+
+        fake_time = FakeTime(actions=[
+            (58, conversions_drop),
+            (61, save('increase conversions', 1)),
+            (62, save('increase conversions!', 2))
+        ])
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        reasons = scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert fake_time.now == 65
+        assert reasons == ['conversions changed 50% (10 -> 5)', 'project configuration changed']
+        assert scheduler.config == {'prompt': 'increase conversions!'}
+        assert scheduler.runs == 2
+
+    def test_min_interval_between_runs(self):
+        """Test that a trigger right after a run waits for min_interval_seconds"""
+        fake_time = FakeTime(actions=[(1, lambda: self.write_config('speed', 1))])
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert scheduler.next_run(fake_time.wait, self.fetch) == ['project configuration changed']
+        assert fake_time.now == 60
+
+    def test_reverted_config_does_not_trigger(self):
+        """Test that touching the file without changing its content is ignored"""
+        fake_time = FakeTime(actions=[(10, lambda: self.write_config('reduce bounce rate', 5))], stop_at=200)
+        scheduler = self.make_scheduler(fake_time)
+        scheduler.next_run(fake_time.wait, self.fetch)
+
+        assert scheduler.next_run(fake_time.wait, self.fetch) is None
@@ -0,0 +1,137 @@
+"""
+Tests for the analytics analysis module
+"""
+
+import time
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.analytics_analysis import AnalysisResult, AnalyticsAnalyzer, PageMetrics, choose_focus, rolling_baseline
+
+START = date(2024, 3, 1)
+
+
+def make_rows(pages, days, views=100.0, sessions=50.0, bounce=0.4, conversions=1.0):
+    return [
+        (page, (START + timedelta(days=d)).isoformat(), views, sessions, bounce, conversions)
+        for page in pages for d in range(days)
+    ]
+
+
+class TestPageMetrics:
+    """Test cases for PageMetrics"""
+
+    def test_rows_become_page_by_day_matrices(self):
+        """Test that rows land in the right cells and missing days are zero"""
+        rows = [
+            ('B', '2024-03-02', 5, 4, 0.5, 1),
+            ('A', '2024-03-01', 3, 2, 1.0, 0),
+            ('A', '2024-03-03', 7, 6, 0.0, 2)
+        ]
+        metrics = PageMetrics.from_rows(rows, start=START, days=3)
+
+        rows_by_page = {page: i for i, page in enumerate(metrics.pages)}
+        assert sorted(rows_by_page) == ['A', 'B']
+        assert metrics.views[rows_by_page['A']].tolist() == [3, 0, 7]
+        assert metrics.views[rows_by_page['B']].tolist() == [0, 5, 0]
+        assert metrics.bounces[rows_by_page['B']].tolist() == [0, 2, 0]
+        assert str(metrics.dates[-1]) == '2024-03-03'
+
+    def test_rows_outside_the_range_are_dropped(self):
+        """Test that rows before start or past the last day are ignored"""
+        rows = [('A', '2024-02-28', 9, 1, 0, 0), ('A', '2024-03-01', 1, 1, 0, 0)]
+        metrics = PageMetrics.from_rows(rows, start=START, days=2)
+
+        assert metrics.views.tolist() == [[1, 0]]
+
+
+class TestAnalyticsAnalyzer:
+    """Test cases for AnalyticsAnalyzer"""
+
+    def test_rolling_baseline_matches_a_loop(self):
+        """Test the cumulative-sum baseline against a direct computation"""
+        values = np.random.default_rng(1).integers(0, 100, size=(4, 20)).astype(float)
+        mean, std = rolling_baseline(values, 5)
+
+        for d in range(5, 20):
+            window = values[:, d - 5:d]
+            assert np.allclose(mean[:, d - 5], window.mean(axis=1))
+            assert np.allclose(std[:, d - 5], window.std(axis=1))
+
+    def test_deltas_and_anomalies(self):
+        """Test period deltas and a traffic drop on one page"""
+        rows = make_rows(['Home', 'Pricing'], 14)
+        # Pricing bounces more and converts less in the last week, and collapses on the last day
+        rows = [
+            (page, day, 5.0 if page == 'Pricing' and day == '2024-03-14' else views,
+             sessions, 0.7 if page == 'Pricing' and day >= '2024-03-08' else bounce,
+             0.0 if page == 'Pricing' and day >= '2024-03-08' else conversions)
+            for page, day, views, sessions, bounce, conversions in rows
+        ]
+        metrics = PageMetrics.from_rows(rows, start=START, days=14)
+        result = AnalyticsAnalyzer(window=7, recent_days=7, z_threshold=3.0).analyze(metrics)
+
+        pricing = next(page for page in result.top_pages if page['page'] == 'Pricing')
+        assert pricing['bounce_delta'] == pytest.approx(0.3)
+        assert pricing['conversion_delta'] == pytest.approx(-0.02)
+        assert result.bounce_delta == pytest.approx(0.15)
+        # A constant baseline has no deviation, so the drop is not scored against it
+        assert result.anomalies == []
+
+        noisy = [(p, d, v + (i % 3), s, b, c) for i, (p, d, v, s, b, c) in enumerate(rows)]
+        result = AnalyticsAnalyzer(window=7, recent_days=7).analyze(PageMetrics.from_rows(noisy, start=START, days=14))
+        assert [a['page'] for a in result.anomalies] == ['Pricing']
+        assert result.anomalies[0]['date'] == '2024-03-14'
+        assert result.anomalies[0]['z_score'] < -3
+
+    def test_recent_days_must_be_positive(self):
+        """Test that an empty or negative recent period is rejected"""
+        for recent_days in (0, -7):
+            with pytest.raises(ValueError):
+                AnalyticsAnalyzer(recent_days=recent_days)
+
+    def test_empty_metrics(self):
+        """Test that a property without page data yields an empty result"""
+        result = AnalyticsAnalyzer().analyze(PageMetrics.from_rows([], start=START, days=30))
+
+        assert result.top_pages == []
+        assert result.anomalies == []
+
+    def test_large_property_is_fast(self):
+        """Test that analyze() handles 300k page-days in milliseconds once the matrices are built"""
+        rng = np.random.default_rng(0)
+        pages, days = 10000, 30
+        metrics = PageMetrics(
+            pages=np.array([f'/page/{i}' for i in range(pages)], dtype=object),
+            dates=np.datetime64('2024-03-01') + np.arange(days),
+            views=rng.poisson(50, size=(pages, days)).astype(float),
+            sessions=rng.poisson(30, size=(pages, days)).astype(float),
+            bounces=rng.poisson(12, size=(pages, days)).astype(float),
+            conversions=rng.poisson(1, size=(pages, days)).astype(float)
+        )
+        analyzer = AnalyticsAnalyzer()
+
+        started = time.perf_counter()
+        result = analyzer.analyze(metrics)
+        elapsed = time.perf_counter() - started
+
+        assert len(result.top_pages) == 5
+        assert len(result.anomalies) <= analyzer.max_anomalies
+        assert elapsed < 0.5
+
+
+class TestChooseFocus:
+    """Test cases for choose_focus"""
+
+    def test_prompt_decides_when_metrics_are_flat(self):
+        """Test that the prompt's goal is chosen without data"""
+        assert choose_focus(AnalysisResult(recent_days=7), 'Please reduce bounce rate') == 'bounce_rate'
+        assert choose_focus(AnalysisResult(recent_days=7), 'Make it nicer') is None
+
+    def test_metrics_outweigh_the_prompt(self):
+        """Test that a clearly worse metric wins over the prompt's goal"""
+        result = AnalysisResult(recent_days=7, conversion_delta=-0.02)
+        assert choose_focus(result, 'reduce bounce rate') == 'conversions'
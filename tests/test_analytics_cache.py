@@ -0,0 +1,65 @@
+"""
+Tests for the analytics cache module
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.analytics_cache import AnalyticsCache
+
+
+class TestAnalyticsCache:
+    """Test cases for AnalyticsCache"""
+
+    def test_values_are_cached_until_ttl(self):
+        """Test that a fresh entry is served without fetching again"""
+        cache = AnalyticsCache(ttl_seconds=0.05)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return len(calls)
+
+        assert cache.get('p1', fetch) == 1
+        assert cache.get('p1', fetch) == 1
+        assert cache.get('p2', fetch) == 2
+        time.sleep(0.06)
+        assert cache.get('p1', fetch) == 3
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Test that many simultaneous callers share one fetch"""
+        cache = AnalyticsCache(ttl_seconds=60)
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {'rows': 1}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('p', fetch))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert results == [{'rows': 1}] * 8
+
+    def test_failures_are_not_cached(self):
+        """Test that errors and None results are retried on the next call"""
+        cache = AnalyticsCache(ttl_seconds=60)
+
+        def broken():
+            raise ValueError("quota")
+
+        with pytest.raises(ValueError):
+            cache.get('p', broken)
+        assert cache.get('p', lambda: None) is None
+        assert cache.get('p', lambda: 'ok') == 'ok'
+        assert cache.get('p', lambda: 'stale') == 'ok'
@@ -0,0 +1,168 @@
+"""
+Tests for the analytics store module
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+from src.analytics_store import METRICS, AnalyticsStore, resolve_date
+
+TODAY = date(2024, 3, 31)
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeAnalytics:
+    """Serves batchRunReports from per-day page views; sessions equal views"""
+
+    def __init__(self, views):
+        self.views = views  # {date: {page: views}}
+        self.ranges = []
+        self.fail = False
+
+    def properties(self):
+        return self
+
+    def execute(self, make_request):
+        return make_request(self).execute()
+
+    def batchRunReports(self, property, body):
+        if self.fail:
+            raise RuntimeError('quota exceeded')
+        reports = []
+        for request in body['requests']:
+            date_range = request['dateRanges'][0]
+            self.ranges.append((date_range['startDate'], date_range['endDate']))
+            start, end = date.fromisoformat(date_range['startDate']), date.fromisoformat(date_range['endDate'])
+            dimensions = [d['name'] for d in request['dimensions']]
+            rows = []
+            for day, pages in sorted(self.views.items()):
+                if not start <= day <= end:
+                    continue
+                entries = pages.items() if 'pagePath' in dimensions else [(None, sum(pages.values()))]
+                for page, views in entries:
+                    values = {'activeUsers': views, 'sessions': views, 'bounceRate': 0.5,
+                              'averageSessionDuration': 60, 'screenPageViews': views,
+                              'newUsers': 1, 'conversions': 0}
+                    dims = [day.strftime('%Y%m%d')] + ([page] if page else [])
+                    rows.append({
+                        'dimensionValues': [{'value': v} for v in dims],
+                        'metricValues': [{'value': str(values[m['name']])} for m in request['metrics']]
+                    })
+            offset, limit = request['offset'], request['limit']
+            reports.append({
+                'dimensionHeaders': [{'name': d} for d in dimensions],
+                'metricHeaders': [{'name': m['name']} for m in request['metrics']],
+                'rows': rows[offset:offset + limit],
+                'rowCount': len(rows)
+            })
+        return FakeRequest({'reports': reports})
+
+
+class TestAnalyticsStore:
+    """Test cases for AnalyticsStore"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = AnalyticsStore(str(Path(self.temp_dir) / 'analytics.sqlite'), history_days=30, late_days=3)
+        self.api = FakeAnalytics({
+            TODAY - timedelta(days=i): {'/': 10, '/pricing': i} for i in range(40)
+        })
+
+    def teardown_method(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_first_sync_fetches_history(self):
+        """Test that the first sync covers history_days"""
+        result = self.store.sync(self.api, '123', today=TODAY)
+
+        assert result['start'] == (TODAY - timedelta(days=29)).isoformat()
+        assert result['rows'] == 30 * 3
+        assert self.store.last_synced('123') == TODAY
+
+    def test_later_syncs_fetch_only_the_late_window(self):
+        """Test that a resync fetches from the last sync minus late_days"""
+        self.store.sync(self.api, '123', today=TODAY - timedelta(days=1))
+        self.api.ranges.clear()
+        self.api.views[TODAY - timedelta(days=2)]['/'] = 99
+
+        result = self.store.sync(self.api, '123', today=TODAY)
+
+        assert result['start'] == (TODAY - timedelta(days=4)).isoformat()
+        assert set(self.api.ranges) == {((TODAY - timedelta(days=4)).isoformat(), TODAY.isoformat())}
+        # Revised late data replaces what was stored
+        pages = {p['page']: p['views'] for p in self.store.summary('123', days=30, today=TODAY)['top_pages']}
+        assert pages['/'] == 10 * 29 + 99
+
+    def test_failed_sync_keeps_previous_data(self):
+        """Test that an API error leaves the store readable and unchanged"""
+        self.store.sync(self.api, '123', today=TODAY)
+        before = self.store.summary('123', days=30, today=TODAY)
+        self.api.fail = True
+
+        with pytest.raises(RuntimeError):
+            self.store.sync(self.api, '123', today=TODAY)
+
+        assert self.store.summary('123', days=30, today=TODAY) == before
+        assert self.store.last_synced('123') == TODAY
+
+    def test_summary_and_daily_reads(self):
+        """Test the summary totals and daily series read from the store"""
+        today = date.today()
+        api = FakeAnalytics({today - timedelta(days=i): {'/': 10, '/pricing': i} for i in range(40)})
+        self.store.sync(api, '123')
+
+        daily = self.store.daily('123', since='6daysAgo')
+        summary = self.store.summary('123', days=30, top_pages=1)
+
+        assert len(daily) == 7
+        assert set(METRICS) <= set(daily[0])
+        assert summary['top_pages'] == [{'page': '/pricing', 'views': sum(range(30))}]
+        assert summary['sessions'] == 10 * 30 + sum(range(30))
+        assert summary['bounce_rate'] == pytest.approx(0.5)
+        assert not self.store.has_data('456')
+
+    def test_page_rows_are_kept_apart_from_site_rows(self):
+        """Test that pages are keyed by path and no path collides with the site-wide rows"""
+        api = FakeAnalytics({TODAY: {'/': 10, '/a': 4, 'site': 1}})
+        self.store.sync(api, '123', today=TODAY)
+
+        assert [row['screenPageViews'] for row in self.store.daily('123', since='2024-03-31')] == [15]
+        pages = self.store.summary('123', days=1, today=TODAY)['top_pages']
+        assert pages == [{'page': '/', 'views': 10}, {'page': '/a', 'views': 4}, {'page': 'site', 'views': 1}]
+        assert sorted(row[0] for row in self.store.page_rows('123', days=1, today=TODAY)) == ['/', '/a', 'site']
+
+    def test_stores_keyed_by_title_are_resynced(self):
+        """Test that a store from before pages were keyed by path is replaced"""
+        conn = sqlite3.connect(str(self.store.path))
+        conn.executescript("""
+            CREATE TABLE daily_metrics (property_id TEXT, date TEXT, dimension TEXT, PRIMARY KEY (property_id, date, dimension));
+            INSERT INTO daily_metrics VALUES ('123', '2024-03-31', 'Home');
+            CREATE TABLE sync_state (property_id TEXT PRIMARY KEY, last_date TEXT NOT NULL, synced_at REAL NOT NULL);
+            INSERT INTO sync_state VALUES ('123', '2024-03-31', 0);
+        """)
+        conn.close()
+
+        assert not self.store.has_data('123')
+        assert self.store.last_synced('123') is None
+        self.store.sync(self.api, '123', today=TODAY)
+        assert self.store.has_data('123')
+
+    def test_resolve_date(self):
+        """Test GA date expressions"""
+        assert resolve_date('today', TODAY) == TODAY
+        assert resolve_date('yesterday', TODAY) == TODAY - timedelta(days=1)
+        assert resolve_date('7daysAgo', TODAY) == TODAY - timedelta(days=7)
+        assert resolve_date('2024-01-02', TODAY) == date(2024, 1, 2)
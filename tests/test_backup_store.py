@@ -0,0 +1,84 @@
+"""
+Tests for the backup store module
+"""
+
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from src.backup_store import BackupStore, RetentionPolicy
+
+
+class TestBackupStore:
+    """Test cases for BackupStore shared by several processes"""
+
+    def setup_method(self):
+        """Setup two stores over one directory, as two worker processes would have"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.file = self.tmp_dir / "module.py"
+        self.first = BackupStore(self.tmp_dir / "backups", compression='gzip')
+        self.second = BackupStore(self.tmp_dir / "backups", compression='gzip')
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.first.close()
+        self.second.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_concurrent_puts_of_new_content(self):
+        """Test that a store adding an object another store is still writing waits for it"""
+        results, errors = [], []
+        write_object = self.first._write_object
+
+        def other_process_puts():
+            try:
+                results.append(self.second.put(self.file, b"same content\n"))
+            except Exception as e:
+                errors.append(e)
+
+        def slow_write(digest, content):
+            # The other store tries to add the same object while this one holds it
+            thread = threading.Thread(target=other_process_puts)
+            thread.start()
+            thread.join(0.2)
+            self.threads.append(thread)
+            return write_object(digest, content)
+
+        self.threads = []
+        self.first._write_object = slow_write
+        self.first.put(self.file, b"same content\n")
+        for thread in self.threads:
+            thread.join(5)
+
+        assert errors == []
+        assert len(results) == 1
+        backups = self.first.list(self.file)
+        assert len(backups) == 2
+        row = self.first._connect().execute("SELECT refcount FROM objects").fetchone()
+        assert row['refcount'] == 2
+
+    def test_put_after_other_store_deleted_last_reference(self):
+        """Test that content whose object was just removed elsewhere is stored again"""
+        old = self.first.put(self.file, b"content\n")
+        assert self.second.delete(old['id'])
+
+        new = self.first.put(self.file, b"content\n")
+        assert self.second.read(new['id']) == b"content\n"
+        assert self.second.stored_bytes() > 0
+
+    def test_pinned_content_survives_retention(self):
+        """Test that retention skips pinned content until its pins are released"""
+        first = self.first.put(self.file, b"first\n", pin=True)
+        self.first.put(self.file, b"second\n")
+        policy = RetentionPolicy(max_per_file=0)
+
+        self.second.mark_all_dirty()
+        assert self.second.enforce_retention(policy) == 1
+        assert [b['id'] for b in self.second.list()] == [first['id']]
+
+        # Pins of exited processes are dropped
+        assert self.second.release_stale_pins(lambda pid: False) == 1
+        self.second.mark_all_dirty()
+        assert self.second.enforce_retention(policy) == 1
+        assert self.second.list() == []
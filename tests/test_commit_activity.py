@@ -0,0 +1,144 @@
+"""
+Tests for the commit activity module
+"""
+
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from src.commit_activity import CommitActivity
+from src.shared_state import SharedState
+
+
+def git(cwd: Path, *args: str) -> str:
+    result = subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def commit(cwd: Path, message: str):
+    with open(cwd / 'app.js', 'a') as f:
+        f.write(f'// {message}\n')
+    git(cwd, 'commit', '-q', '-am', message)
+
+
+class TestCommitActivity:
+    """Test cases for CommitActivity"""
+
+    def setup_method(self):
+        """Setup a repository with existing history"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / 'site'
+        self.repo.mkdir()
+        git(self.repo, 'init', '-q', '-b', 'main')
+        (self.repo / 'app.js').write_text('console.log(1)\n')
+        git(self.repo, 'add', '.')
+        git(self.repo, 'commit', '-q', '-m', 'initial')
+        for i in range(15):
+            commit(self.repo, f'old {i}')
+        self.activity = CommitActivity(recent_size=3)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_counts_only_commits_since_tracking(self):
+        """Test that existing history is ignored and new commits are counted exactly"""
+        self.activity.track(str(self.repo), repo='site')
+        assert self.activity.update(str(self.repo)) == []
+
+        for i in range(12):
+            commit(self.repo, f'new {i}')
+        new = self.activity.update(str(self.repo))
+        assert [c.message for c in new] == [f'new {i}' for i in range(12)]
+
+        commit(self.repo, 'latest')
+        assert [c.message for c in self.activity.update(str(self.repo))] == ['latest']
+
+        summary = self.activity.summary()
+        assert summary['total'] == 13
+        assert summary['repos']['site']['commits'] == 13
+        assert summary['repos']['site']['last_commit']['message'] == 'latest'
+        # The ring buffer keeps the newest commits, newest first
+        assert [c['message'] for c in summary['recent']] == ['latest', 'new 11', 'new 10']
+        assert len(self.activity.summary(limit=1)['recent']) == 1
+
+    def test_untracked_repository_starts_from_current_head(self):
+        """Test that the first update only records a baseline"""
+        assert self.activity.update(str(self.repo)) == []
+        commit(self.repo, 'one')
+        assert [c.repo for c in self.activity.update(str(self.repo))] == ['site']
+
+    def test_rewritten_history_restarts_count(self):
+        """Test that a HEAD that is no longer in the repository resets the baseline"""
+        other = self.tmp_dir / 'other'
+        other.mkdir()
+        git(other, 'init', '-q', '-b', 'main')
+        (other / 'app.js').write_text('x\n')
+        git(other, 'add', '.')
+        git(other, 'commit', '-q', '-m', 'unrelated')
+
+        self.activity.track(str(other), repo='site')
+        shutil.rmtree(other)
+        shutil.copytree(self.repo, other)
+        assert self.activity.update(str(other)) == []
+
+        commit(other, 'after')
+        assert [c.message for c in self.activity.update(str(other))] == ['after']
+        assert self.activity.summary()['total'] == 1
+
+    def test_working_copies_of_one_repository_add_up(self):
+        """Test that counters are per repository, not per working copy"""
+        copy = self.tmp_dir / 'copy'
+        git(self.tmp_dir, 'clone', '-q', str(self.repo), str(copy))
+        self.activity.track(str(self.repo), repo='site')
+        self.activity.track(str(copy), repo='site')
+
+        commit(self.repo, 'a')
+        commit(copy, 'b')
+        self.activity.update(str(self.repo))
+        self.activity.update(str(copy))
+
+        assert self.activity.summary()['repos']['site']['commits'] == 2
+        assert [c['message'] for c in self.activity.summary(repo='site')['recent']] == ['b', 'a']
+
+    def test_summary_without_recent_commits(self):
+        """Test that a repository whose commits were all trimmed has no last commit"""
+        activity = CommitActivity(recent_size=0)
+        activity.track(str(self.repo), repo='site')
+        commit(self.repo, 'one')
+        activity.update(str(self.repo))
+
+        summary = activity.summary()
+        assert summary['repos']['site'] == {'commits': 1, 'last_commit': None}
+        assert summary['recent'] == []
+
+    def test_workers_sharing_state_count_each_commit_once(self):
+        """Test that activity tracked by one worker is counted once and seen by every worker"""
+        first_state = SharedState(str(self.tmp_dir / 'state.sqlite'))
+        second_state = SharedState(str(self.tmp_dir / 'state.sqlite'))
+        first = CommitActivity(recent_size=3, state=first_state)
+        second = CommitActivity(recent_size=3, state=second_state)
+        try:
+            first.track(str(self.repo), repo='site')
+            commit(self.repo, 'shared')
+
+            assert [c.message for c in second.update(str(self.repo))] == ['shared']
+            assert first.update(str(self.repo)) == []
+
+            # A worker that lost the race still counts commits made after the winner's update
+            tracked = first_state.tracked_head(str(self.repo.resolve()))
+            commit(self.repo, 'later')
+            assert not first_state.advance_head(str(self.repo.resolve()), 'stale', 'x', [], 3)
+            assert first_state.tracked_head(str(self.repo.resolve())) == tracked
+            assert [c.message for c in first.update(str(self.repo))] == ['later']
+
+            assert first.summary() == second.summary()
+            assert second.summary()['total'] == 2
+            assert [c['message'] for c in first.summary()['recent']] == ['later', 'shared']
+        finally:
+            first_state.close()
+            second_state.close()
@@ -0,0 +1,100 @@
+"""
+Tests for the credential store module
+"""
+
+import shutil
+import stat
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from google.oauth2.credentials import Credentials
+
+from src.credential_store import CredentialStore
+
+
+def make_credentials(token: str, refresh_token: str, expires_in: timedelta = timedelta(hours=1)) -> Credentials:
+    return Credentials(
+        token=token,
+        refresh_token=refresh_token,
+        client_id='client',
+        client_secret='secret',
+        token_uri='https://oauth2.example.com/token',
+        expiry=datetime.utcnow() + expires_in
+    )
+
+
+class TestCredentialStore:
+    """Test cases for CredentialStore"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.store = CredentialStore(str(self.tmp_dir / "credentials.sqlite"))
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_lookup_by_user_and_property(self):
+        """Test that jobs find the grant of the user who linked the property"""
+        self.store.save('alice', make_credentials('a-token', 'a-refresh'))
+        self.store.save('bob', make_credentials('b-token', 'b-refresh'))
+        self.store.link_property('alice', '123')
+        self.store.link_property('bob', '456')
+
+        assert self.store.load(property_id='123').token == 'a-token'
+        assert self.store.load(property_id='456').token == 'b-token'
+        assert self.store.load(user_id='bob').token == 'b-token'
+        assert self.store.load(property_id='789') is None
+        assert stat.S_IMODE(self.store.path.stat().st_mode) == 0o600
+
+    def test_sessions_and_jobs_share_one_client(self):
+        """Test that the same grant yields one client for every caller"""
+        self.store.save('alice', make_credentials('a-token', 'a-refresh'))
+        self.store.link_property('alice', '123')
+
+        client = self.store.client_for(property_id='123')
+        assert client is not None
+        assert self.store.client_for(user_id='alice') is client
+
+    def test_refreshed_token_is_saved_once(self):
+        """Test that a refresh near expiry is persisted for other workers"""
+        self.store.save('alice', make_credentials('old', 'a-refresh', expires_in=timedelta(minutes=1)))
+        self.store.link_property('alice', '123')
+        client = self.store.clients.get(self.store.load(user_id='alice'))
+        refreshes = []
+
+        def refresh(request):
+            refreshes.append(1)
+            client.credentials.token = 'new'
+            client.credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+        client.credentials.refresh = refresh
+        assert self.store.client_for(property_id='123') is client
+        assert self.store.client_for(property_id='123') is client
+        assert refreshes == [1]
+        assert self.store.load(user_id='alice').token == 'new'
+
+    def test_access_is_recorded_per_user(self):
+        """Test that only users whose grant read a property are allowed its stored data"""
+        self.store.save('alice', make_credentials('a-token', 'a-refresh'))
+        self.store.save('bob', make_credentials('b-token', 'b-refresh'))
+        self.store.link_property('alice', '123')
+        self.store.link_property('bob', '123')
+
+        self.store.record_access('alice', '123')
+        assert self.store.has_access('alice', '123')
+        assert not self.store.has_access('bob', '123')
+
+        self.store.record_access('alice', '123', allowed=False)
+        assert not self.store.has_access('alice', '123')
+
+        self.store.record_access('bob', '123')
+        self.store.delete('bob')
+        assert not self.store.has_access('bob', '123')
@@ -0,0 +1,42 @@
+"""
+Tests for the diff utilities module
+"""
+
+from pathlib import Path
+
+from src import diff_utils
+from src.diff_utils import LazyDiff, diff_stats
+
+
+class TestDiffUtils:
+    """Test cases for diff stats and lazy diffs"""
+
+    def test_diff_stats(self):
+        """Test counting added and removed lines"""
+        original = ["a\n", "b\n", "c\n", "d\n"]
+        new = ["a\n", "B\n", "c\n", "d\n", "e\n"]
+
+        stats = diff_stats(original, new)
+
+        assert (stats.added, stats.removed) == (2, 1)
+
+    def test_large_diff_stats_match_small(self, monkeypatch):
+        """Test that the multiset path agrees on a diff without moved lines"""
+        original = [f"line {i}\n" for i in range(100)]
+        new = original[:10] + ["new\n"] * 3 + original[20:]
+        expected = diff_stats(original, new)
+
+        monkeypatch.setattr(diff_utils, "LARGE_DIFF_LINES", 10)
+        stats = diff_stats(original, new)
+
+        assert (stats.added, stats.removed) == (expected.added, expected.removed) == (3, 10)
+
+    def test_lazy_diff_renders_on_demand(self):
+        """Test that the patch is only built when rendered"""
+        diff = LazyDiff(Path("module.py"), "x = 1\n", "x = 2\n")
+
+        assert diff._patch is None
+        assert str(diff.stats) == "+1 -1"
+        assert diff._patch is None
+        assert "+x = 2" in str(diff)
+        assert diff._patch is not None
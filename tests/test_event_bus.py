@@ -0,0 +1,121 @@
+"""
+Tests for the event bus module
+"""
+
+import threading
+import time
+
+from src.event_bus import EventBus, job_room, property_room
+
+
+class RecordingEmitter:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, event, data, to=None):
+        self.calls.append((event, data, to))
+
+
+class TestEventBus:
+    """Test cases for EventBus"""
+
+    def setup_method(self):
+        self.emitter = RecordingEmitter()
+        self.bus = EventBus(self.emitter)
+
+    def test_events_go_to_their_rooms(self):
+        """Test that events are scoped to rooms and broadcast only without one"""
+        self.bus.publish('activity_log', 'one', to=property_room('123'))
+        self.bus.publish('activity_log', 'two', to=[job_room('j1'), property_room('123')])
+        self.bus.publish('activity_log', 'three')
+        self.bus.flush()
+
+        assert self.emitter.calls == [
+            ('activity_log', 'one', 'property:123'),
+            ('activity_log', 'two', ['job:j1', 'property:123']),
+            ('activity_log', 'three', None)
+        ]
+
+    def test_bursts_are_coalesced(self):
+        """Test that only the latest coalesced payload per key is sent, in first-seen order"""
+        room = job_room('j1')
+        for percent in range(100):
+            self.bus.publish('clone_progress', {'stage': 'Receiving', 'percent': percent}, to=room, coalesce=True, key='Receiving')
+        self.bus.publish('activity_log', 'log line', to=room)
+        self.bus.publish('clone_progress', {'stage': 'Resolving', 'percent': 5}, to=room, coalesce=True, key='Resolving')
+        self.bus.publish('clone_progress', {'stage': 'Receiving', 'percent': 100}, to=room, coalesce=True, key='Receiving')
+
+        assert self.bus.flush() == 3
+        assert [data for _, data, _ in self.emitter.calls] == [
+            {'stage': 'Receiving', 'percent': 100},
+            'log line',
+            {'stage': 'Resolving', 'percent': 5}
+        ]
+        assert self.bus.published == 103
+
+    def test_log_events_are_not_coalesced(self):
+        """Test that uncoalesced events all arrive in order"""
+        for i in range(3):
+            self.bus.publish('activity_log', f'line {i}', to='r')
+        self.bus.flush()
+
+        assert [data for _, data, _ in self.emitter.calls] == ['line 0', 'line 1', 'line 2']
+
+    def test_state_is_sent_as_deltas(self):
+        """Test that state updates carry only changed keys, and nothing when unchanged"""
+        room = property_room('123')
+        self.bus.publish_state('analytics', {'users': 10, 'sessions': 20, 'top_pages': ['a']}, to=room)
+        self.bus.flush()
+        self.bus.publish_state('analytics', {'users': 11, 'sessions': 20, 'top_pages': ['a']}, to=room)
+        self.bus.publish_state('analytics', {'users': 12, 'sessions': 20}, to=room)
+        self.bus.flush()
+        self.bus.publish_state('analytics', {'users': 12, 'sessions': 20}, to=room)
+        self.bus.flush()
+
+        assert self.emitter.calls == [
+            ('analytics_delta', {'changed': {'users': 10, 'sessions': 20, 'top_pages': ['a']}, 'removed': []}, room),
+            ('analytics_delta', {'changed': {'users': 12}, 'removed': ['top_pages']}, room)
+        ]
+        assert self.bus.snapshot(room) == {'analytics': {'users': 12, 'sessions': 20}}
+        assert self.bus.snapshot(property_room('456')) == {}
+
+    def test_forget_drops_a_rooms_state_after_delivering_it(self):
+        """Test that a forgotten room's pending state is still sent, then no longer kept"""
+        done, other = job_room('done'), job_room('other')
+        self.bus.publish_state('progress', {'percent': 50}, to=done)
+        self.bus.publish_state('progress', {'percent': 10}, to=other)
+        self.bus.flush()
+        self.bus.publish_state('progress', {'percent': 100}, to=done)
+
+        self.bus.forget(done)
+        self.bus.flush()
+
+        assert self.emitter.calls[-1] == ('progress_delta', {'changed': {'percent': 100}, 'removed': []}, done)
+        assert self.bus.snapshot(done) == {}
+        assert self.bus.snapshot(other) == {'progress': {'percent': 10}}
+        self.bus.forget(other)
+        assert self.bus._sent_states == {}
+
+    def test_spawned_flush_batches_a_window(self):
+        """Test that publishing schedules one background flush per window"""
+        spawned = []
+
+        def spawn(fn):
+            thread = threading.Thread(target=fn)
+            spawned.append(thread)
+            thread.start()
+
+        bus = EventBus(self.emitter, window_seconds=0.05, spawn=spawn)
+        for i in range(50):
+            bus.publish('agent_activity', {'count': i}, coalesce=True)
+
+        for thread in spawned:
+            thread.join(1)
+        assert len(spawned) == 1
+        assert self.emitter.calls == [('agent_activity', {'count': 49}, None)]
+
+        bus.publish('agent_activity', {'count': 50}, coalesce=True)
+        deadline = time.time() + 1
+        while len(self.emitter.calls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(spawned) == 2
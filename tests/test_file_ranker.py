@@ -0,0 +1,102 @@
+"""
+Tests for the file ranker module
+"""
+
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+from src.file_ranker import FileRanker
+
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo: Path, *args: str):
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        check=True,
+        capture_output=True
+    )
+
+
+class TestFileRanker:
+    """Test cases for FileRanker"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / "repo"
+        self.repo.mkdir()
+        git(self.repo, "init", "-q")
+
+        (self.repo / "hot.py").write_text("x = 0\n")
+        (self.repo / "cold.py").write_text("y = 0\n")
+        (self.repo / "notes.txt").write_text("hello\n")
+        git(self.repo, "add", ".")
+        git(self.repo, "commit", "-q", "-m", "initial")
+
+        for i in range(5):
+            (self.repo / "hot.py").write_text("".join(f"x = {j}\n" for j in range(i + 2)))
+            git(self.repo, "commit", "-q", "-am", f"change {i}")
+
+        config = {'monitoring': {'ranking': {'cache_directory': str(self.tmp_dir / "cache")}}}
+        self.ranker = FileRanker(config)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rank_files_prefers_churn(self):
+        """Test that frequently changed files rank first"""
+        files = self.ranker.rank_files(str(self.repo), [".py"], [".git"])
+
+        assert [f.name for f in files] == ["hot.py", "cold.py"]
+
+    def test_rank_files_respects_limit(self):
+        """Test that only the top N files are returned"""
+        files = self.ranker.rank_files(str(self.repo), [".py"], [".git"], limit=1)
+
+        assert [f.name for f in files] == ["hot.py"]
+
+    def test_churn_cache_is_incremental(self):
+        """Test that new commits are added to the cached churn"""
+        self.ranker.rank_files(str(self.repo), [".py"], [".git"])
+
+        (self.repo / "cold.py").write_text("".join(f"y = {j}\n" for j in range(100)))
+        git(self.repo, "commit", "-q", "-am", "big change")
+        files = self.ranker.rank_files(str(self.repo), [".py"], [".git"])
+
+        assert files[0].name == "cold.py"
+        cache_files = list((self.tmp_dir / "cache").glob("churn_*.json"))
+        assert len(cache_files) == 1
+
+    def test_subdirectory_of_repository(self):
+        """Test that churn is matched when ranking a subdirectory of the repository"""
+        sub = self.repo / "pkg"
+        sub.mkdir()
+        (sub / "busy.py").write_text("a = 0\n")
+        (sub / "quiet.py").write_text("b = 0\n")
+        git(self.repo, "add", ".")
+        git(self.repo, "commit", "-q", "-m", "add pkg")
+        for i in range(5):
+            (sub / "busy.py").write_text("".join(f"a = {j}\n" for j in range(i + 2)))
+            git(self.repo, "commit", "-q", "-am", f"pkg change {i}")
+        # Only churn counts; without it the tie is broken by name and quiet.py comes first
+        ranker = FileRanker({'monitoring': {'ranking': {
+            'cache_directory': str(self.tmp_dir / "cache"),
+            'churn_weight': 1.0, 'recency_weight': 0.0, 'size_weight': 0.0
+        }}})
+
+        files = ranker.rank_files(str(sub), [".py"], [".git"])
+
+        assert files == [sub / "busy.py", sub / "quiet.py"]
+
+    def test_non_git_directory(self):
+        """Test that a plain directory is reported as unrankable"""
+        plain = self.tmp_dir / "plain"
+        plain.mkdir()
+
+        assert self.ranker.rank_files(str(plain), [".py"], []) is None
@@ -0,0 +1,302 @@
+"""
+Tests for the file writer module
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+from src.backup_store import BackupStore, RetentionPolicy
+from src.file_writer import FileWriter
+
+
+class TestFileWriter:
+    """Test cases for FileWriter"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / "repo"
+        self.repo.mkdir()
+        self.target = self.repo / "module.py"
+        self.target.write_text("x = 1\n")
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def make_writer(self, **file_processing) -> FileWriter:
+        file_processing.setdefault('backup_directory', str(self.tmp_dir / "backups"))
+        return FileWriter({'file_processing': file_processing})
+
+    def test_atomic_write_preserves_mode(self):
+        """Test that writes replace the file and keep its permissions"""
+        os.chmod(self.target, 0o750)
+        writer = self.make_writer(fsync='always')
+
+        assert writer.apply_changes(self.target, "x = 2\n")
+        assert self.target.read_text() == "x = 2\n"
+        assert stat.S_IMODE(self.target.stat().st_mode) == 0o750
+        assert [p.name for p in self.repo.iterdir()] == ["module.py"]
+
+    def test_batch_mode_defers_until_flush(self):
+        """Test that batched writes become visible on flush"""
+        writer = self.make_writer(fsync='batch', fsync_batch_size=10)
+
+        assert writer.apply_changes(self.target, "x = 2\n")
+        assert self.target.read_text() == "x = 1\n"
+
+        assert writer.flush()
+        assert self.target.read_text() == "x = 2\n"
+        assert [p.name for p in self.repo.iterdir()] == ["module.py"]
+
+    def test_close_applies_staged_writes(self):
+        """Test that closing a writer in batch mode applies writes that were never flushed"""
+        writer = self.make_writer(fsync='batch', fsync_batch_size=10)
+
+        assert writer.apply_changes(self.target, "x = 2\n")
+        writer.close()
+        assert self.target.read_text() == "x = 2\n"
+        assert [p.name for p in self.repo.iterdir()] == ["module.py"]
+
+    def test_batch_size_triggers_flush(self):
+        """Test that reaching the batch size flushes automatically"""
+        writer = self.make_writer(fsync='batch', fsync_batch_size=1)
+
+        assert writer.apply_changes(self.target, "x = 3\n")
+        assert self.target.read_text() == "x = 3\n"
+
+    def test_backups_are_deduplicated(self):
+        """Test that identical content is stored once but indexed per backup"""
+        writer = self.make_writer(fsync='none')
+        writer._create_backup(self.target)
+        writer._create_backup(self.target)
+
+        backups = writer.list_backups(self.target)
+        assert len(backups) == 2
+        assert backups[0]['digest'] == backups[1]['digest']
+        assert len(list((self.tmp_dir / "backups" / "objects").rglob("*"))) == 2  # one fan-out dir, one object
+
+    def test_backups_of_same_named_files_do_not_collide(self):
+        """Test that files sharing a name in different directories keep separate backups"""
+        other = self.repo / "pkg" / "module.py"
+        other.parent.mkdir()
+        other.write_text("y = 1\n")
+        writer = self.make_writer(fsync='none')
+
+        assert writer.apply_changes(self.target, "x = 2\n")
+        assert writer.apply_changes(other, "y = 2\n")
+
+        [target_backup] = writer.list_backups(self.target)
+        [other_backup] = writer.list_backups(other)
+        assert writer.restore_from_backup(self.target, target_backup['id'])
+        assert writer.restore_from_backup(other, other_backup['id'])
+        assert self.target.read_text() == "x = 1\n"
+        assert other.read_text() == "y = 1\n"
+
+    def test_cleanup_old_backups(self):
+        """Test that cleanup keeps the newest backups"""
+        writer = self.make_writer(fsync='none')
+        for i in range(5):
+            self.target.write_text(f"x = {i}\n")
+            writer._create_backup(self.target)
+
+        writer.cleanup_old_backups(max_backups=2)
+
+        backups = writer.list_backups()
+        assert len(backups) == 2
+        assert writer.backup_store.read(backups[0]['id']) == b"x = 4\n"
+
+    def test_cleanup_old_backups_is_per_file(self):
+        """Test that cleanup keeps the newest backups of every file"""
+        other = self.repo / "other.py"
+        other.write_text("y = 1\n")
+        writer = self.make_writer(fsync='none')
+        for i in range(3):
+            self.target.write_text(f"x = {i}\n")
+            writer._create_backup(self.target)
+        writer._create_backup(other)
+
+        writer.cleanup_old_backups(max_backups=1)
+
+        assert len(writer.list_backups(self.target)) == 1
+        assert len(writer.list_backups(other)) == 1
+
+    def test_retention_policy_limits(self):
+        """Test age, per-file and total-size retention in budgeted steps"""
+        writer = self.make_writer(fsync='none')
+        store = writer.backup_store
+        for i in range(6):
+            self.target.write_text(f"x = {i}\n" * 100)
+            writer._create_backup(self.target)
+        with store._lock:
+            conn = store._connect()
+            with conn:
+                conn.execute("UPDATE backups SET created_at = created_at - 40 * 86400 WHERE id = 1")
+
+        assert store.enforce_retention(RetentionPolicy(max_age_days=30)) == 1
+        assert store.enforce_retention(RetentionPolicy(max_per_file=3), budget=1) == 1
+        assert store.enforce_retention(RetentionPolicy(max_per_file=3)) == 1
+        assert len(store.list(self.target)) == 3
+
+        newest = store.latest(self.target)
+        store.enforce_retention(RetentionPolicy(max_total_bytes=store.get(newest['id'])['stored_size']))
+        assert [b['id'] for b in store.list()] == [newest['id']]
+
+    def test_retention_keeps_backups_needed_for_rollback(self):
+        """Test that backups referenced by staged writes or an open journal survive retention"""
+        writer = self.make_writer(fsync='batch', fsync_batch_size=10, transaction_batch_size=1)
+        # Another process applying the policy to the same backup directory
+        other = BackupStore(self.tmp_dir / "backups")
+        policy = RetentionPolicy(max_age_days=30)
+
+        def age_backups():
+            with other._lock:
+                conn = other._connect()
+                with conn:
+                    conn.execute("UPDATE backups SET created_at = created_at - 40 * 86400")
+
+        # Staged but not yet flushed
+        assert writer.apply_changes(self.target, "x = 2\n")
+        age_backups()
+        assert other.enforce_retention(policy) == 0
+        assert writer.flush()
+        assert other.enforce_retention(policy) == 1
+
+        # Applied but still journaled by an open task
+        writer.begin_task("demo")
+        assert writer.apply_changes(self.target, "x = 3\n")
+        age_backups()
+        assert other.enforce_retention(policy) == 0
+        writer.rollback_task()
+        assert self.target.read_text() == "x = 2\n"
+        assert other.enforce_retention(policy) == 1
+
+        writer.close()
+        other.close()
+
+    def test_background_retention_worker(self):
+        """Test that the retention worker prunes backups as they are written"""
+        writer = self.make_writer(fsync='none', backup_retention={'max_per_file': 1, 'interval_seconds': 0.05})
+        try:
+            for i in range(3):
+                self.target.write_text(f"x = {i}\n")
+                writer._create_backup(self.target)
+            deadline = time.time() + 5
+            while len(writer.list_backups(self.target)) > 1 and time.time() < deadline:
+                time.sleep(0.02)
+            assert len(writer.list_backups(self.target)) == 1
+        finally:
+            writer.close()
+
+    def test_task_commit_applies_all_files(self):
+        """Test that a task's writes are staged until commit"""
+        other = self.repo / "other.py"
+        other.write_text("y = 1\n")
+        writer = self.make_writer(fsync='none')
+
+        writer.begin_task("demo")
+        assert writer.apply_changes(self.target, "x = 2\n")
+        assert writer.apply_changes(other, "y = 2\n")
+        assert self.target.read_text() == "x = 1\n"
+
+        assert writer.commit_task()
+        assert self.target.read_text() == "x = 2\n"
+        assert other.read_text() == "y = 2\n"
+        assert list(writer.journal_dir.iterdir()) == []
+
+    def test_task_rollback_restores_applied_batches(self):
+        """Test that rollback undoes batches already applied within the task"""
+        writer = self.make_writer(fsync='none', transaction_batch_size=1)
+
+        writer.begin_task("demo")
+        assert writer.apply_changes(self.target, "x = 2\n")
+        assert self.target.read_text() == "x = 2\n"
+
+        writer.rollback_task()
+        assert self.target.read_text() == "x = 1\n"
+        assert list(writer.journal_dir.iterdir()) == []
+
+    def test_failed_batch_fails_the_task(self):
+        """Test that a task whose batch failed to apply reports failure on commit"""
+        writer = self.make_writer(fsync='batch', transaction_batch_size=1)
+        other = self.repo / "other.py"
+        other.write_text("y = 0\n")
+
+        writer.begin_task("demo")
+        assert writer.apply_changes(self.target, "x = 2\n")
+
+        def fail(paths):
+            raise OSError("disk full")
+        writer._sync_files = fail
+        assert not writer.apply_changes(other, "y = 1\n")
+        assert self.target.read_text() == "x = 1\n"
+
+        del writer._sync_files
+        assert not writer.apply_changes(other, "y = 2\n")
+        assert not writer.commit_task()
+        assert writer.committed_paths == []
+        assert self.target.read_text() == "x = 1\n"
+        assert other.read_text() == "y = 0\n"
+
+        # The next task starts clean
+        writer.begin_task("retry")
+        assert writer.apply_changes(self.target, "x = 3\n")
+        assert writer.commit_task()
+        assert writer.committed_paths == [self.target]
+        writer.close()
+
+    def test_recover_unfinished_journal(self):
+        """Test that a journal left by a crashed process is rolled back on startup"""
+        writer = self.make_writer(fsync='none', transaction_batch_size=1)
+        writer.begin_task("crashed")
+        assert writer.apply_changes(self.target, "x = 2\n")
+        writer.backup_store.close()
+
+        recovered = self.make_writer(fsync='none')
+        assert self.target.read_text() == "x = 1\n"
+        assert list(recovered.journal_dir.iterdir()) == []
+
+    def test_concurrent_edit_is_merged(self):
+        """Test that an edit made after reading is merged with the AI edit"""
+        base = "a = 1\nb = 2\nc = 3\nd = 4\ne = 5\n"
+        self.target.write_text(base)
+        writer = self.make_writer(fsync='none')
+
+        # A developer edits the last line while the AI rewrites the first
+        self.target.write_text(base.replace("e = 5", "e = 50"))
+        assert writer.apply_changes(self.target, base.replace("a = 1", "a = 10"), original_content=base)
+
+        assert self.target.read_text() == "a = 10\nb = 2\nc = 3\nd = 4\ne = 50\n"
+        assert writer.take_merge_conflicts() == []
+
+    def test_conflict_before_staging_pins_nothing(self):
+        """Test that an edit conflicting when applied leaves no backup pinned"""
+        writer = self.make_writer(fsync='batch')
+        writer.begin_task("demo")
+        self.target.write_text("x = 3\n")
+
+        assert not writer.apply_changes(self.target, "x = 2\n", original_content="x = 1\n")
+        assert writer.take_merge_conflicts() == [self.target]
+        assert writer._pins == {}
+        assert writer.commit_task()
+        assert self.target.read_text() == "x = 3\n"
+        writer.close()
+
+    def test_conflicting_edit_is_queued(self):
+        """Test that conflicting edits leave the developer's version and are queued"""
+        base = "x = 1\n"
+        writer = self.make_writer(fsync='batch')
+        writer.begin_task("demo")
+        assert writer.apply_changes(self.target, "x = 2\n", original_content=base)
+
+        # The developer changes the same line before the task commits
+        self.target.write_text("x = 3\n")
+        assert writer.commit_task()
+
+        assert self.target.read_text() == "x = 3\n"
+        assert writer.take_merge_conflicts() == [self.target]
+        assert writer.committed_paths == []
@@ -0,0 +1,56 @@
+"""
+Tests for the GA client module
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from google.oauth2.credentials import Credentials
+
+from src.ga_client import GAClientCache
+
+
+def make_credentials(token: str = 'access', expires_in: timedelta = timedelta(hours=1)) -> Credentials:
+    return Credentials(
+        token=token,
+        refresh_token='refresh',
+        client_id='client',
+        client_secret='secret',
+        token_uri='https://oauth2.example.com/token',
+        expiry=datetime.utcnow() + expires_in
+    )
+
+
+class TestGAClientCache:
+    """Test cases for GAClientCache"""
+
+    def test_one_client_per_grant(self):
+        """Test that sessions holding older access tokens share the same client"""
+        cache = GAClientCache()
+        client = cache.get(make_credentials('first'))
+        assert cache.get(make_credentials('second')) is client
+        assert client.credentials.token == 'first'
+
+        cache.discard(client.credentials)
+        assert cache.get(make_credentials('second')) is not client
+
+    def test_refresh_only_near_expiry(self):
+        """Test that tokens are refreshed within the margin and not before"""
+        cache = GAClientCache(refresh_margin=timedelta(minutes=5))
+        assert not cache.get(make_credentials()).needs_refresh()
+
+        cache = GAClientCache(refresh_margin=timedelta(minutes=5))
+        client = cache.get(make_credentials(expires_in=timedelta(minutes=2)))
+        assert client.needs_refresh()
+
+        refreshed = []
+        client.credentials.refresh = lambda request: setattr(
+            client.credentials, 'expiry', datetime.utcnow() + timedelta(hours=1)
+        )
+        client.on_refresh = refreshed.append
+        client.ensure_fresh()
+        client.ensure_fresh()
+        assert refreshed == [client.credentials]
@@ -0,0 +1,116 @@
+"""
+Tests for the GA reports module
+"""
+
+from src.ga_reports import ReportRequest, ReportStream
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeService:
+    """Answers batchRunReports from in-memory tables of (page, views) rows"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.batches = []
+
+    def properties(self):
+        return self
+
+    def batchRunReports(self, property, body):
+        self.batches.append(body['requests'])
+        reports = []
+        for request in body['requests']:
+            rows = self.tables[request['dimensions'][0]['name']]
+            offset, limit = request['offset'], request['limit']
+            page = {
+                'dimensionHeaders': [{'name': request['dimensions'][0]['name']}],
+                'metricHeaders': [{'name': 'views'}],
+                'rows': [
+                    {'dimensionValues': [{'value': key}], 'metricValues': [{'value': str(value)}]}
+                    for key, value in rows[offset:offset + limit]
+                ],
+                'rowCount': len(rows)
+            }
+            if 'metricAggregations' in request:
+                page['totals'] = [{'dimensionValues': [{'value': 'RESERVED_TOTAL'}],
+                                   'metricValues': [{'value': str(sum(v for _, v in rows))}]}]
+            reports.append(page)
+        return FakeRequest({'reports': reports})
+
+
+class FakeClient:
+    def __init__(self, service):
+        self.service = service
+
+    def execute(self, make_request):
+        return make_request(self.service).execute()
+
+
+def report(name, dimension, max_rows=None):
+    return ReportRequest(name, {'dimensions': [{'name': dimension}]}, max_rows=max_rows)
+
+
+class TestReportStream:
+    """Test cases for ReportStream"""
+
+    def setup_method(self):
+        self.service = FakeService({
+            'pageTitle': [(f'page {i}', i) for i in range(25)],
+            'date': [(f'2024010{i}', i) for i in range(1, 8)]
+        })
+        self.client = FakeClient(self.service)
+
+    def test_pages_through_every_row(self):
+        """Test that reports larger than one page are read in full"""
+        stream = ReportStream(self.client, '123', [report('pages', 'pageTitle')], page_size=10)
+        rows = [row for _, row in stream]
+
+        assert [row['pageTitle'] for row in rows] == [f'page {i}' for i in range(25)]
+        assert [[r['offset'] for r in batch] for batch in self.service.batches] == [[0], [10], [20]]
+        assert stream.totals['pages']['views'] == str(sum(range(25)))
+        assert stream.row_counts['pages'] == 25
+
+    def test_reports_share_batches(self):
+        """Test that several reports are fetched in the same calls"""
+        stream = ReportStream(
+            self.client, '123',
+            [report('pages', 'pageTitle'), report('daily', 'date')],
+            page_size=10
+        )
+        rows = list(stream)
+
+        assert len([r for name, r in rows if name == 'daily']) == 7
+        assert len([r for name, r in rows if name == 'pages']) == 25
+        # The short daily report finishes in the first call; later calls only page the long one
+        assert [len(batch) for batch in self.service.batches] == [2, 1, 1]
+        assert stream.requests_made == 3
+
+    def test_max_rows_stops_paging(self):
+        """Test that a capped report asks only for the rows it needs"""
+        stream = ReportStream(self.client, '123', [report('top', 'pageTitle', max_rows=5)], page_size=10)
+        rows = [row for _, row in stream]
+
+        assert len(rows) == 5
+        assert self.service.batches == [[{
+            'dimensions': [{'name': 'pageTitle'}],
+            'offset': 0,
+            'limit': 5,
+            'metricAggregations': ['TOTAL']
+        }]]
+        # Totals still cover every row, not just the ones read
+        assert stream.totals['top']['views'] == str(sum(range(25)))
+
+    def test_more_than_five_reports_are_split(self):
+        """Test that batches respect the API's five-report limit"""
+        reports = [report(f'r{i}', 'date') for i in range(7)]
+        rows = list(ReportStream(self.client, '123', reports))
+
+        assert len(rows) == 49
+        assert [len(batch) for batch in self.service.batches] == [5, 2]
@@ -0,0 +1,82 @@
+"""
+Tests for the git committer module
+"""
+
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+from src.git_committer import GitCommitter
+
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return result.stdout.strip()
+
+
+class TestGitCommitter:
+    """Test cases for GitCommitter"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / "repo"
+        self.repo.mkdir()
+        git(self.repo, "init", "-q")
+        for name in ("a.py", "b.py", "c.py"):
+            (self.repo / name).write_text("x = 1\n")
+        git(self.repo, "add", ".")
+        git(self.repo, "commit", "-q", "-m", "initial")
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_commits_only_given_files(self):
+        """Test that other modified or staged files stay out of the commit"""
+        for name in ("a.py", "b.py", "c.py"):
+            (self.repo / name).write_text("x = 2\n")
+        git(self.repo, "add", "c.py")
+        committer = GitCommitter({'file_processing': {'create_git_commits': True}})
+
+        commits = committer.commit_files(str(self.repo), [self.repo / "a.py"], "AI-assisted update")
+
+        assert len(commits) == 1
+        assert git(self.repo, "show", "--name-only", "--format=", "HEAD") == "a.py"
+        assert git(self.repo, "diff", "--cached", "--name-only") == "c.py"
+        assert git(self.repo, "diff", "--name-only") == "b.py"
+
+    def test_batches_and_run_branch(self):
+        """Test batched commits on a per-run branch"""
+        for name in ("a.py", "b.py", "c.py"):
+            (self.repo / name).write_text("x = 2\n")
+        committer = GitCommitter({'file_processing': {
+            'create_git_commits': True,
+            'commit_batch_size': 2,
+            'git_branch_per_run': True
+        }})
+
+        branch = committer.start_run(str(self.repo))
+        commits = committer.commit_files(str(self.repo), ["a.py", "b.py", "c.py"], "AI-assisted update")
+
+        assert len(commits) == 2
+        assert git(self.repo, "rev-parse", "--abbrev-ref", "HEAD") == branch
+        assert git(self.repo, "status", "--porcelain") == ""
+
+    def test_unchanged_files_create_no_commit(self):
+        """Test that committing unchanged files is a no-op"""
+        committer = GitCommitter({'file_processing': {'create_git_commits': True}})
+        head = git(self.repo, "rev-parse", "HEAD")
+
+        assert committer.commit_files(str(self.repo), ["a.py"], "AI-assisted update") == []
+        assert git(self.repo, "rev-parse", "HEAD") == head
@@ -0,0 +1,78 @@
+"""
+Tests for the job manager module
+"""
+
+import time
+
+import pytest
+
+from src.job_manager import JobManager
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestJobManager:
+    """Test cases for JobManager"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.manager = JobManager(max_concurrent=1)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.manager.shutdown(timeout=5)
+
+    @staticmethod
+    def loop_until_stopped(job):
+        while not job.stopped:
+            job.wait(1)
+
+    def test_job_runs_to_completion(self):
+        """Test that a job's outcome is recorded"""
+        job = self.manager.submit('demo', 'a', lambda job: None)
+        assert wait_for(lambda: job.status == 'succeeded')
+
+        failing = self.manager.submit('demo', 'b', lambda job: 1 / 0)
+        assert wait_for(lambda: failing.status == 'failed')
+        assert 'division' in failing.error
+
+    def test_duplicate_submission_reuses_active_job(self):
+        """Test that jobs are deduplicated by key while active"""
+        first = self.manager.submit('demo', ('repo', 'prop'), self.loop_until_stopped)
+        second = self.manager.submit('demo', ('repo', 'prop'), self.loop_until_stopped)
+        assert first is second
+
+        self.manager.cancel(first.id)
+        assert wait_for(lambda: first.status == 'cancelled')
+        third = self.manager.submit('demo', ('repo', 'prop'), lambda job: None)
+        assert third is not first
+
+    def test_concurrency_limit_and_queue_cancellation(self):
+        """Test that jobs beyond the limit queue and can be cancelled before starting"""
+        running = self.manager.submit('demo', 'a', self.loop_until_stopped)
+        queued = self.manager.submit('demo', 'b', self.loop_until_stopped)
+        waiting = self.manager.submit('demo', 'c', lambda job: None)
+        assert wait_for(lambda: running.status == 'running')
+        assert queued.status == 'queued'
+
+        self.manager.cancel(queued.id)
+        assert queued.status == 'cancelled'
+
+        self.manager.cancel(running.id)
+        assert wait_for(lambda: waiting.status == 'succeeded')
+        assert running.status == 'cancelled'
+
+    def test_shutdown_drains_running_jobs(self):
+        """Test that shutdown stops running jobs and refuses new ones"""
+        job = self.manager.submit('demo', 'a', self.loop_until_stopped)
+        assert wait_for(lambda: job.status == 'running')
+
+        self.manager.shutdown(timeout=5)
+        assert job.status == 'cancelled'
+        with pytest.raises(RuntimeError):
+            self.manager.submit('demo', 'b', lambda job: None)
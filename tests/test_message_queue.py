@@ -0,0 +1,57 @@
+"""
+Tests for the message queue module
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('socketio')
+
+from src.message_queue import SQLiteQueueManager, socketio_options  # noqa: E402
+
+
+class TestSQLiteQueueManager:
+    """Test cases for SQLiteQueueManager"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = str(Path(self.test_dir) / 'queue.sqlite')
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.test_dir)
+
+    def test_messages_reach_other_workers(self):
+        """Test that a listener receives what another manager publishes after it started"""
+        publisher = SQLiteQueueManager(self.path)
+        publisher._publish({'method': 'emit', 'event': 'before'})
+        listener = SQLiteQueueManager(self.path, poll_seconds=0.01)
+
+        messages = listener._listen()
+        publisher._publish({'method': 'emit', 'event': 'first'})
+        publisher._publish({'method': 'emit', 'event': 'second'})
+
+        assert [listener.json.loads(next(messages))['event'] for _ in range(2)] == ['first', 'second']
+
+    def test_channels_are_separate(self):
+        """Test that a listener ignores other channels"""
+        other = SQLiteQueueManager(self.path, channel='other')
+        listener = SQLiteQueueManager(self.path, poll_seconds=0.01)
+        messages = listener._listen()
+
+        other._publish({'event': 'ignored'})
+        listener._publish({'event': 'mine'})
+        assert listener.json.loads(next(messages)) == {'event': 'mine'}
+
+    def test_socketio_options(self):
+        """Test that message queue URLs select the right client manager"""
+        assert socketio_options('') == {}
+        assert socketio_options('redis://localhost:6379/0') == {'message_queue': 'redis://localhost:6379/0'}
+
+        manager = socketio_options(f'sqlite:///{self.path}')['client_manager']
+        assert isinstance(manager, SQLiteQueueManager)
+        assert str(manager.path) == self.path
@@ -0,0 +1,122 @@
+"""
+Tests for the offload module
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from src import offload
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs under a monkey patched eventlet hub, like app.py, with a green thread
+# beating every 20ms the way Socket.IO pings do, and reports the worst delay
+# of a beat during each phase
+HEARTBEAT_PROBE = '''
+import eventlet
+eventlet.monkey_patch()
+
+import json
+import sys
+import time
+
+sys.path.insert(0, sys.argv[1])
+from src import offload
+from src.repo_mirror import MirrorCache
+
+native_sleep = eventlet.patcher.original('time').sleep
+worst = [0.0]
+
+
+def heartbeat():
+    while True:
+        started = time.monotonic()
+        eventlet.sleep(0.02)
+        worst[0] = max(worst[0], time.monotonic() - started - 0.02)
+
+
+def measure(fn):
+    eventlet.sleep(0.05)
+    worst[0] = 0.0
+    fn()
+    # Let a late beat record its delay
+    eventlet.sleep(0.05)
+    return worst[0]
+
+
+eventlet.spawn(heartbeat)
+cache = MirrorCache({'web': {'mirror_directory': sys.argv[3]}})
+results = {
+    'direct': measure(lambda: native_sleep(0.5)),
+    'offloaded': measure(lambda: offload.run_blocking(native_sleep, 0.5)),
+    'clone': measure(lambda: cache.checkout(sys.argv[2], sys.argv[4])),
+    'recheckout': measure(lambda: cache.checkout(sys.argv[2], sys.argv[4])),
+}
+print(json.dumps(results))
+'''
+
+
+class TestOffload:
+    """Test cases for the offload helpers"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.test_dir)
+
+    def test_unpatched_calls_run_inline(self):
+        """Test that without eventlet patching calls run directly and raise as usual"""
+        assert not offload.hub_is_patched()
+        assert offload.run_blocking(sum, [1, 2, 3]) == 6
+        with pytest.raises(ZeroDivisionError):
+            offload.run_blocking(lambda: 1 / 0)
+
+        path = self.test_dir / 'a.txt'
+        offload.append_text(path, 'one\n')
+        offload.append_text(path, 'two\n')
+        assert path.read_text() == 'one\ntwo\n'
+
+        (self.test_dir / 'tree' / 'sub').mkdir(parents=True)
+        offload.rmtree(self.test_dir / 'tree')
+        assert not (self.test_dir / 'tree').exists()
+
+    def test_heartbeat_jitter_during_large_clone(self):
+        """Test that blocking work and a large clone do not stall a heartbeat green thread"""
+        pytest.importorskip('eventlet')
+        upstream = self.test_dir / 'upstream'
+        upstream.mkdir()
+        for d in range(20):
+            (upstream / f'dir{d}').mkdir()
+            for i in range(200):
+                (upstream / f'dir{d}' / f'file{i}.txt').write_text(os.urandom(512).hex())
+        env = dict(os.environ, GIT_AUTHOR_NAME='Test', GIT_AUTHOR_EMAIL='test@example.com',
+                   GIT_COMMITTER_NAME='Test', GIT_COMMITTER_EMAIL='test@example.com')
+        for args in (['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'initial']):
+            subprocess.run(['git', *args], cwd=upstream, env=env, check=True)
+
+        probe = self.test_dir / 'probe.py'
+        probe.write_text(HEARTBEAT_PROBE)
+        result = subprocess.run(
+            [sys.executable, '-W', 'ignore', str(probe), str(ROOT), upstream.as_uri(),
+             str(self.test_dir / 'mirrors'), str(self.test_dir / 'work')],
+            capture_output=True, text=True, timeout=120
+        )
+        assert result.returncode == 0, result.stderr
+        jitter = json.loads(result.stdout.strip().splitlines()[-1])
+
+        # The control: a native blocking call on the hub stalls every beat
+        assert jitter['direct'] >= 0.4
+        assert jitter['offloaded'] < 0.2
+        assert jitter['clone'] < 0.2
+        # The second checkout deletes the 4000-file working copy first
+        assert jitter['recheckout'] < 0.2
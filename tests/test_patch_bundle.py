@@ -0,0 +1,111 @@
+"""
+Tests for the patch bundle module
+"""
+
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from src.file_writer import FileWriter
+from src.patch_bundle import PatchApplyError, apply_bundle, apply_patch, load_bundle, render_patch
+
+
+class TestPatchBundle:
+    """Test cases for patch bundles"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / "repo"
+        (self.repo / "pkg").mkdir(parents=True)
+        self.target = self.repo / "pkg" / "module.py"
+        self.target.write_text("a = 1\nb = 2\nc = 3\n")
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def make_writer(self, **file_processing) -> FileWriter:
+        file_processing.setdefault('backup_directory', str(self.tmp_dir / "backups"))
+        file_processing.setdefault('patch_bundle_directory', str(self.tmp_dir / "patches"))
+        file_processing.setdefault('fsync', 'none')
+        return FileWriter({'file_processing': file_processing})
+
+    def test_apply_patch_handles_missing_final_newline(self):
+        """Test that patches round-trip content without a trailing newline"""
+        original = "a = 1\nb = 2"
+        new = "a = 1\nb = 3"
+        assert apply_patch(original, render_patch("x.py", original, new)) == new
+
+    def test_apply_patch_tolerates_moved_lines(self):
+        """Test that hunks are found when unrelated lines were inserted above"""
+        original = "".join(f"line {i}\n" for i in range(20))
+        new = original.replace("line 15\n", "line fifteen\n")
+        patch = render_patch("x.py", original, new)
+        shifted = "header\n" + original
+        assert apply_patch(shifted, patch) == "header\n" + new
+
+        with pytest.raises(PatchApplyError):
+            apply_patch(original.replace("line 14\n", "changed\n"), patch)
+
+    def test_preview_task_writes_bundle(self):
+        """Test that a preview task streams its diffs into a bundle"""
+        writer = self.make_writer(auto_apply_changes=False)
+        writer.begin_task("demo: tidy up", self.repo)
+        assert writer.apply_changes(self.target, "a = 1\nb = 20\nc = 3\n")
+        bundle = writer.patch_bundles.current
+        assert json.loads((bundle / "index.json").read_text())['patches'][0]['path'] == "pkg/module.py"
+        assert writer.commit_task()
+
+        index = load_bundle(bundle)
+        assert index['status'] == 'complete'
+        assert self.target.read_text() == "a = 1\nb = 2\nc = 3\n"
+        assert "Subject: [PATCH 1] demo: tidy up: pkg/module.py" in (bundle / "series.mbox").read_text()
+
+        result = subprocess.run(
+            ['git', 'apply', '--check', '-'], cwd=self.repo, input=index['patches'][0]['patch'],
+            capture_output=True, text=True
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_empty_task_leaves_no_bundle(self):
+        """Test that tasks without changes do not leave empty bundles"""
+        writer = self.make_writer(auto_apply_changes=False)
+        writer.begin_task("nothing", self.repo)
+        writer.commit_task()
+        assert list((self.tmp_dir / "patches").iterdir()) == []
+
+    def test_apply_bundle(self):
+        """Test that a bundle applies later, keeping only the latest patch per file"""
+        preview = self.make_writer(auto_apply_changes=False)
+        preview.begin_task("demo", self.repo)
+        preview.apply_changes(self.target, "a = 1\nb = 20\nc = 3\n")
+        preview.apply_changes(self.target, "a = 1\nb = 200\nc = 3\n")
+        bundle = preview.patch_bundles.current
+        preview.commit_task()
+
+        summary = apply_bundle(bundle, self.make_writer())
+        assert summary['errors'] == []
+        assert summary['drifted'] == []
+        assert self.target.read_text() == "a = 1\nb = 200\nc = 3\n"
+
+    def test_apply_bundle_is_all_or_nothing(self):
+        """Test that nothing is written if any patch no longer applies"""
+        other = self.repo / "other.py"
+        other.write_text("x = 1\n")
+        preview = self.make_writer(auto_apply_changes=False)
+        preview.begin_task("demo", self.repo)
+        preview.apply_changes(self.target, "a = 1\nb = 20\nc = 3\n")
+        preview.apply_changes(other, "x = 2\n")
+        bundle = preview.patch_bundles.current
+        preview.commit_task()
+
+        other.write_text("x = 5\n")
+        summary = apply_bundle(bundle, self.make_writer())
+        assert summary['drifted'] == ["other.py"]
+        assert len(summary['errors']) == 1
+        assert self.target.read_text() == "a = 1\nb = 2\nc = 3\n"
@@ -0,0 +1,110 @@
+"""
+Tests for the repository mirror module
+"""
+
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from src.repo_mirror import MirrorCache, run_git, strip_credentials
+
+
+def git(cwd: Path, *args: str) -> str:
+    result = subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+class TestMirrorCache:
+    """Test cases for MirrorCache"""
+
+    def setup_method(self):
+        """Setup an upstream repository with two branches"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.upstream = self.tmp_dir / "upstream"
+        (self.upstream / "src").mkdir(parents=True)
+        git(self.upstream, 'init', '-q', '-b', 'main')
+        (self.upstream / "src" / "app.js").write_text("console.log(1)\n")
+        (self.upstream / "project_config.json").write_text("{}\n")
+        (self.upstream / "logo.png").write_bytes(b"\x89PNG")
+        git(self.upstream, 'add', '.')
+        git(self.upstream, 'commit', '-q', '-m', 'initial')
+        git(self.upstream, 'branch', 'develop')
+        self.url = self.upstream.as_uri()
+
+        self.cache = MirrorCache({'web': {
+            'mirror_directory': str(self.tmp_dir / "mirrors"),
+            'sparse_extensions': ['.js']
+        }})
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_strip_credentials(self):
+        """Test that tokens never reach stored URLs"""
+        assert strip_credentials("https://tok@github.com/a/b.git") == "https://github.com/a/b.git"
+        assert strip_credentials("https://github.com/a/b.git") == "https://github.com/a/b.git"
+
+    def test_mirror_is_reused_and_fetched_incrementally(self):
+        """Test that a second update fetches new commits into the same mirror"""
+        mirror = self.cache.update(self.url)
+        assert mirror == self.cache.mirror_path(self.url)
+
+        (self.upstream / "src" / "app.js").write_text("console.log(2)\n")
+        git(self.upstream, 'commit', '-q', '-am', 'second')
+        stages = []
+        assert self.cache.update(self.url, lambda stage, percent: stages.append(stage)) == mirror
+        assert stages[0] == 'Fetching updates'
+        assert git(mirror, 'rev-parse', 'main') == git(self.upstream, 'rev-parse', 'main')
+        # Repositories borrowing the mirror's objects rely on them never being pruned
+        assert git(mirror, 'config', 'gc.auto') == '0'
+        assert git(mirror, 'config', 'gc.pruneExpire') == 'never'
+
+    def test_checkout_is_shallow_and_sparse(self):
+        """Test that working copies only contain configured file types"""
+        work = self.cache.checkout(self.url, self.tmp_dir / "work", branch='develop', new_branch='ai/test')
+
+        assert (work / "src" / "app.js").exists()
+        assert (work / "project_config.json").exists()
+        assert not (work / "logo.png").exists()
+        assert git(work, 'rev-parse', '--is-shallow-repository') == 'true'
+        assert git(work, 'branch', '--show-current') == 'ai/test'
+        assert git(work, 'remote', 'get-url', 'origin') == self.url
+
+    def test_mirror_lock_excludes_other_caches(self):
+        """Test that a mirror being updated by one cache blocks another cache's update"""
+        other = MirrorCache({'web': {'mirror_directory': str(self.tmp_dir / "mirrors")}})
+        mirror = self.cache.mirror_path(self.url)
+        results = []
+
+        with self.cache._lock_for(mirror):
+            thread = threading.Thread(target=lambda: results.append(other.update(self.url)), daemon=True)
+            thread.start()
+            thread.join(0.5)
+            assert thread.is_alive()
+            assert not mirror.exists()
+        thread.join(30)
+
+        assert results == [mirror]
+        assert git(mirror, 'rev-parse', 'main') == git(self.upstream, 'rev-parse', 'main')
+
+    def test_run_git_with_large_output(self):
+        """Test that output larger than a pipe buffer does not block git"""
+        (self.upstream / "big.txt").write_text("line of text\n" * 50000)
+        git(self.upstream, 'add', 'big.txt')
+        git(self.upstream, 'commit', '-q', '-m', 'big')
+        results = []
+
+        thread = threading.Thread(
+            target=lambda: results.append(run_git('show', 'HEAD:big.txt', cwd=self.upstream)), daemon=True
+        )
+        thread.start()
+        thread.join(30)
+
+        assert not thread.is_alive()
+        assert len(results[0].splitlines()) == 50000
@@ -0,0 +1,44 @@
+"""
+Tests for the run history module
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.run_history import RunHistory
+
+
+class TestRunHistory:
+    """Test cases for RunHistory"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        config = {'monitoring': {'history': {'database': str(self.tmp_dir / "history.sqlite")}}}
+        self.history = RunHistory(config)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.history.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_provider_stats(self):
+        """Test that latencies and output ratios are aggregated"""
+        assert self.history.get_provider_stats("gemini") is None
+
+        self.history.record_call("gemini", 2.0, 100, 150)
+        self.history.record_call("gemini", 4.0, 100, 50)
+        stats = self.history.get_provider_stats("gemini")
+
+        assert stats["calls"] == 2
+        assert stats["avg_seconds"] == 3.0
+        assert stats["output_ratio"] == 1.0
+
+    def test_unchanged_fingerprints(self):
+        """Test that fingerprints are scoped to goal and content"""
+        self.history.record_unchanged("add docstrings", "x = 1")
+
+        assert self.history.is_unchanged("add docstrings", "x = 1")
+        assert not self.history.is_unchanged("add docstrings", "x = 2")
+        assert not self.history.is_unchanged("add tests", "x = 1")
@@ -0,0 +1,145 @@
+"""
+Tests for the run planner module
+"""
+
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+# The task manager imports the AI provider SDKs, the CLI typer and rich
+pytest.importorskip('google.generativeai')
+pytest.importorskip('anthropic')
+pytest.importorskip('typer')
+
+from rich.console import Console  # noqa: E402
+
+from src.cli import CLI  # noqa: E402
+from src.run_planner import PlanEstimate, RunPlanner  # noqa: E402
+from src.task_manager import TaskManager  # noqa: E402
+
+
+class TestRunPlanner:
+    """Test cases for RunPlanner"""
+
+    def setup_method(self):
+        """Setup a repository with two files and two priced providers"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.repo = self.tmp_dir / 'site'
+        self.repo.mkdir()
+        (self.repo / 'a.py').write_text("a = 1\n" * 40)
+        (self.repo / 'b.py').write_text("b = 2\n" * 80)
+
+        config_path = self.tmp_dir / 'settings.yaml'
+        config_path.write_text(yaml.safe_dump({
+            'default_provider': 'claude',
+            'ai_providers': {
+                'gemini': {'enabled': True, 'cost_per_1k_input_tokens': 0.5, 'cost_per_1k_output_tokens': 1.5},
+                'claude': {'enabled': True, 'cost_per_1k_input_tokens': 3.0, 'cost_per_1k_output_tokens': 15.0},
+                'openai': {'enabled': False}
+            },
+            'repositories': [{
+                'name': 'site',
+                'path': str(self.repo),
+                'enabled': True,
+                'file_extensions': ['.py'],
+                'exclude_patterns': []
+            }],
+            'tasks': {'default_goals': ['add docstrings', 'improve naming']},
+            'file_processing': {'backup_directory': str(self.tmp_dir / 'backups')},
+            'monitoring': {
+                'history': {'database': str(self.tmp_dir / 'history.sqlite')},
+                'ranking': {'cache_directory': str(self.tmp_dir / 'ranking')}
+            }
+        }))
+        self.manager = TaskManager(str(config_path))
+        self.planner = RunPlanner(self.manager)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.manager.file_writer.close()
+        self.manager.run_history.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def estimate(self, estimates, goal, provider):
+        return next(e for e in estimates if e.goal == goal and e.provider == provider)
+
+    def test_providers_default_first(self):
+        """Test that only enabled providers are planned, the default first"""
+        assert self.planner.get_providers() == ['claude', 'gemini']
+
+    def test_unchanged_files_are_skipped_per_goal(self):
+        """Test that fingerprinted content counts as cached only for its goal"""
+        self.manager.run_history.record_unchanged('add docstrings', (self.repo / 'a.py').read_text())
+        tasks = [self.manager.build_task('site', goal) for goal in ('add docstrings', 'improve naming')]
+
+        estimates = self.planner.plan(tasks)
+
+        assert len(estimates) == 4
+        docstrings = self.estimate(estimates, 'add docstrings', 'claude')
+        assert (docstrings.files_selected, docstrings.files_cached, docstrings.files_to_send) == (2, 1, 1)
+        naming = self.estimate(estimates, 'improve naming', 'claude')
+        assert (naming.files_selected, naming.files_cached, naming.files_to_send) == (2, 0, 2)
+
+    def test_tokens_cost_and_latency(self):
+        """Test that estimates use prompt sizes, prices and recorded latencies"""
+        self.manager.run_history.record_call('gemini', 2.0, 100, 50)
+        task = self.manager.build_task('site', 'add docstrings')
+
+        estimates = self.planner.plan([task])
+
+        prompt_chars = sum(
+            len(self.manager.ai_interface._build_prompt(path.read_text(), task.goal, str(path)))
+            for path in (self.repo / 'a.py', self.repo / 'b.py')
+        )
+        content_chars = len((self.repo / 'a.py').read_text()) + len((self.repo / 'b.py').read_text())
+
+        gemini = self.estimate(estimates, 'add docstrings', 'gemini')
+        assert gemini.input_tokens == prompt_chars // 4
+        # Recorded output is half the input
+        assert gemini.output_tokens == int(content_chars * 0.5) // 4
+        assert gemini.cost == pytest.approx(gemini.input_tokens / 1000 * 0.5 + gemini.output_tokens / 1000 * 1.5)
+        assert gemini.wall_seconds == 4.0
+        assert gemini.latency_from_history
+
+        claude = self.estimate(estimates, 'add docstrings', 'claude')
+        assert claude.output_tokens == content_chars // 4
+        assert claude.wall_seconds == 2 * RunPlanner.DEFAULT_LATENCY_SECONDS
+        assert not claude.latency_from_history
+
+    def test_total_wall_time(self):
+        """Test that repositories add up sequentially and overlap in parallel mode"""
+        def estimate(repo, seconds):
+            return PlanEstimate(repo, 'goal', 'claude', 1, 0, 1, 0, 0, 0.0, seconds, True)
+        estimates = [estimate('a', 60.0), estimate('a', 30.0), estimate('b', 30.0), estimate('c', 30.0)]
+
+        assert self.planner.estimate_total_wall_seconds(estimates, 'claude') == 150.0
+        assert self.planner.estimate_total_wall_seconds(estimates, 'gemini') == 0.0
+
+        self.planner.config['monitoring'].update(parallel_processing=True, max_concurrent_ai_requests=2)
+        # Repository a alone takes 90s; two requests at a time need 75s for all
+        assert self.planner.estimate_total_wall_seconds(estimates, 'claude') == 90.0
+
+    def test_show_plan_output(self):
+        """Test that the plan command prints every estimate and per-provider totals"""
+        cli = CLI.__new__(CLI)
+        cli.console = Console(record=True, width=200)
+        cli.task_manager = self.manager
+        cli.logger = logging.getLogger('test')
+
+        cli._show_plan('site')
+        output = cli.console.export_text()
+
+        assert 'Run Plan' in output
+        assert output.count('add docstrings') == 2
+        assert output.count('improve naming') == 2
+        assert '2/0' in output
+        assert 'claude: $' in output and 'gemini: $' in output
+        assert 'no latency history yet' in output
+
+        cli.console = Console(record=True, width=200)
+        cli._show_plan('missing')
+        assert 'No repositories or goals to plan' in cli.console.export_text()
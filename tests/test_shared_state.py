@@ -0,0 +1,114 @@
+"""
+Tests for the shared state module
+"""
+
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from src.job_manager import ACTIVE_STATES, JobManager
+from src.shared_state import SharedState
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestSharedState:
+    """Test cases for SharedState"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = str(Path(self.test_dir) / 'state.sqlite')
+        self.state = SharedState(self.path)
+        self.other = SharedState(self.path)
+        self.other.owner = 'other-host:1'
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.state.close()
+        self.other.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_counters_are_shared(self):
+        """Test that increments from two processes add up"""
+        for _ in range(3):
+            self.state.incr('analytics_events')
+        assert self.other.incr('analytics_events', 2) == 5
+
+        self.other.set_counter('github_activity', 7)
+        assert self.state.counters() == {'analytics_events': 5, 'github_activity': 7}
+        assert self.state.counter('missing') == 0
+
+    def test_claim_job_deduplicates_across_workers(self):
+        """Test that an active job with the same key is returned instead of claimed"""
+        record = {'id': 'j1', 'kind': 'setup', 'status': 'queued'}
+        assert self.state.claim_job(record, ('repo', 'prop'), ACTIVE_STATES) is None
+
+        existing = self.other.claim_job({'id': 'j2', 'kind': 'setup', 'status': 'queued'}, ('repo', 'prop'), ACTIVE_STATES)
+        assert existing['id'] == 'j1'
+        assert self.other.load_job('j2') is None
+
+        self.state.save_jobs([dict(record, status='succeeded')], [('repo', 'prop')])
+        assert self.other.claim_job({'id': 'j3', 'kind': 'setup', 'status': 'queued'}, ('repo', 'prop'), ACTIVE_STATES) is None
+        assert self.state.load_job('j3')['key'] == ('repo', 'prop')
+
+    def test_cancel_requests_reach_the_owner(self):
+        """Test that a cancel requested by another worker is seen only by the owner"""
+        self.state.claim_job({'id': 'j1', 'status': 'running'}, 'a', ACTIVE_STATES)
+        assert self.other.request_cancel('j1')
+        assert not self.other.request_cancel('missing')
+
+        assert self.state.cancel_requests() == ['j1']
+        assert self.other.cancel_requests() == []
+
+    def test_stale_jobs_are_reported_lost(self):
+        """Test that active jobs without a recent heartbeat are marked lost"""
+        self.state.stale_seconds = 0.05
+        self.state.claim_job({'id': 'j1', 'status': 'running'}, 'a', ACTIVE_STATES)
+        assert self.state.load_job('j1')['status'] == 'running'
+
+        time.sleep(0.1)
+        assert self.state.load_job('j1')['status'] == 'lost'
+        # A lost job no longer blocks a new one with the same key
+        assert self.state.claim_job({'id': 'j2', 'status': 'queued'}, 'a', ACTIVE_STATES) is None
+
+    def test_room_state(self):
+        """Test that room state saved by one worker is read by another"""
+        self.state.save_room_state('property:1', 'analytics', {'users': 3})
+        self.state.save_room_state('property:1', 'analytics', {'users': 4})
+        self.state.save_room_state('property:2', 'analysis', {'focus': 'seo'})
+
+        assert self.other.room_states('property:1') == {'analytics': {'users': 4}}
+
+        self.other.delete_room_states('property:1')
+        assert self.state.room_states('property:1') == {}
+        assert self.state.room_states('property:2') == {'analysis': {'focus': 'seo'}}
+
+    def test_job_manager_with_shared_state(self):
+        """Test that jobs are visible, deduplicated and cancellable across managers"""
+        first = JobManager(max_concurrent=1, state=self.state, sync_seconds=0.05)
+        second = JobManager(max_concurrent=1, state=self.other, sync_seconds=0.05)
+        try:
+            def loop_until_stopped(job):
+                while not job.stopped:
+                    job.wait(1)
+
+            job = first.submit('setup', ('repo', 'prop'), loop_until_stopped)
+            assert wait_for(lambda: job.status == 'running')
+
+            duplicate = second.submit('setup', ('repo', 'prop'), loop_until_stopped)
+            assert duplicate.id == job.id
+            assert second.get(job.id).status == 'running'
+
+            second.cancel(job.id)
+            assert wait_for(lambda: job.status == 'cancelled')
+            assert wait_for(lambda: second.get(job.id).status == 'cancelled')
+        finally:
+            first.shutdown(timeout=5)
+            second.shutdown(timeout=5)
@@ -0,0 +1,89 @@
+"""
+Tests for the task manager module
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+# The task manager imports the AI provider SDKs
+pytest.importorskip('google.generativeai')
+pytest.importorskip('anthropic')
+
+from src.task_manager import TaskManager  # noqa: E402
+
+
+class TestTaskManagerProcessPool:
+    """Test cases for running repositories in worker processes"""
+
+    def setup_method(self):
+        """Setup a config with two repositories and no reachable AI provider"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        repositories = []
+        for name in ('alpha', 'beta'):
+            repo = self.tmp_dir / name
+            repo.mkdir()
+            (repo / 'one.py').write_text("x = 1\n")
+            (repo / 'two.py').write_text("y = 2\n")
+            repositories.append({
+                'name': name,
+                'path': str(repo),
+                'enabled': True,
+                'file_extensions': ['.py'],
+                'exclude_patterns': []
+            })
+
+        self.config_path = self.tmp_dir / 'settings.yaml'
+        self.config_path.write_text(yaml.safe_dump({
+            'default_provider': 'none',
+            'repositories': repositories,
+            'file_processing': {'backup_directory': str(self.tmp_dir / 'backups')},
+            'monitoring': {
+                'parallel_processing': True,
+                'max_workers': 2,
+                'history': {'database': str(self.tmp_dir / 'history.sqlite')},
+                'ranking': {'cache_directory': str(self.tmp_dir / 'ranking')}
+            }
+        }))
+        self.manager = TaskManager(str(self.config_path))
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        self.manager.file_writer.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_repositories_run_in_worker_processes(self):
+        """Test that each repository's tasks run in a worker and report progress back"""
+        for name in ('alpha', 'beta'):
+            self.manager.create_task(name, 'improve readability')
+        events = []
+
+        results = self.manager.execute_all_tasks(progress_callback=events.append)
+
+        assert results == {'completed': 2, 'failed': 0, 'total': 2}
+        assert sorted(task.repo_name for task in self.manager.completed_tasks) == ['alpha', 'beta']
+        assert all(task.status == 'completed' for task in self.manager.completed_tasks)
+        assert self.manager.tasks == []
+
+        for name in ('alpha', 'beta'):
+            repo_events = [event for event in events if event['repo'] == name]
+            assert [event['event'] for event in repo_events] == [
+                'task_started', 'file_processed', 'file_processed', 'task_finished'
+            ]
+            assert repo_events[-1]['success'] is True
+            assert sorted(Path(event['file']).name for event in repo_events if 'file' in event) == ['one.py', 'two.py']
+
+    def test_worker_failure_marks_its_tasks_failed(self):
+        """Test that a worker that cannot start fails its repository's tasks"""
+        for name in ('alpha', 'beta'):
+            self.manager.create_task(name, 'improve readability')
+        # Workers reload the configuration from its path
+        self.config_path.unlink()
+
+        results = self.manager.execute_all_tasks()
+
+        assert results == {'completed': 0, 'failed': 2, 'total': 2}
+        assert sorted(task.status for task in self.manager.tasks) == ['failed', 'failed']
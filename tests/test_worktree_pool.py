@@ -0,0 +1,165 @@
+"""
+Tests for the worktree pool module
+"""
+
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from src.repo_mirror import MirrorCache
+from src.worktree_pool import WorktreeError, WorktreePool
+
+
+def git(cwd: Path, *args: str) -> str:
+    result = subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+class TestWorktreePool:
+    """Test cases for WorktreePool"""
+
+    def setup_method(self):
+        """Setup an upstream repository with two branches"""
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.upstream = self.tmp_dir / "upstream"
+        (self.upstream / "src").mkdir(parents=True)
+        git(self.upstream, 'init', '-q', '-b', 'main')
+        (self.upstream / "src" / "app.js").write_text("console.log(1)\n")
+        (self.upstream / "project_config.json").write_text("{}\n")
+        git(self.upstream, 'add', '.')
+        git(self.upstream, 'commit', '-q', '-m', 'initial')
+        git(self.upstream, 'checkout', '-q', '-b', 'develop')
+        (self.upstream / "src" / "app.js").write_text("console.log('develop')\n")
+        git(self.upstream, 'commit', '-q', '-am', 'develop change')
+        git(self.upstream, 'checkout', '-q', 'main')
+        self.url = self.upstream.as_uri()
+
+        config = {'web': {
+            'mirror_directory': str(self.tmp_dir / "mirrors"),
+            'workspace_directory': str(self.tmp_dir / "work"),
+            'idle_worktrees': 1
+        }}
+        self.pool = WorktreePool(MirrorCache(config), config)
+
+    def teardown_method(self):
+        """Cleanup test fixtures"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_concurrent_jobs_get_separate_worktrees(self):
+        """Test that two jobs on one repository work in separate worktrees sharing one object store"""
+        first = self.pool.acquire(self.url, 'job1')
+        second = self.pool.acquire(self.url, 'job2', branch='develop')
+
+        assert first.path != second.path
+        assert (first.path / "src" / "app.js").read_text() == "console.log(1)\n"
+        assert (second.path / "src" / "app.js").read_text() == "console.log('develop')\n"
+        assert git(first.path, 'rev-parse', '--abbrev-ref', 'HEAD') == 'jobs/job1'
+        assert git(second.path, 'rev-parse', '--abbrev-ref', 'HEAD') == 'jobs/job2'
+
+        # Worktrees have no object store of their own
+        assert (first.path / '.git').is_file()
+        alternates = first.base / '.git' / 'objects' / 'info' / 'alternates'
+        assert alternates.read_text().strip().startswith(str(self.pool.mirrors.mirror_path(self.url).resolve()))
+
+        # A commit in one worktree leaves the other untouched
+        (first.path / "src" / "app.js").write_text("console.log(2)\n")
+        git(first.path, 'commit', '-q', '-am', 'job1 change')
+        assert git(second.path, 'status', '--porcelain') == ''
+        assert git(first.base, 'log', '-1', '--format=%s', 'jobs/job1') == 'job1 change'
+
+    def test_released_worktrees_are_recycled(self):
+        """Test that a finished job's worktree is reset and reused, and extras removed"""
+        first = self.pool.acquire(self.url, 'job1')
+        second = self.pool.acquire(self.url, 'job2')
+        (first.path / "scratch.txt").write_text("leftover\n")
+        (first.path / "src" / "app.js").write_text("dirty\n")
+        self.pool.release(first)
+        self.pool.release(second)
+
+        # Only idle_worktrees are kept
+        assert first.path.exists()
+        assert not second.path.exists()
+
+        third = self.pool.acquire(self.url, 'job3', new_branch='feature')
+        assert third.path == first.path
+        assert not (third.path / "scratch.txt").exists()
+        assert (third.path / "src" / "app.js").read_text() == "console.log(1)\n"
+        assert git(third.path, 'rev-parse', '--abbrev-ref', 'HEAD') == 'feature'
+
+        self.pool.release(third)
+        self.pool.close()
+        assert not third.path.exists()
+
+    def test_branch_in_use_is_refused(self):
+        """Test that one branch cannot be checked out by two jobs"""
+        self.pool.acquire(self.url, 'job1', new_branch='feature')
+        with pytest.raises(WorktreeError):
+            self.pool.acquire(self.url, 'job2', new_branch='feature')
+
+    def test_existing_branches_are_never_reset(self):
+        """Test that a branch with an earlier job's commits is kept and a new job gets its own"""
+        first = self.pool.acquire(self.url, 'job1', new_branch='feature')
+        (first.path / "src" / "app.js").write_text("console.log(2)\n")
+        git(first.path, 'commit', '-q', '-am', 'job1 change')
+        committed = git(first.path, 'rev-parse', 'HEAD')
+        self.pool.release(first)
+
+        second = self.pool.acquire(self.url, 'job2', new_branch='feature')
+        assert second.branch == 'feature-job2'
+        assert git(second.path, 'rev-parse', '--abbrev-ref', 'HEAD') == 'feature-job2'
+        assert (second.path / "src" / "app.js").read_text() == "console.log(1)\n"
+        assert git(second.base, 'rev-parse', 'feature') == committed
+
+    def test_branches_without_new_commits_are_pruned(self):
+        """Test that a finished job's branch is deleted once the remote has all of its commits"""
+        worktree = self.pool.acquire(self.url, 'job1')
+        self.pool.release(worktree)
+
+        assert git(worktree.base, 'branch', '--list', 'jobs/*') == ''
+
+    def test_new_commits_reach_later_worktrees(self):
+        """Test that worktrees start from the remote's latest commit"""
+        self.pool.release(self.pool.acquire(self.url, 'job1'))
+        (self.upstream / "src" / "app.js").write_text("console.log(3)\n")
+        git(self.upstream, 'commit', '-q', '-am', 'upstream change')
+
+        worktree = self.pool.acquire(self.url, 'job2', branch='missing')
+        assert (worktree.path / "src" / "app.js").read_text() == "console.log(3)\n"
+
+    def test_pools_of_other_processes_share_leases(self):
+        """Test that a second pool sees the first pool's leases and idle worktrees"""
+        other = WorktreePool(self.pool.mirrors, {'web': {
+            'mirror_directory': str(self.tmp_dir / "mirrors"),
+            'workspace_directory': str(self.tmp_dir / "work"),
+            'idle_worktrees': 1
+        }})
+        first = self.pool.acquire(self.url, 'job1', new_branch='feature')
+        with pytest.raises(WorktreeError):
+            other.acquire(self.url, 'job2', new_branch='feature')
+
+        self.pool.release(first)
+        second = other.acquire(self.url, 'job2', new_branch='feature')
+        assert second.path == first.path
+        assert other.leased() == [second]
+        assert self.pool.leased() == []
+
+    def test_leases_of_exited_processes_are_reclaimed(self):
+        """Test that a worktree leased by a process that has exited is removed and its branch freed"""
+        worktree = self.pool.acquire(self.url, 'job1', new_branch='feature')
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        state_path = self.pool._state_path(worktree.base)
+        state = json.loads(state_path.read_text())
+        state['leases'][str(worktree.path)]['pid'] = exited.pid
+        state_path.write_text(json.dumps(state))
+
+        replacement = self.pool.acquire(self.url, 'job2', new_branch='feature')
+        assert replacement.path != worktree.path
+        assert not worktree.path.exists()
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+from app import app, socketio  # noqa: E402,F401